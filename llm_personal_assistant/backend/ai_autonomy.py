@@ -1,34 +1,262 @@
+"""
+AI autonomy settings.
+
+Whether the assistant may act on its own (create tasks, schedule events)
+without asking for confirmation. The setting can be given globally, per user,
+per action, or per user and action; a lookup falls back from the most to the
+least specific entry.
+
+Values are held in memory so checks on the LLM action path never touch the
+disk. Writes are upserted atomically into the user_settings table and update
+the in-memory copy at the same time; a background task reloads the table
+periodically, so changes made by other processes are picked up. The legacy
+ai_autonomy.txt file is still honoured for the global value: it is rewritten
+on global updates and re-read when its modification time changes, checked at
+most every few seconds.
+"""
+
+import asyncio
+import functools
+import logging
 import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, String, Text, select
+from sqlalchemy.dialects.sqlite import insert
+
+from config import settings
+from database import AsyncSessionLocal, Base
+
+logger = logging.getLogger(__name__)
 
 AI_AUTONOMY_FILE = "ai_autonomy.txt"
+AUTONOMY_KEY_PREFIX = "ai_autonomy:"
+# Stands for "any user" / "any action" in stored keys
+ANY = "*"
+
+# Actions the AI can take, as named in autonomy settings
+TASK_ACTION = "create_task"
+EVENT_ACTION = "schedule_event"
+
+
+class UserSetting(Base):
+    __tablename__ = "user_settings"
+
+    user_id = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AutonomyUpdate(BaseModel):
+    autonomous: bool
+    user_id: Optional[str] = None
+    action: Optional[str] = None
+
+
+class AutonomyStore:
+    """
+    In-memory autonomy settings backed by the user_settings table.
+
+    Args:
+        file_path (str): Path of the legacy file holding the global value.
+        file_check_interval (float, optional): Seconds between checks of the file.
+        reload_interval (float, optional): Seconds between reloads of the table while started.
+        session_factory: Session factory of the database holding the settings.
+    """
+
+    def __init__(
+            self,
+            file_path: str = AI_AUTONOMY_FILE,
+            file_check_interval: float = None,
+            reload_interval: float = None,
+            session_factory=AsyncSessionLocal,
+    ):
+        self.file_path = file_path
+        self.file_check_interval = (
+            file_check_interval if file_check_interval is not None else settings.AI_AUTONOMY_FILE_CHECK_SECONDS
+        )
+        self.reload_interval = reload_interval if reload_interval is not None else settings.AI_AUTONOMY_RELOAD_SECONDS
+        self.session_factory = session_factory
+        self._values: Dict[Tuple[str, str], bool] = {}
+        self._file_mtime = None
+        self._next_file_check = 0.0
+        self._write_lock = asyncio.Lock()
+        self._reloader = None
+
+    async def load(self):
+        """Load all autonomy settings from the database, then apply a newer legacy file."""
+        # Under the write lock, so a reload cannot overwrite a concurrent set() with older rows
+        async with self._write_lock:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    select(UserSetting).filter(UserSetting.key.startswith(AUTONOMY_KEY_PREFIX))
+                )
+                rows = result.scalars().all()
+            self._values = {
+                (row.user_id, row.key[len(AUTONOMY_KEY_PREFIX):]): row.value == "true" for row in rows
+            }
+            global_row = next(
+                (row for row in rows if row.user_id == ANY and row.key == AUTONOMY_KEY_PREFIX + ANY), None
+            )
+            mtime = self._stat_file()
+            if mtime is not None and (global_row is None or datetime.utcfromtimestamp(mtime) > global_row.updated_at):
+                self._read_file(mtime)
+            else:
+                self._file_mtime = mtime
+            self._next_file_check = time.monotonic() + self.file_check_interval
+        logger.debug(f"Loaded {len(self._values)} AI autonomy settings")
+
+    def start(self):
+        """Reload the settings every reload_interval seconds on the running event loop."""
+        if self._reloader is not None and not self._reloader.done():
+            return
+        self._reloader = asyncio.create_task(self._reload_periodically())
+
+    async def stop(self):
+        """Stop the periodic reload."""
+        if self._reloader is None:
+            return
+        self._reloader.cancel()
+        try:
+            await self._reloader
+        except asyncio.CancelledError:
+            pass
+        self._reloader = None
+
+    async def _reload_periodically(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"Reloading AI autonomy settings failed, keeping the current ones: {e}")
 
-def get_ai_autonomy():
-    if os.path.exists(AI_AUTONOMY_FILE):
-        with open(AI_AUTONOMY_FILE, 'r') as f:
-            return f.read().strip().lower() == 'true'
-    return False
-
-def set_ai_autonomy(autonomy: bool):
-    with open(AI_AUTONOMY_FILE, 'w') as f:
-        f.write(str(autonomy).lower())
-
-def check_ai_autonomy(func):
-    def wrapper(*args, **kwargs):
-        if get_ai_autonomy():
-            return func(*args, **kwargs)
-        else:
-            # Here, you would implement logic to ask for user confirmation
-            # For now, we'll just return a message
-            return {"message": "AI action requires user confirmation", "action": func.__name__}
-    return wrapper
+    def is_autonomous(self, action: Optional[str] = None, user_id: Optional[str] = None) -> bool:
+        """
+        Whether the AI may perform `action` for `user_id` without confirmation.
+
+        Falls back from (user, action) to (user, any action), (any user, action)
+        and (any user, any action); without any setting the answer is False.
+        """
+        self._check_file()
+        user_id = user_id or ANY
+        action = action or ANY
+        for key in ((user_id, action), (user_id, ANY), (ANY, action), (ANY, ANY)):
+            if key in self._values:
+                return self._values[key]
+        return False
+
+    def get_settings(self) -> Dict[Tuple[str, str], bool]:
+        """All explicit settings as {(user_id, action): autonomous}."""
+        self._check_file()
+        return dict(self._values)
+
+    async def set(self, autonomous: bool, user_id: Optional[str] = None, action: Optional[str] = None):
+        """Persist a setting with an atomic upsert and update the in-memory copy."""
+        user_id = user_id or ANY
+        action = action or ANY
+        value = "true" if autonomous else "false"
+        async with self._write_lock:
+            async with self.session_factory() as session:
+                stmt = insert(UserSetting).values(
+                    user_id=user_id, key=AUTONOMY_KEY_PREFIX + action, value=value, updated_at=datetime.utcnow()
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[UserSetting.user_id, UserSetting.key],
+                    set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+                )
+                await session.execute(stmt)
+                await session.commit()
+            self._values[(user_id, action)] = autonomous
+            if (user_id, action) == (ANY, ANY):
+                await asyncio.to_thread(self._write_file, value)
+
+    def _stat_file(self) -> Optional[float]:
+        try:
+            return os.stat(self.file_path).st_mtime
+        except OSError:
+            return None
+
+    def _check_file(self):
+        """Pick up external edits of the legacy file, at most once per check interval."""
+        now = time.monotonic()
+        if now < self._next_file_check:
+            return
+        self._next_file_check = now + self.file_check_interval
+        mtime = self._stat_file()
+        if mtime is not None and mtime != self._file_mtime:
+            self._read_file(mtime)
+
+    def _read_file(self, mtime: float):
+        try:
+            with open(self.file_path, 'r') as f:
+                self._values[(ANY, ANY)] = f.read().strip().lower() == 'true'
+        except OSError as e:
+            logger.warning(f"Unable to read {self.file_path}: {e}")
+        self._file_mtime = mtime
+
+    def _write_file(self, value: str):
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(value)
+        os.replace(tmp_path, self.file_path)
+        self._file_mtime = self._stat_file()
+
+
+autonomy_store = AutonomyStore()
+
+
+def get_ai_autonomy(user_id: Optional[str] = None, action: Optional[str] = None) -> bool:
+    return autonomy_store.is_autonomous(action, user_id)
+
+
+async def set_ai_autonomy(autonomy: bool, user_id: Optional[str] = None, action: Optional[str] = None):
+    await autonomy_store.set(autonomy, user_id, action)
+
+
+def check_ai_autonomy(action: str):
+    """
+    Only run the decorated function when the AI may perform `action` autonomously.
+
+    A `user_id` keyword argument, if given, selects the user's settings.
+    Works for plain and async functions.
+
+    Args:
+        action (str): The action as named in autonomy settings, e.g. TASK_ACTION.
+    """
+    def denied():
+        # Here, you would implement logic to ask for user confirmation
+        # For now, we'll just return a message
+        return {"message": "AI action requires user confirmation", "action": action}
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if get_ai_autonomy(kwargs.get("user_id"), action):
+                    return await func(*args, **kwargs)
+                return denied()
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if get_ai_autonomy(kwargs.get("user_id"), action):
+                return func(*args, **kwargs)
+            return denied()
+        return wrapper
+    return decorator
 
 # Example usage:
-@check_ai_autonomy
-def ai_create_task(title, description):
+@check_ai_autonomy(TASK_ACTION)
+def ai_create_task(title, description, user_id=None):
     # Logic to create a task
     pass
 
-@check_ai_autonomy
-def ai_schedule_event(title, start_time, end_time):
+@check_ai_autonomy(EVENT_ACTION)
+def ai_schedule_event(title, start_time, end_time, user_id=None):
     # Logic to schedule an event
-    pass
\ No newline at end of file
+    pass
@@ -5,8 +5,12 @@ This module uses Pydantic's BaseSettings to manage environment variables
 and configuration settings for the application.
 """
 
+import logging
+
 from pydantic import BaseSettings
 
+logger = logging.getLogger(__name__)
+
 class Settings(BaseSettings):
     """
     Application settings.
@@ -18,9 +22,105 @@ class Settings(BaseSettings):
 
     # Database settings
     DATABASE_URL: str = "sqlite:///./test.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_READ_POOL_SIZE: int = 10
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64000  # negative values are KiB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Task write group commit settings
+    TASK_GROUP_COMMIT: bool = False
+    TASK_GROUP_COMMIT_WINDOW_MS: float = 5.0
+    TASK_GROUP_COMMIT_MAX_OPS: int = 100
 
     # Anthropic API settings
     ANTHROPIC_API_KEY: str
+    ANTHROPIC_API_BASE_URL: str = "https://api.anthropic.com"
+    ANTHROPIC_API_VERSION: str = "2023-06-01"
+
+    # LLM HTTP client settings
+    LLM_HTTP2: bool = True
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 60.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BACKOFF: float = 0.5
+    LLM_MAX_BACKOFF: float = 30.0
+
+    # LLM provider routing settings
+    OPENAI_API_KEY: str = ""  # OpenAI models are only used when a key is set
+    OPENAI_API_BASE_URL: str = "https://api.openai.com"
+    ANTHROPIC_FAST_MODEL: str = "claude-haiku-4-5"
+    ANTHROPIC_LARGE_MODEL: str = "claude-sonnet-4-5"
+    OPENAI_FAST_MODEL: str = "gpt-4o-mini"
+    OPENAI_LARGE_MODEL: str = "gpt-4o"
+    # Provider names ('<api>:<model>') per call type; when empty, routes are built from the models above
+    LLM_ROUTES: dict[str, list[str]] = {}
+    LLM_PROVIDER_COSTS: dict[str, list[float]] = {  # USD per 1000 input and output tokens
+        "anthropic:claude-haiku-4-5": [0.001, 0.005],
+        "anthropic:claude-sonnet-4-5": [0.003, 0.015],
+        "openai:gpt-4o-mini": [0.00015, 0.0006],
+        "openai:gpt-4o": [0.0025, 0.01],
+    }
+    LLM_LATENCY_TARGETS: dict[str, float] = {"extraction": 8.0, "analysis": 30.0}  # p95 seconds
+    LLM_LATENCY_WINDOW: int = 200
+    LLM_LATENCY_MIN_SAMPLES: int = 20
+    LLM_LATENCY_MAX_AGE_SECONDS: float = 600.0
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_MIN_SECONDS: float = 2.0
+    LLM_PROVIDER_MAX_ERRORS: int = 3
+    LLM_PROVIDER_COOLDOWN_SECONDS: float = 30.0
+
+    # LLM response cache settings
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_CACHE_MEMORY_SIZE: int = 256
+    LLM_CACHE_MAX_ENTRIES: int = 10000
+
+    # LLM context settings
+    CONTEXT_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGET: int = 600
+    CONTEXT_MAX_TASKS: int = 20
+    CONTEXT_MAX_EVENTS: int = 10
+    CONTEXT_MAX_RESPONSES: int = 5
+    CONTEXT_EVENT_DAYS: int = 14
+    CONTEXT_CACHE_TTL_SECONDS: int = 300
+    CONTEXT_CACHE_SIZE: int = 256
+
+    # Duplicate task detection settings
+    DEDUP_ENABLED: bool = True
+    DEDUP_POLICY: str = "merge"  # or "reject"
+    DEDUP_THRESHOLD: float = 0.7
+    DEDUP_LSH_BANDS: int = 20
+    DEDUP_LSH_ROWS: int = 5
+
+    # Date parsing settings
+    DATE_PARSE_LANGUAGES: list[str] = ["en"]
+    DATE_PARSE_CACHE_SIZE: int = 4096
+
+    # AI autonomy settings
+    AI_AUTONOMY_FILE_CHECK_SECONDS: float = 5.0
+    AI_AUTONOMY_RELOAD_SECONDS: float = 30.0
+    PENDING_ACTION_CLAIM_TIMEOUT_SECONDS: float = 600.0
+
+    # Prompt delivery settings
+    DELIVERY_WORKERS: int = 50
+    DELIVERY_CHUNK_SIZE: int = 500
+    DELIVERY_RATE_LIMITS: dict[str, float] = {"log": 1000.0, "webhook": 100.0}
+    DELIVERY_WEBHOOK_TIMEOUT: float = 10.0
+
+    # Scheduler settings
+    SCHEDULER_JOBSTORE_URL: str = ""  # defaults to DATABASE_URL with a synchronous driver
+    SCHEDULER_COALESCE: bool = True
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = 3600
+    SCHEDULER_MAX_INSTANCES: int = 1
+    SCHEDULER_LEASE_SECONDS: float = 30.0
+    SCHEDULER_LEASE_RENEW_SECONDS: float = 10.0
 
     # CORS settings
     CORS_ORIGINS: list[str] = ["http://localhost", "http://localhost:3000"]
@@ -33,6 +133,19 @@ class Settings(BaseSettings):
     # Google OAuth settings
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
+    GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS: int = 300
+
+    # TickTick client settings
+    TICKTICK_MAX_CONNECTIONS: int = 10
+    TICKTICK_TIMEOUT: float = 10.0
+    TICKTICK_MAX_RETRIES: int = 3
+    TICKTICK_RETRY_BACKOFF: float = 0.5
+    TICKTICK_MAX_BACKOFF: float = 30.0
+    TICKTICK_SYNC_INTERVAL_MINUTES: int = 5
+
+    # Calendar mirror settings
+    CALENDAR_SYNC_INTERVAL_MINUTES: int = 5
+    CALENDAR_SYNC_LOOKBACK_DAYS: int = 30
 
     class Config:
         env_file = "../.env"
@@ -40,11 +153,11 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-# Debug: Print loaded settings
-print(f"Loaded settings:")
-print(f"ENVIRONMENT: {settings.ENVIRONMENT}")
-print(f"DATABASE_URL: {settings.DATABASE_URL}")
-print(f"ANTHROPIC_API_KEY: {'*' * len(settings.ANTHROPIC_API_KEY)}")  # Don't print the actual key
-print(f"SECRET_KEY: {'*' * len(settings.SECRET_KEY)}")  # Don't print the actual key
-print(f"GOOGLE_CLIENT_ID: {'*' * len(settings.GOOGLE_CLIENT_ID)}")  # Don't print the actual ID
-print(f"GOOGLE_CLIENT_SECRET: {'*' * len(settings.GOOGLE_CLIENT_SECRET)}")  # Don't print the actual secret
\ No newline at end of file
+# Debug: Log loaded settings
+logger.debug("Loaded settings:")
+logger.debug(f"ENVIRONMENT: {settings.ENVIRONMENT}")
+logger.debug(f"DATABASE_URL: {settings.DATABASE_URL}")
+logger.debug(f"ANTHROPIC_API_KEY: {'*' * len(settings.ANTHROPIC_API_KEY)}")  # Don't log the actual key
+logger.debug(f"SECRET_KEY: {'*' * len(settings.SECRET_KEY)}")  # Don't log the actual key
+logger.debug(f"GOOGLE_CLIENT_ID: {'*' * len(settings.GOOGLE_CLIENT_ID)}")  # Don't log the actual ID
+logger.debug(f"GOOGLE_CLIENT_SECRET: {'*' * len(settings.GOOGLE_CLIENT_SECRET)}")  # Don't log the actual secret
@@ -7,19 +7,82 @@ and provides a base class for database models.
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from sqlalchemy.pool import NullPool
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, event, inspect
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from datetime import datetime
 
 from config import settings
 
-# Create async engine
-engine = create_async_engine(settings.DATABASE_URL.replace("sqlite:///", "sqlite+aiosqlite:///"), poolclass=NullPool)
+def _is_memory_database(url: str) -> bool:
+    return ":memory:" in url or url.rstrip("/").endswith("sqlite:")
 
-# Create async session
+def _sqlite_pragmas(read_only: bool = False) -> list:
+    """PRAGMAs applied to every new connection."""
+    pragmas = [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+def create_sqlite_engine(url: str, read_only: bool = False, pool_size: int = None):
+    """
+    Create an async SQLite engine with a bounded connection pool and tuned PRAGMAs.
+
+    Connections are reused across requests instead of being opened per session.
+    In WAL mode readers do not block the writer, so read-only connections get
+    their own pool. In-memory databases use a single shared connection.
+
+    Args:
+        url (str): A sqlite:/// or sqlite+aiosqlite:/// database URL.
+        read_only (bool): Whether connections should refuse writes.
+        pool_size (int, optional): Pool size, defaults to DB_POOL_SIZE.
+
+    Returns:
+        AsyncEngine: The configured engine.
+    """
+    if url.startswith("sqlite:"):
+        url = url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if _is_memory_database(url):
+        pool_options = {"poolclass": StaticPool}
+    else:
+        pool_options = {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": pool_size or settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+    new_engine = create_async_engine(url, **pool_options)
+    pragmas = _sqlite_pragmas(read_only)
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return new_engine
+
+# Create async engines: one for writes, and a read-only pool for GET endpoints
+engine = create_sqlite_engine(settings.DATABASE_URL)
+if _is_memory_database(settings.DATABASE_URL):
+    # A second in-memory engine would be a different, empty database
+    read_engine = engine
+else:
+    read_engine = create_sqlite_engine(settings.DATABASE_URL, read_only=True, pool_size=settings.DB_READ_POOL_SIZE)
+
+# Create async sessions
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+ReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 Base = declarative_base()
 
@@ -33,13 +96,53 @@ class Task(Base):
     completed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+    # Composite indexes backing keyset pagination in task_manager.get_tasks
+    __table_args__ = (
+        Index("ix_tasks_due_date_id", "due_date", "id"),
+        Index("ix_tasks_updated_at_id", "updated_at", "id"),
+        Index("ix_tasks_completed_due_date_id", "completed", "due_date", "id"),
+        Index("ix_tasks_completed_updated_at_id", "completed", "updated_at", "id"),
+    )
+
+def _add_missing_columns(conn):
+    """Add nullable columns added to models after their tables already existed."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+
+def _create_missing_indexes(conn):
+    """Create indexes added to models after their tables already existed."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
 
 async def init_db():
     """Initialize the database by creating all tables."""
     async with engine.begin() as conn:
+        await conn.run_sync(_add_missing_columns)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+
+async def close_db():
+    """Close all pooled database connections."""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 async def get_db():
     """Dependency for database session."""
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_read_db():
+    """Dependency for a read-only database session, used by GET endpoints."""
+    async with ReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,212 @@
+"""
+Local mirror of Google Calendar events.
+
+Events are pulled with the Calendar API's incremental sync (syncToken) into the
+calendar_events table, so reads are served from an indexed local query instead
+of re-listing the calendar from Google on every page load.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Index, String, Text, delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database import AsyncSessionLocal, Base
+from integrations.google_calendar import calendar_service
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_CALENDAR = "primary"
+
+
+class CalendarEvent(Base):
+    __tablename__ = "calendar_events"
+
+    calendar_id = Column(String, primary_key=True)
+    event_id = Column(String, primary_key=True)
+    summary = Column(String)
+    status = Column(String)
+    start_time = Column(DateTime, nullable=True)
+    end_time = Column(DateTime, nullable=True)
+    updated = Column(String)
+    data = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_calendar_events_calendar_start", "calendar_id", "start_time"),
+    )
+
+
+class CalendarSyncState(Base):
+    __tablename__ = "calendar_sync_state"
+
+    calendar_id = Column(String, primary_key=True)
+    sync_token = Column(String, nullable=True)
+    last_synced_at = Column(DateTime, nullable=True)
+
+
+class SyncTokenExpired(Exception):
+    """Raised when Google rejects a sync token with 410 Gone."""
+
+
+_sync_lock = asyncio.Lock()
+
+
+def _to_utc(value: Optional[dict]) -> Optional[datetime]:
+    """Convert a Calendar start/end object to a naive UTC datetime."""
+    if not value:
+        return None
+    if value.get("dateTime"):
+        parsed = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    if value.get("date"):
+        return datetime.fromisoformat(value["date"])
+    return None
+
+
+def _row(calendar_id: str, event: dict) -> dict:
+    return {
+        "calendar_id": calendar_id,
+        "event_id": event["id"],
+        "summary": event.get("summary"),
+        "status": event.get("status"),
+        "start_time": _to_utc(event.get("start")),
+        "end_time": _to_utc(event.get("end")),
+        "updated": event.get("updated"),
+        "data": json.dumps(event),
+    }
+
+
+def _fetch_changes(service, calendar_id: str, sync_token: Optional[str]):
+    """
+    List events changed since sync_token, or all events from the lookback window if None.
+
+    Returns:
+        tuple: (list of events, next sync token)
+
+    Raises:
+        SyncTokenExpired: If the sync token is no longer valid.
+    """
+    from googleapiclient.errors import HttpError
+
+    items = []
+    page_token = None
+    while True:
+        params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": 2500}
+        if page_token:
+            params["pageToken"] = page_token
+        if sync_token:
+            params["syncToken"] = sync_token
+        else:
+            lookback = datetime.utcnow() - timedelta(days=settings.CALENDAR_SYNC_LOOKBACK_DAYS)
+            params["timeMin"] = lookback.isoformat() + "Z"
+        try:
+            result = calendar_service.execute(service.events().list(**params))
+        except HttpError as e:
+            if e.resp.status == 410:
+                raise SyncTokenExpired() from e
+            raise
+        items.extend(result.get("items", []))
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return items, result.get("nextSyncToken")
+
+
+async def upsert_events(session: AsyncSession, events: List[dict], calendar_id: str = PRIMARY_CALENDAR):
+    """Insert or update events in the local mirror, removing cancelled ones. Does not commit."""
+    cancelled = [event["id"] for event in events if event.get("status") == "cancelled"]
+    rows = [_row(calendar_id, event) for event in events if event.get("status") != "cancelled"]
+    if cancelled:
+        await session.execute(
+            delete(CalendarEvent).where(
+                CalendarEvent.calendar_id == calendar_id, CalendarEvent.event_id.in_(cancelled)
+            )
+        )
+    if rows:
+        stmt = insert(CalendarEvent)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CalendarEvent.calendar_id, CalendarEvent.event_id],
+            set_={
+                column: stmt.excluded[column]
+                for column in ("summary", "status", "start_time", "end_time", "updated", "data")
+            },
+        )
+        await session.execute(stmt, rows)
+
+
+async def sync_calendar(calendar_id: str = PRIMARY_CALENDAR) -> dict:
+    """
+    Bring the local mirror up to date using incremental sync.
+
+    A full resync is performed on first use or when Google answers 410 Gone.
+
+    Returns:
+        dict: The number of changed events and whether a full sync was performed.
+    """
+    async with _sync_lock:
+        async with AsyncSessionLocal() as session:
+            state = await session.get(CalendarSyncState, calendar_id)
+            sync_token = state.sync_token if state else None
+            service = await calendar_service.aget_service()
+
+            full_sync = sync_token is None
+            try:
+                items, next_token = await asyncio.to_thread(_fetch_changes, service, calendar_id, sync_token)
+            except SyncTokenExpired:
+                logger.info("Calendar sync token expired, performing a full resync")
+                full_sync = True
+                items, next_token = await asyncio.to_thread(_fetch_changes, service, calendar_id, None)
+
+            if full_sync:
+                await session.execute(delete(CalendarEvent).where(CalendarEvent.calendar_id == calendar_id))
+            await upsert_events(session, items, calendar_id)
+
+            if state is None:
+                state = CalendarSyncState(calendar_id=calendar_id)
+                session.add(state)
+            state.sync_token = next_token
+            state.last_synced_at = datetime.utcnow()
+            await session.commit()
+
+    logger.info(f"Calendar sync of '{calendar_id}' applied {len(items)} changes (full={full_sync})")
+    return {"changes": len(items), "full_sync": full_sync}
+
+
+async def refresh_calendar_mirror():
+    """Background job wrapper around sync_calendar that never raises."""
+    try:
+        await sync_calendar()
+    except Exception as e:
+        logger.warning(f"Background calendar sync failed: {e}")
+
+
+async def has_synced(db: AsyncSession, calendar_id: str = PRIMARY_CALENDAR) -> bool:
+    """Return whether the mirror has completed at least one sync."""
+    state = await db.get(CalendarSyncState, calendar_id)
+    return state is not None and state.last_synced_at is not None
+
+
+async def get_events(db: AsyncSession, start: datetime, end: datetime, calendar_id: str = PRIMARY_CALENDAR):
+    """
+    Retrieve mirrored events overlapping [start, end), ordered by start time.
+
+    Returns:
+        list: Event resources in the Google Calendar API format.
+    """
+    result = await db.execute(
+        select(CalendarEvent.data)
+        .filter(
+            CalendarEvent.calendar_id == calendar_id,
+            CalendarEvent.start_time < end,
+            CalendarEvent.end_time > start,
+        )
+        .order_by(CalendarEvent.start_time)
+    )
+    return [json.loads(data) for data in result.scalars().all()]
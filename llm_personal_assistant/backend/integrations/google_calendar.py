@@ -1,11 +1,11 @@
 import os
+import asyncio
 import logging
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+import threading
+from datetime import datetime, timedelta
 from fastapi import HTTPException, Request
 from fastapi.responses import RedirectResponse
+from config import settings
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -13,35 +13,160 @@ logger = logging.getLogger(__name__)
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly', 'https://www.googleapis.com/auth/calendar.events']
 CLIENT_SECRETS_FILE = "client_secret.json"
 TOKEN_FILE = "token.json"
+# Google Calendar accepts at most 50 calls per batch request.
+BATCH_SIZE = 50
 
-def get_calendar_service():
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = Flow.from_client_secrets_file(CLIENT_SECRETS_FILE, SCOPES)
-            flow.redirect_uri = "http://localhost:8000/oauth2callback"
-            authorization_url, _ = flow.authorization_url(prompt='consent')
-            raise HTTPException(status_code=302, headers={"Location": authorization_url})
-        
+class CalendarServiceHolder:
+    """
+    Process-wide holder for the Google Calendar credentials and service object.
+
+    The token file is read and the service is built once; the credentials are
+    refreshed shortly before they expire, with a lock ensuring only one refresh
+    runs at a time and the new token is saved to the token file. The service's
+    own httplib2 connection is not thread-safe, so requests run in worker
+    threads go through execute(), which uses one connection per thread.
+    """
+
+    def __init__(self, refresh_margin: timedelta):
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._service = None
+        self._local = threading.local()
+
+    def _is_fresh(self):
+        return (
+            self._service is not None
+            and self._credentials is not None
+            and self._is_fresh_credentials(self._credentials)
+        )
+
+    def get_service(self):
+        """Return the cached service, loading or refreshing credentials if needed."""
+        if self._is_fresh():
+            return self._service
+
+        with self._lock:
+            if self._is_fresh():
+                return self._service
+
+            # The Google client libraries are slow to import, so load them on first use
+            from google.oauth2.credentials import Credentials
+            from google.auth.transport.requests import Request as GoogleAuthRequest
+            from google_auth_oauthlib.flow import Flow
+            from googleapiclient.discovery import build
+
+            if self._credentials is None and os.path.exists(TOKEN_FILE):
+                self._credentials = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+
+            creds = self._credentials
+            if creds and creds.refresh_token and not self._is_fresh_credentials(creds):
+                creds.refresh(GoogleAuthRequest())
+                self._save_credentials(creds)
+            elif not creds or not creds.valid:
+                flow = Flow.from_client_secrets_file(CLIENT_SECRETS_FILE, SCOPES)
+                flow.redirect_uri = "http://localhost:8000/oauth2callback"
+                authorization_url, _ = flow.authorization_url(prompt='consent')
+                raise HTTPException(status_code=302, headers={"Location": authorization_url})
+
+            if self._service is None:
+                # The bundled discovery document avoids fetching it over the network.
+                self._service = build(
+                    'calendar', 'v3', credentials=creds, static_discovery=True, cache_discovery=False
+                )
+            return self._service
+
+    async def aget_service(self):
+        """Async variant of get_service that only leaves the event loop to load or refresh."""
+        if self._is_fresh():
+            return self._service
+        return await asyncio.to_thread(self.get_service)
+
+    def set_credentials(self, credentials):
+        """Replace the cached credentials, e.g. after a new OAuth2 consent."""
+        with self._lock:
+            self._credentials = credentials
+            self._service = None
+
+    def new_http(self):
+        """
+        An authorized HTTP object over this thread's connection, for executing requests in a worker thread.
+
+        The credentials are refreshed through get_service() first; AuthorizedHttp
+        itself must not refresh them, as it would do so outside the lock and
+        without saving the new token.
+        """
+        import google_auth_httplib2
+        import httplib2
+
+        self.get_service()
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = httplib2.Http()
+        return google_auth_httplib2.AuthorizedHttp(self._credentials, http=http, refresh_status_codes=())
+
+    def execute(self, request):
+        """
+        Execute a request or batch in the calling thread, refreshing the credentials once on a 401.
+
+        Args:
+            request: A googleapiclient HttpRequest or BatchHttpRequest.
+
+        Returns:
+            The request's response; batch results go to the batch callback.
+        """
+        from googleapiclient.errors import HttpError
+
+        http = self.new_http()
+        try:
+            return request.execute(http=http)
+        except HttpError as e:
+            if e.resp.status != 401:
+                raise
+            self.refresh(http.credentials.token)
+            return request.execute(http=self.new_http())
+
+    def refresh(self, rejected_token):
+        """Refresh and save the credentials after the API rejected rejected_token, unless another thread already has."""
+        from google.auth.transport.requests import Request as GoogleAuthRequest
+
+        with self._lock:
+            creds = self._credentials
+            if creds is None or not creds.refresh_token or creds.token != rejected_token:
+                return
+            logger.info("Refreshing Google credentials after a 401 response")
+            creds.refresh(GoogleAuthRequest())
+            self._save_credentials(creds)
+
+    def invalidate(self):
+        """Forget the cached credentials and service so they are reloaded from disk."""
+        self.set_credentials(None)
+
+    def _save_credentials(self, creds):
         with open(TOKEN_FILE, 'w') as token:
             token.write(creds.to_json())
 
-    return build('calendar', 'v3', credentials=creds)
+    def _is_fresh_credentials(self, creds):
+        return creds.valid and (creds.expiry is None or creds.expiry - datetime.utcnow() > self.refresh_margin)
+
+
+calendar_service = CalendarServiceHolder(
+    refresh_margin=timedelta(seconds=settings.GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS)
+)
+
+def get_calendar_service():
+    return calendar_service.get_service()
 
 async def get_upcoming_events(days=7):
     try:
-        service = get_calendar_service()
+        service = await calendar_service.aget_service()
         now = datetime.utcnow().isoformat() + 'Z'
         time_max = (datetime.utcnow() + timedelta(days=days)).isoformat() + 'Z'
         
-        events_result = service.events().list(calendarId='primary', timeMin=now,
-                                              timeMax=time_max, singleEvents=True,
-                                              orderBy='startTime').execute()
+        request = service.events().list(calendarId='primary', timeMin=now,
+                                        timeMax=time_max, singleEvents=True,
+                                        orderBy='startTime')
+        events_result = await asyncio.to_thread(calendar_service.execute, request)
         events = events_result.get('items', [])
         return events
     except Exception as e:
@@ -49,6 +174,8 @@ async def get_upcoming_events(days=7):
         raise
 
 async def handle_oauth2_callback(request: Request):
+    from google_auth_oauthlib.flow import Flow
+
     try:
         flow = Flow.from_client_secrets_file(
             CLIENT_SECRETS_FILE, 
@@ -63,6 +190,7 @@ async def handle_oauth2_callback(request: Request):
         credentials = flow.credentials
         with open(TOKEN_FILE, 'w') as token:
             token.write(credentials.to_json())
+        calendar_service.set_credentials(credentials)
 
         logger.info("Successfully authenticated with Google Calendar")
         return RedirectResponse(url="http://localhost:3000")
@@ -72,10 +200,54 @@ async def handle_oauth2_callback(request: Request):
 
 async def create_event(event_data):
     try:
-        service = get_calendar_service()
-        event = service.events().insert(calendarId='primary', body=event_data).execute()
+        service = await calendar_service.aget_service()
+        event = await asyncio.to_thread(
+            calendar_service.execute, service.events().insert(calendarId='primary', body=event_data)
+        )
         logger.info(f"Event created: {event.get('htmlLink')}")
         return event
     except Exception as e:
         logger.error(f"Error creating calendar event: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+async def create_events_batch(events_data):
+    """
+    Insert several events using Calendar batch HTTP requests, off the event loop.
+
+    Args:
+        events_data (list): Event resources to insert.
+
+    Returns:
+        list: One {'event': ..., 'error': ...} result per input event, in order.
+    """
+    if not events_data:
+        return []
+    service = await calendar_service.aget_service()
+    return await asyncio.to_thread(_execute_batch, service, events_data)
+
+def _execute_batch(service, events_data):
+    results = [None] * len(events_data)
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        if exception is not None:
+            results[index] = {'event': None, 'error': str(exception)}
+        else:
+            logger.info(f"Event created: {response.get('htmlLink')}")
+            results[index] = {'event': response, 'error': None}
+
+    for start in range(0, len(events_data), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for index in range(start, min(start + BATCH_SIZE, len(events_data))):
+            batch.add(
+                service.events().insert(calendarId='primary', body=events_data[index]),
+                request_id=str(index),
+            )
+        try:
+            calendar_service.execute(batch)
+        except Exception as e:
+            logger.error(f"Error executing calendar batch request: {str(e)}")
+            for index in range(start, min(start + BATCH_SIZE, len(events_data))):
+                if results[index] is None:
+                    results[index] = {'event': None, 'error': str(e)}
+    return results
\ No newline at end of file
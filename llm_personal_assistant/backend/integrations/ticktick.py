@@ -4,12 +4,18 @@ TickTick integration module for the LLM-powered personal assistant.
 This module handles the interaction with the TickTick API for task management.
 """
 
-import requests
+import asyncio
 import os
+import random
 from datetime import datetime, timedelta
 from typing import Optional
 import logging
 
+import httpx
+
+from config import settings
+from retry_after import parse_retry_after
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -22,11 +28,28 @@ TICKTICK_CLIENT_ID = os.environ.get("TICKTICK_CLIENT_ID")
 TICKTICK_CLIENT_SECRET = os.environ.get("TICKTICK_CLIENT_SECRET")
 TICKTICK_REDIRECT_URI = os.environ.get("TICKTICK_REDIRECT_URI")
 
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TickTickAuthError(Exception):
+    """Raised when no usable TickTick credentials are available."""
+
+
 class TickTickAuth:
-    def __init__(self):
+    """
+    OAuth2 token holder for TickTick.
+
+    Refreshes are single-flight: concurrent callers that observe the same
+    expired token wait for one refresh instead of each starting their own.
+    """
+
+    def __init__(self, token_url: str = TICKTICK_TOKEN_URL):
+        self.token_url = token_url
         self.access_token = None
         self.refresh_token = None
         self.expires_at = None
+        self._lock = asyncio.Lock()
+        self.http = None
 
     def get_auth_url(self):
         """Generate the TickTick authorization URL."""
@@ -38,7 +61,7 @@ class TickTickAuth:
         }
         return f"{TICKTICK_AUTH_URL}?{'&'.join(f'{k}={v}' for k, v in params.items())}"
 
-    def get_tokens(self, code):
+    async def get_tokens(self, code):
         """Exchange authorization code for access and refresh tokens."""
         data = {
             "client_id": TICKTICK_CLIENT_ID,
@@ -47,44 +70,159 @@ class TickTickAuth:
             "grant_type": "authorization_code",
             "redirect_uri": TICKTICK_REDIRECT_URI,
         }
-        response = requests.post(TICKTICK_TOKEN_URL, data=data)
-        response.raise_for_status()
-        token_data = response.json()
-        self.access_token = token_data["access_token"]
-        self.refresh_token = token_data["refresh_token"]
-        self.expires_at = datetime.now() + timedelta(seconds=token_data["expires_in"])
-        return token_data
+        async with self._lock:
+            return await self._request_tokens(data)
 
-    def refresh_tokens(self):
-        """Refresh the access token using the refresh token."""
-        data = {
-            "client_id": TICKTICK_CLIENT_ID,
-            "client_secret": TICKTICK_CLIENT_SECRET,
-            "refresh_token": self.refresh_token,
-            "grant_type": "refresh_token",
+    async def refresh_tokens(self, stale_token: Optional[str] = None):
+        """
+        Refresh the access token using the refresh token.
+
+        Args:
+            stale_token (str, optional): The token the caller found expired or rejected.
+                If another caller already replaced it, no new refresh is made.
+        """
+        async with self._lock:
+            if stale_token is not None and self.access_token != stale_token and not self._expired():
+                return None
+            if not self.refresh_token:
+                raise TickTickAuthError("TickTick is not authenticated")
+            data = {
+                "client_id": TICKTICK_CLIENT_ID,
+                "client_secret": TICKTICK_CLIENT_SECRET,
+                "refresh_token": self.refresh_token,
+                "grant_type": "refresh_token",
+            }
+            return await self._request_tokens(data)
+
+    async def get_headers(self):
+        """Get the headers for TickTick API requests, refreshing the token if necessary."""
+        if self._expired():
+            await self.refresh_tokens(stale_token=self.access_token)
+        return {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
         }
-        response = requests.post(TICKTICK_TOKEN_URL, data=data)
+
+    def _expired(self):
+        return not self.access_token or datetime.now() >= self.expires_at
+
+    async def _request_tokens(self, data):
+        response = await self.http.post(self.token_url, data=data)
         response.raise_for_status()
         token_data = response.json()
         self.access_token = token_data["access_token"]
-        self.refresh_token = token_data["refresh_token"]
+        self.refresh_token = token_data.get("refresh_token", self.refresh_token)
         self.expires_at = datetime.now() + timedelta(seconds=token_data["expires_in"])
         return token_data
 
-    def get_headers(self):
-        """Get the headers for TickTick API requests, refreshing the token if necessary."""
-        if not self.access_token or datetime.now() >= self.expires_at:
-            self.refresh_tokens()
-        return {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
+
+class TickTickClient:
+    """
+    Async TickTick API client with a persistent keep-alive connection pool.
+
+    Args:
+        base_url (str): Base URL of the TickTick Open API.
+        auth (TickTickAuth): Token holder used to authorize requests.
+        max_connections (int): Size of the connection pool.
+        timeout (float): Request timeout in seconds.
+        max_retries (int): Number of retries on 429 and 5xx responses.
+        retry_backoff (float): Base delay in seconds for jittered exponential backoff.
+        max_backoff (float): Upper bound in seconds of any retry delay, including
+            one requested by the server with Retry-After.
+        transport (httpx.AsyncBaseTransport, optional): Custom transport, mainly for tests.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            auth: TickTickAuth,
+            max_connections: int = 10,
+            timeout: float = 10.0,
+            max_retries: int = 3,
+            retry_backoff: float = 0.5,
+            max_backoff: float = 30.0,
+            transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.auth = auth
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+        auth.http = self.http
+
+    async def request(self, method, endpoint, data=None):
+        """
+        Make an API request to TickTick with automatic token refresh and retries.
+
+        Args:
+            method (str): HTTP method (e.g., 'GET', 'POST', 'PUT', 'DELETE').
+            endpoint (str): API endpoint.
+            data (dict, optional): Request data for POST or PUT requests.
+
+        Returns:
+            dict: JSON response from the API, or None for an empty body.
+
+        Raises:
+            httpx.HTTPStatusError: If the API request still fails after refresh and retries.
+        """
+        attempt = 0
+        refreshed = False
+        while True:
+            headers = await self.auth.get_headers()
+            try:
+                response = await self.http.request(method, endpoint, headers=headers, json=data)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"An error occurred: {e}")
+                    raise
+                delay = self._retry_delay(attempt)
+            else:
+                if response.status_code == 401 and not refreshed:
+                    logger.info("Attempting to refresh token...")
+                    await self.auth.refresh_tokens(stale_token=headers["Authorization"][len("Bearer "):])
+                    refreshed = True
+                    continue
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    if response.is_error:
+                        logger.error(f"HTTP error occurred: {response.status_code} for {method} {endpoint}")
+                    response.raise_for_status()
+                    return response.json() if response.content else None
+                delay = self._retry_delay(attempt, response.headers.get("retry-after"))
+                logger.warning(f"TickTick returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            # Full jitter keeps concurrent clients from retrying in lockstep.
+            delay = random.uniform(0, self.retry_backoff * (2 ** attempt))
+        return min(delay, self.max_backoff)
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        await self.http.aclose()
+
 
 ticktick_auth = TickTickAuth()
+ticktick_client = TickTickClient(
+    TICKTICK_API_URL,
+    ticktick_auth,
+    max_connections=settings.TICKTICK_MAX_CONNECTIONS,
+    timeout=settings.TICKTICK_TIMEOUT,
+    max_retries=settings.TICKTICK_MAX_RETRIES,
+    retry_backoff=settings.TICKTICK_RETRY_BACKOFF,
+    max_backoff=settings.TICKTICK_MAX_BACKOFF,
+)
 
-def api_request(method, endpoint, data=None):
+async def api_request(method, endpoint, data=None):
     """
-    Make an API request to TickTick with automatic token refresh.
+    Make an API request to TickTick through the shared client.
 
     Args:
         method (str): HTTP method (e.g., 'GET', 'POST', 'PUT', 'DELETE').
@@ -93,37 +231,19 @@ def api_request(method, endpoint, data=None):
 
     Returns:
         dict: JSON response from the API.
-
-    Raises:
-        Exception: If the API request fails after token refresh.
     """
-    try:
-        response = requests.request(method, f"{TICKTICK_API_URL}{endpoint}", headers=ticktick_auth.get_headers(), json=data)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error occurred: {e}")
-        if e.response.status_code == 401:
-            logger.info("Attempting to refresh token...")
-            ticktick_auth.refresh_tokens()
-            response = requests.request(method, f"{TICKTICK_API_URL}{endpoint}", headers=ticktick_auth.get_headers(), json=data)
-            response.raise_for_status()
-            return response.json()
-        raise
-    except Exception as e:
-        logger.error(f"An error occurred: {e}")
-        raise
-
-def get_tasks():
+    return await ticktick_client.request(method, endpoint, data)
+
+async def get_tasks():
     """
     Retrieve tasks from TickTick.
 
     Returns:
         list: A list of tasks.
     """
-    return api_request("GET", "/task")
+    return await api_request("GET", "/task")
 
-def create_task(title: str, description: Optional[str] = None, due_date: Optional[datetime] = None):
+async def create_task(title: str, description: Optional[str] = None, due_date: Optional[datetime] = None):
     """
     Create a new task in TickTick.
 
@@ -140,9 +260,9 @@ def create_task(title: str, description: Optional[str] = None, due_date: Optiona
         "content": description,
         "dueDate": due_date.isoformat() if due_date else None
     }
-    return api_request("POST", "/task", data)
+    return await api_request("POST", "/task", data)
 
-def update_task(task_id: str, title: Optional[str] = None, description: Optional[str] = None,
+async def update_task(task_id: str, title: Optional[str] = None, description: Optional[str] = None,
                 due_date: Optional[datetime] = None, completed: Optional[bool] = None):
     """
     Update an existing task in TickTick.
@@ -167,9 +287,9 @@ def update_task(task_id: str, title: Optional[str] = None, description: Optional
     if completed is not None:
         data["status"] = 2 if completed else 0
 
-    return api_request("POST", f"/task/{task_id}", data)
+    return await api_request("POST", f"/task/{task_id}", data)
 
-def delete_task(task_id: str):
+async def delete_task(task_id: str):
     """
     Delete a task from TickTick.
 
@@ -180,7 +300,7 @@ def delete_task(task_id: str):
         bool: True if the task was successfully deleted, False otherwise.
     """
     try:
-        api_request("DELETE", f"/task/{task_id}")
+        await api_request("DELETE", f"/task/{task_id}")
         return True
-    except requests.exceptions.HTTPError:
+    except httpx.HTTPStatusError:
         return False
\ No newline at end of file
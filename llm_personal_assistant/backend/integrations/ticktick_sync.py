@@ -0,0 +1,219 @@
+"""
+Local replica of TickTick tasks.
+
+Tasks are mirrored into the ticktick_tasks table by a periodic delta sync
+(rows are only rewritten when their modifiedTime moved past the stored
+watermark) and by write-through on create/update/delete, so task listings are
+served locally instead of fetching the whole remote list on every request.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, Base
+from integrations import ticktick
+
+logger = logging.getLogger(__name__)
+
+COMPLETED_STATUS = 2
+SYNC_STATE_KEY = "tasks"
+
+
+class TickTickTask(Base):
+    __tablename__ = "ticktick_tasks"
+
+    id = Column(String, primary_key=True)
+    project_id = Column(String, nullable=True)
+    title = Column(String)
+    due_date = Column(DateTime, nullable=True)
+    status = Column(Integer, default=0)
+    modified_time = Column(DateTime, nullable=True)
+    data = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_ticktick_tasks_status_due_date_id", "status", "due_date", "id"),
+        Index("ix_ticktick_tasks_project_id", "project_id"),
+    )
+
+
+class TickTickSyncState(Base):
+    __tablename__ = "ticktick_sync_state"
+
+    key = Column(String, primary_key=True)
+    watermark = Column(DateTime, nullable=True)
+    last_synced_at = Column(DateTime, nullable=True)
+
+
+_sync_lock = asyncio.Lock()
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse a TickTick timestamp such as '2024-09-04T10:00:00.000+0000' to naive UTC."""
+    if not value:
+        return None
+    value = re.sub(r"([+-]\d{2})(\d{2})$", r"\1:\2", value.replace("Z", "+00:00"))
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        logger.error(f"Unable to parse TickTick timestamp: {value}")
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _row(task: dict) -> dict:
+    return {
+        "id": task["id"],
+        "project_id": task.get("projectId"),
+        "title": task.get("title"),
+        "due_date": _parse_time(task.get("dueDate")),
+        "status": task.get("status", 0),
+        "modified_time": _parse_time(task.get("modifiedTime")),
+        "data": json.dumps(task),
+    }
+
+
+async def store_tasks(db: AsyncSession, tasks: list):
+    """Insert or update tasks in the replica. Does not commit."""
+    rows = [_row(task) for task in tasks if isinstance(task, dict) and task.get("id")]
+    if not rows:
+        return
+    stmt = insert(TickTickTask)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TickTickTask.id],
+        set_={
+            column: stmt.excluded[column]
+            for column in ("project_id", "title", "due_date", "status", "modified_time", "data")
+        },
+    )
+    await db.execute(stmt, rows)
+
+
+async def sync_tasks() -> dict:
+    """
+    Bring the replica up to date with TickTick.
+
+    Only tasks whose modifiedTime is newer than the stored watermark are
+    rewritten; tasks that disappeared remotely are removed locally.
+
+    Returns:
+        dict: The number of updated and removed tasks.
+    """
+    async with _sync_lock:
+        remote = await ticktick.get_tasks() or []
+        async with AsyncSessionLocal() as session:
+            state = await session.get(TickTickSyncState, SYNC_STATE_KEY)
+            if state is None:
+                state = TickTickSyncState(key=SYNC_STATE_KEY)
+                session.add(state)
+            watermark = state.watermark
+            local_ids = set((await session.execute(select(TickTickTask.id))).scalars().all())
+
+            changed = []
+            newest = watermark
+            for task in remote:
+                modified = _parse_time(task.get("modifiedTime"))
+                if watermark is None or modified is None or modified > watermark or task.get("id") not in local_ids:
+                    changed.append(task)
+                if modified and (newest is None or modified > newest):
+                    newest = modified
+            await store_tasks(session, changed)
+
+            remote_ids = {task.get("id") for task in remote}
+            removed = [task_id for task_id in local_ids if task_id not in remote_ids]
+            for start in range(0, len(removed), 500):
+                await session.execute(delete(TickTickTask).where(TickTickTask.id.in_(removed[start:start + 500])))
+
+            state.watermark = newest
+            state.last_synced_at = datetime.utcnow()
+            await session.commit()
+
+    logger.info(f"TickTick sync updated {len(changed)} and removed {len(removed)} tasks")
+    return {"updated": len(changed), "removed": len(removed)}
+
+
+async def refresh_ticktick_replica():
+    """Background job wrapper around sync_tasks that never raises."""
+    try:
+        await sync_tasks()
+    except Exception as e:
+        logger.warning(f"Background TickTick sync failed: {e}")
+
+
+async def get_tasks(
+        db: AsyncSession,
+        max_staleness: Optional[int] = None,
+        completed: Optional[bool] = None,
+        project_id: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+):
+    """
+    Retrieve TickTick tasks from the local replica.
+
+    Args:
+        db (AsyncSession): The database session.
+        max_staleness (int, optional): Maximum acceptable age of the replica in seconds;
+            an older replica is synced before reading. The replica is always synced
+            before its first read.
+        completed (bool, optional): Only return completed or open tasks.
+        project_id (str, optional): Only return tasks of this project.
+        skip (int): Number of tasks to skip.
+        limit (int): Maximum number of tasks to return.
+
+    Returns:
+        list: Tasks in the TickTick API format, ordered by due date.
+    """
+    state = await db.get(TickTickSyncState, SYNC_STATE_KEY)
+    last_synced_at = state.last_synced_at if state else None
+    if last_synced_at is None or (
+            max_staleness is not None and datetime.utcnow() - last_synced_at > timedelta(seconds=max_staleness)
+    ):
+        await sync_tasks()
+
+    query = select(TickTickTask.data)
+    if completed is not None:
+        status_filter = TickTickTask.status == COMPLETED_STATUS
+        query = query.filter(status_filter if completed else ~status_filter)
+    if project_id is not None:
+        query = query.filter(TickTickTask.project_id == project_id)
+    query = query.order_by(TickTickTask.due_date, TickTickTask.id).offset(skip).limit(limit)
+    result = await db.execute(query)
+    return [json.loads(data) for data in result.scalars().all()]
+
+
+async def create_task(db: AsyncSession, title: str, description: Optional[str] = None,
+                      due_date: Optional[datetime] = None):
+    """Create a task in TickTick and write it through to the replica."""
+    task = await ticktick.create_task(title, description, due_date)
+    await store_tasks(db, [task])
+    await db.commit()
+    return task
+
+
+async def update_task(db: AsyncSession, task_id: str, title: Optional[str] = None,
+                      description: Optional[str] = None, due_date: Optional[datetime] = None,
+                      completed: Optional[bool] = None):
+    """Update a task in TickTick and write it through to the replica."""
+    task = await ticktick.update_task(task_id, title, description, due_date, completed)
+    await store_tasks(db, [task])
+    await db.commit()
+    return task
+
+
+async def delete_task(db: AsyncSession, task_id: str):
+    """Delete a task from TickTick and from the replica."""
+    success = await ticktick.delete_task(task_id)
+    if success:
+        await db.execute(delete(TickTickTask).where(TickTickTask.id == task_id))
+        await db.commit()
+    return success
@@ -0,0 +1,66 @@
+"""
+Named leases in the database.
+
+A lease gives one process at a time the right to do some work, such as
+running the scheduled jobs when the API runs with several workers. It is
+held until its holder releases it or stops renewing it before it expires.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, String, delete
+from sqlalchemy.dialects.sqlite import insert
+
+from database import AsyncSessionLocal, Base, engine
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+async def acquire_lease(name: str, holder: str, ttl_seconds: float, session_factory=None) -> bool:
+    """
+    Take or renew a named lease with a single atomic upsert.
+
+    The lease is granted when nobody holds it, when `holder` already holds it,
+    or when the previous holder let it expire.
+
+    Args:
+        name (str): The lease name.
+        holder (str): Identifies the caller, e.g. host and process ID.
+        ttl_seconds (float): How long the lease stays valid without renewal.
+        session_factory (optional): Session factory, defaults to AsyncSessionLocal.
+
+    Returns:
+        bool: Whether `holder` holds the lease now.
+    """
+    now = datetime.utcnow()
+    stmt = insert(SchedulerLease).values(name=name, holder=holder, expires_at=now + timedelta(seconds=ttl_seconds))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SchedulerLease.name],
+        set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+        where=(SchedulerLease.holder == holder) | (SchedulerLease.expires_at < now),
+    ).returning(SchedulerLease.holder)
+    async with (session_factory or AsyncSessionLocal)() as session:
+        acquired = (await session.execute(stmt)).first() is not None
+        await session.commit()
+    return acquired
+
+
+async def release_lease(name: str, holder: str, session_factory=None):
+    """Give up a lease held by `holder`, so another process can take it over at once."""
+    async with (session_factory or AsyncSessionLocal)() as session:
+        await session.execute(
+            delete(SchedulerLease).where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+        )
+        await session.commit()
+
+
+async def init_leases():
+    """Create the leases table if it does not exist yet."""
+    async with engine.begin() as conn:
+        await conn.run_sync(SchedulerLease.__table__.create, checkfirst=True)
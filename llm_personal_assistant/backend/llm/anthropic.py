@@ -1,18 +1,22 @@
 """
-Anthropic LLM integration module for the personal assistant.
+General LLM helpers for the personal assistant.
 
-This module provides functions to interact with the Anthropic API
-for natural language processing tasks.
+This module provides functions for open-ended natural language processing
+tasks. Requests are 'analysis' calls, which the LLM router sends to the
+larger models.
 """
 
-import anthropic
-from config import settings
+import json
+import logging
 
-client = anthropic.Client(api_key=settings.ANTHROPIC_API_KEY)
+from llm.cache import llm_cache
+from llm.router import ANALYSIS, get_router
+
+logger = logging.getLogger(__name__)
 
 async def generate_response(prompt: str, max_tokens: int = 1000) -> str:
     """
-    Generate a response using the Anthropic LLM.
+    Generate a response using the model the router picks for analysis calls.
 
     Args:
         prompt (str): The input prompt for the LLM.
@@ -22,23 +26,19 @@ async def generate_response(prompt: str, max_tokens: int = 1000) -> str:
         str: The generated response from the LLM.
     """
     try:
-        response = client.completion(
-            prompt=f"{anthropic.HUMAN_PROMPT} {prompt}{anthropic.AI_PROMPT}",
-            model="claude-2.0",
-            max_tokens_to_sample=max_tokens,
-            stop_sequences=[anthropic.HUMAN_PROMPT],
-        )
-        return response.completion.strip()
+        completion = await get_router().complete(ANALYSIS, "", prompt, max_tokens=max_tokens)
+        return completion.text.strip()
     except Exception as e:
-        print(f"Error in generate_response: {e}")
+        logger.error(f"Error in generate_response: {e}")
         return "I apologize, but I encountered an error while processing your request."
 
-async def analyze_task(task_description: str) -> dict:
+async def analyze_task(task_description: str, use_cache: bool = True) -> dict:
     """
     Analyze a task description and extract key information.
 
     Args:
         task_description (str): The description of the task.
+        use_cache (bool): Whether to answer identical descriptions from the LLM response cache.
 
     Returns:
         dict: A dictionary containing analyzed task information.
@@ -55,10 +55,14 @@ async def analyze_task(task_description: str) -> dict:
 
     Format the response as a JSON object.
     """
-    response = await generate_response(prompt)
-    # Note: In a production environment, you'd want to add error handling
-    # and validation for the JSON parsing.
-    import json
-    return json.loads(response)
+
+    async def compute():
+        response = await generate_response(prompt)
+        # Note: In a production environment, you'd want to add error handling
+        # and validation for the JSON parsing.
+        return json.loads(response)
+
+    key = llm_cache.make_key(ANALYSIS, "analyze_task", prompt)
+    return await llm_cache.get_or_compute(key, compute, bypass=not use_cache)
 
 # Add more functions as needed for different LLM interactions
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""
+Content-addressed cache for LLM responses.
+
+Responses are keyed on a hash of the call type, system prompt and input so
+that identical requests never hit the paid API twice, whichever provider the
+router picked for them. A bounded in-process LRU tier
+sits in front of a SQLite-backed tier; both tiers expire entries after a TTL.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from cachetools import TTLCache
+from sqlalchemy import Column, DateTime, String, Text, delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import settings
+from database import AsyncSessionLocal, Base
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class LLMResponseCache:
+    """
+    Two-tier (memory, then SQLite) LRU cache with TTL for decoded LLM responses.
+
+    Args:
+        ttl_seconds (int): Time to live of an entry in both tiers.
+        memory_size (int): Maximum number of entries kept in process memory.
+        max_entries (int): Maximum number of entries kept in the database.
+        enabled (bool): Whether the cache is consulted at all.
+        session_factory (optional): Session factory of the SQLite tier, defaults to AsyncSessionLocal.
+    """
+
+    def __init__(
+            self,
+            ttl_seconds: int,
+            memory_size: int,
+            max_entries: int,
+            enabled: bool = True,
+            session_factory=AsyncSessionLocal,
+    ):
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._memory = TTLCache(maxsize=memory_size, ttl=ttl_seconds)
+        self._inflight = {}
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "bypassed": 0}
+
+    @staticmethod
+    def make_key(call_type: str, system_prompt: str, user_input: str) -> str:
+        """Return the content hash identifying a request of a router call type."""
+        payload = json.dumps([call_type, system_prompt, user_input], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str):
+        """Return the cached value for a key, or None on a miss."""
+        if key in self._memory:
+            self.stats["memory_hits"] += 1
+            return self._memory[key]
+
+        value = await self._db_get(key)
+        if value is not None:
+            self.stats["db_hits"] += 1
+            self._memory[key] = value
+            return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value):
+        """Store a JSON-serializable value in both tiers."""
+        self._memory[key] = value
+        await self._db_set(key, value)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable], bypass: bool = False):
+        """
+        Return the cached value for a key, computing and storing it on a miss.
+
+        Concurrent misses for the same key share a single computation.
+
+        Args:
+            key (str): The cache key, see make_key.
+            compute (callable): Coroutine function producing the value.
+            bypass (bool): Skip the cache lookup (the fresh result is still stored).
+
+        Returns:
+            The cached or freshly computed value.
+        """
+        if not self.enabled:
+            return await compute()
+
+        if bypass:
+            self.stats["bypassed"] += 1
+        else:
+            value = await self.get(key)
+            if value is not None:
+                return value
+            if key in self._inflight:
+                return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            await self.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else awaited it.
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear_memory(self):
+        """Drop the in-process tier."""
+        self._memory.clear()
+
+    async def _db_get(self, key: str):
+        now = datetime.utcnow()
+        try:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    select(LLMCacheEntry.value).filter(
+                        LLMCacheEntry.key == key,
+                        LLMCacheEntry.created_at >= now - self.ttl,
+                    )
+                )
+                value = result.scalar_one_or_none()
+                if value is None:
+                    return None
+                await session.execute(
+                    update(LLMCacheEntry).where(LLMCacheEntry.key == key).values(accessed_at=now),
+                    execution_options={"synchronize_session": False},
+                )
+                await session.commit()
+                return json.loads(value)
+        except SQLAlchemyError as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+    async def _db_set(self, key: str, value):
+        now = datetime.utcnow()
+        stmt = insert(LLMCacheEntry).values(
+            key=key, value=json.dumps(value), created_at=now, accessed_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LLMCacheEntry.key],
+            set_={"value": stmt.excluded.value, "created_at": now, "accessed_at": now},
+        )
+        try:
+            async with self.session_factory() as session:
+                await session.execute(stmt)
+                await session.execute(
+                    delete(LLMCacheEntry).where(LLMCacheEntry.created_at < now - self.ttl),
+                    execution_options={"synchronize_session": False},
+                )
+                count = (await session.execute(select(func.count()).select_from(LLMCacheEntry))).scalar()
+                if count > self.max_entries:
+                    oldest = (
+                        select(LLMCacheEntry.key)
+                        .order_by(LLMCacheEntry.accessed_at)
+                        .limit(count - self.max_entries)
+                    )
+                    await session.execute(
+                        delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest)),
+                        execution_options={"synchronize_session": False},
+                    )
+                await session.commit()
+        except SQLAlchemyError as e:
+            logger.warning(f"LLM cache store failed: {e}")
+
+
+llm_cache = LLMResponseCache(
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    memory_size=settings.LLM_CACHE_MEMORY_SIZE,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    enabled=settings.LLM_CACHE_ENABLED,
+)
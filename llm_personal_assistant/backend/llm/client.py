@@ -0,0 +1,242 @@
+"""
+Async HTTP client for the Anthropic API.
+
+This module keeps a single long-lived, pooled (optionally HTTP/2) connection to
+the LLM API so that prompt analysis never blocks the event loop. Concurrency,
+timeouts and retries are driven by the application settings.
+"""
+
+import asyncio
+import json
+import logging
+import random
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+from config import settings
+from retry_after import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def h2_available() -> bool:
+    """Whether the h2 package httpx needs for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class LLMClient:
+    """
+    Pooled async client for the Anthropic Messages API.
+
+    Args:
+        base_url (str): Base URL of the API (overridable for local stub servers).
+        api_key (str): The Anthropic API key.
+        api_version (str): Value of the 'anthropic-version' header.
+        max_concurrency (int): Maximum number of in-flight requests.
+        max_connections (int): Size of the underlying connection pool.
+        connect_timeout (float): Connection timeout in seconds.
+        read_timeout (float): Read timeout in seconds.
+        max_retries (int): Number of retries on transient failures.
+        retry_backoff (float): Base delay in seconds for exponential backoff.
+        max_backoff (float): Upper bound in seconds of any retry delay, including
+            one requested by the server with Retry-After.
+        http2 (bool): Whether to negotiate HTTP/2; falls back to HTTP/1.1 when
+            the h2 package is not installed.
+        transport (httpx.AsyncBaseTransport, optional): Custom transport, mainly for tests.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            api_key: str,
+            api_version: str,
+            max_concurrency: int = 8,
+            max_connections: int = 20,
+            connect_timeout: float = 5.0,
+            read_timeout: float = 60.0,
+            max_retries: int = 3,
+            retry_backoff: float = 0.5,
+            max_backoff: float = 30.0,
+            http2: bool = True,
+            transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        if http2 and not h2_available():
+            logger.warning("The h2 package is not installed; using HTTP/1.1 for the LLM API")
+            http2 = False
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "Content-Type": "application/json",
+                "x-api-key": api_key,
+                "anthropic-version": api_version,
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            http2=http2,
+            transport=transport,
+        )
+
+    async def create_message(
+            self,
+            messages: List[dict],
+            model: str,
+            max_tokens: int = 300,
+            system: Optional[str] = None,
+    ) -> dict:
+        """
+        Request a message from the Messages API, retrying transient failures with backoff.
+
+        Args:
+            messages (list): The conversation, e.g. [{'role': 'user', 'content': '...'}].
+            model (str): The model name.
+            max_tokens (int): Maximum number of tokens to generate.
+            system (str, optional): The system prompt.
+
+        Returns:
+            dict: The decoded JSON response from the API.
+
+        Raises:
+            httpx.HTTPError: If the request still fails after all retries.
+        """
+        response = await self._post("/v1/messages", self._message_body(messages, model, max_tokens, system))
+        return response.json()
+
+    async def stream_message(
+            self,
+            messages: List[dict],
+            model: str,
+            max_tokens: int = 300,
+            system: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Request a streamed message and yield its text deltas as they arrive.
+
+        Transient failures are retried only until the first byte of the stream
+        has been received.
+
+        Args:
+            messages (list): The conversation, e.g. [{'role': 'user', 'content': '...'}].
+            model (str): The model name.
+            max_tokens (int): Maximum number of tokens to generate.
+            system (str, optional): The system prompt.
+
+        Yields:
+            str: The next piece of the message text.
+
+        Raises:
+            httpx.HTTPError: If the request fails after all retries.
+            ValueError: If the API reports an error inside the stream.
+        """
+        data = {**self._message_body(messages, model, max_tokens, system), "stream": True}
+        attempt = 0
+        started = False
+        while True:
+            try:
+                async with self._semaphore:
+                    async with self._client.stream("POST", "/v1/messages", json=data) as response:
+                        if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                            delay = self._retry_delay(attempt, response.headers.get("retry-after"))
+                            logger.warning(f"LLM API returned {response.status_code}, retrying in {delay:.2f}s")
+                        else:
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                payload = json.loads(line[len("data:"):].strip() or "{}")
+                                if payload.get("type") == "error":
+                                    raise ValueError(f"LLM stream error: {payload.get('error', payload)}")
+                                delta = payload.get("delta", {})
+                                if payload.get("type") == "content_block_delta" and delta.get("type") == "text_delta":
+                                    started = True
+                                    yield delta["text"]
+                            return
+            except httpx.TransportError as e:
+                if started or attempt >= self.max_retries:
+                    logger.error(f"LLM API request failed: {e}")
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"LLM API transport error ({e}), retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _message_body(messages: List[dict], model: str, max_tokens: int, system: Optional[str]) -> dict:
+        data = {"model": model, "max_tokens": max_tokens, "messages": messages}
+        if system:
+            data["system"] = system
+        return data
+
+    async def _post(self, url: str, data: dict) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(url, json=data)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._retry_delay(attempt, response.headers.get("retry-after"))
+                logger.warning(f"LLM API returned {response.status_code}, retrying in {delay:.2f}s")
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"LLM API request failed: {e}")
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"LLM API transport error ({e}), retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = self.retry_backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+        return min(delay, self.max_backoff)
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        await self._client.aclose()
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Return the process-wide LLM client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = LLMClient(
+            base_url=settings.ANTHROPIC_API_BASE_URL,
+            api_key=settings.ANTHROPIC_API_KEY,
+            api_version=settings.ANTHROPIC_API_VERSION,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+            read_timeout=settings.LLM_READ_TIMEOUT,
+            max_retries=settings.LLM_MAX_RETRIES,
+            retry_backoff=settings.LLM_RETRY_BACKOFF,
+            max_backoff=settings.LLM_MAX_BACKOFF,
+            http2=settings.LLM_HTTP2,
+        )
+    return _client
+
+
+async def close_llm_client():
+    """Close the process-wide LLM client if it was created."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
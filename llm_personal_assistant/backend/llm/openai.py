@@ -0,0 +1,78 @@
+"""
+OpenAI chat completion provider.
+
+Used by the LLM router next to the Anthropic models when an OpenAI API key
+is configured. Failed requests are not retried here: the router falls back
+to another provider instead.
+"""
+
+import json
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from config import settings
+from llm.providers import Provider
+
+
+class OpenAIProvider(Provider):
+    """
+    An OpenAI chat model.
+
+    Args:
+        model (str): The model name, e.g. 'gpt-4o-mini'.
+        api_key (str): The OpenAI API key.
+        base_url (str): Base URL of the API (overridable for local stub servers).
+        input_cost (float): USD per 1000 input tokens.
+        output_cost (float): USD per 1000 output tokens.
+        transport (httpx.AsyncBaseTransport, optional): Custom transport, mainly for tests.
+    """
+
+    def __init__(
+            self,
+            model: str,
+            api_key: str,
+            base_url: str = "https://api.openai.com",
+            input_cost: float = 0.0,
+            output_cost: float = 0.0,
+            transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        super().__init__(f"openai:{model}", model, input_cost, output_cost)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+
+    def _body(self, system_prompt: str, user_prompt: str, max_tokens: int) -> dict:
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": user_prompt})
+        return {"model": self.model, "messages": messages, "max_tokens": max_tokens}
+
+    async def complete(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        response = await self._client.post("/v1/chat/completions", json=self._body(system_prompt, user_prompt, max_tokens))
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"].get("content") or ""
+
+    async def stream(self, system_prompt: str, user_prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        data = {**self._body(system_prompt, user_prompt, max_tokens), "stream": True}
+        async with self._client.stream("POST", "/v1/chat/completions", json=data) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    return
+                choices = json.loads(payload).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,87 @@
+"""
+LLM providers behind a common interface.
+
+A provider is one model of one LLM API. Callers pass a system prompt and a
+user prompt and get completion text back, whichever API answers, so the
+router can choose between providers per call. Each provider knows its price,
+which the router uses to estimate the cost of a request.
+"""
+
+import math
+from typing import AsyncIterator, Optional
+
+from llm.client import LLMClient, get_llm_client
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English text."""
+    return math.ceil(len(text) / 4)
+
+
+class Provider:
+    """
+    A model behind an LLM API.
+
+    Args:
+        name (str): Unique name, '<api>:<model>' for the built-in providers.
+        model (str): The model name sent to the API.
+        input_cost (float): USD per 1000 input tokens.
+        output_cost (float): USD per 1000 output tokens.
+    """
+
+    def __init__(self, name: str, model: str, input_cost: float = 0.0, output_cost: float = 0.0):
+        self.name = name
+        self.model = model
+        self.input_cost = input_cost
+        self.output_cost = output_cost
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        """The price in USD of a request of the given size."""
+        return (input_tokens * self.input_cost + output_tokens * self.output_cost) / 1000
+
+    async def complete(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        """Return the completion text for a request."""
+        raise NotImplementedError
+
+    async def stream(self, system_prompt: str, user_prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        """Yield the completion text in pieces; providers without streaming yield it whole."""
+        yield await self.complete(system_prompt, user_prompt, max_tokens)
+
+    async def aclose(self):
+        """Release connections held by the provider."""
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class AnthropicProvider(Provider):
+    """
+    An Anthropic model behind the Messages API, called through the shared, retrying LLMClient.
+
+    Args:
+        model (str): The model name, e.g. 'claude-haiku-4-5'.
+        input_cost (float): USD per 1000 input tokens.
+        output_cost (float): USD per 1000 output tokens.
+        client (LLMClient, optional): The client to use, defaults to the process-wide one.
+    """
+
+    def __init__(self, model: str, input_cost: float = 0.0, output_cost: float = 0.0, client: Optional[LLMClient] = None):
+        super().__init__(f"anthropic:{model}", model, input_cost, output_cost)
+        self._client = client
+
+    @property
+    def client(self) -> LLMClient:
+        return self._client or get_llm_client()
+
+    async def complete(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        result = await self.client.create_message(
+            [{"role": "user", "content": user_prompt}], self.model, max_tokens, system=system_prompt
+        )
+        return "".join(block.get("text", "") for block in result.get("content", []) if block.get("type") == "text")
+
+    async def stream(self, system_prompt: str, user_prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        chunks = self.client.stream_message(
+            [{"role": "user", "content": user_prompt}], self.model, max_tokens, system=system_prompt
+        )
+        async for chunk in chunks:
+            yield chunk
@@ -0,0 +1,371 @@
+"""
+Model selection across LLM providers.
+
+Every LLM request names a call type instead of a model: 'extraction' turns
+prompt responses into tasks and events and should be cheap and fast,
+'analysis' is open-ended and may use a larger model. LLM_ROUTES lists the
+providers allowed for each call type, in order of preference; by default the
+routes are built from the fast and large model settings of each API.
+
+The router measures the latency of every provider over a rolling window and
+picks the cheapest provider whose p95 latency is within the call type's
+target; providers that are too slow are only used when nothing else is.
+When the chosen provider takes longer than its usual p95, the request is
+hedged: the next provider is asked as well and the first answer wins. Errors
+fall back to the next provider, and a provider that keeps failing is skipped
+for a cooldown period.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from config import settings
+from llm.openai import OpenAIProvider
+from llm.providers import AnthropicProvider, Provider, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Call types
+EXTRACTION = "extraction"
+ANALYSIS = "analysis"
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no provider could answer an LLM request."""
+
+
+@dataclass
+class Completion:
+    text: str
+    provider: str
+    latency: float
+    cost: float
+
+
+class ProviderStats:
+    """Rolling latency window and error counters of one provider."""
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.measured_at = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.cost = 0.0
+        self.unavailable_until = 0.0
+
+    def record_latency(self, seconds: float):
+        self.latencies.append(seconds)
+        self.measured_at = time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile (q between 0 and 1) of the window, None while it is empty."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class LLMRouter:
+    """
+    Routes LLM requests to providers by call type, measured latency and cost.
+
+    Args:
+        providers (list): The available providers.
+        routes (dict): Provider names per call type, in order of preference.
+        latency_targets (dict, optional): Acceptable p95 latency in seconds per call type.
+        window (int): Number of latency samples kept per provider.
+        min_samples (int): Samples needed before a provider's percentiles are trusted.
+        max_age_seconds (float): Samples older than this are dropped, so a
+            provider that was too slow gets tried again.
+        hedge (bool): Whether slow requests are hedged with a second provider.
+        hedge_min_seconds (float): Never hedge before this many seconds.
+        max_errors (int): Consecutive errors after which a provider is skipped.
+        cooldown_seconds (float): How long a failing provider is skipped.
+    """
+
+    def __init__(
+            self,
+            providers: List[Provider],
+            routes: Dict[str, List[str]],
+            latency_targets: Optional[Dict[str, float]] = None,
+            window: int = 200,
+            min_samples: int = 20,
+            max_age_seconds: float = 600.0,
+            hedge: bool = True,
+            hedge_min_seconds: float = 2.0,
+            max_errors: int = 3,
+            cooldown_seconds: float = 30.0,
+    ):
+        self.providers = {provider.name: provider for provider in providers}
+        self.routes = {
+            call_type: [name for name in names if name in self.providers] for call_type, names in routes.items()
+        }
+        self.latency_targets = latency_targets or {}
+        self.min_samples = min_samples
+        self.max_age_seconds = max_age_seconds
+        self.hedge = hedge
+        self.hedge_min_seconds = hedge_min_seconds
+        self.max_errors = max_errors
+        self.cooldown_seconds = cooldown_seconds
+        self._stats = {name: ProviderStats(window) for name in self.providers}
+        self.counters = {"hedges": 0, "fallbacks": 0}
+
+    def p95(self, name: str) -> Optional[float]:
+        """A provider's p95 latency, None until enough recent samples were taken."""
+        stats = self._stats[name]
+        if stats.latencies and time.monotonic() - stats.measured_at > self.max_age_seconds:
+            stats.latencies.clear()
+        if len(stats.latencies) < self.min_samples:
+            return None
+        return stats.percentile(0.95)
+
+    def select(self, call_type: str, input_tokens: int = 0, max_tokens: int = 0) -> List[Provider]:
+        """
+        The providers for a call type, best first.
+
+        Available providers come before those cooling down after errors. Among
+        them, providers within the latency target (or not measured yet) come
+        first, cheapest first; the others follow, fastest first. Ties keep the
+        order of the route.
+        """
+        target = self.latency_targets.get(call_type)
+        now = time.monotonic()
+
+        def rank(provider):
+            p95 = self.p95(provider.name)
+            fast_enough = p95 is None or target is None or p95 <= target
+            return (
+                self._stats[provider.name].unavailable_until > now,
+                not fast_enough,
+                provider.cost(input_tokens, max_tokens) if fast_enough else p95,
+            )
+
+        return sorted((self.providers[name] for name in self.routes.get(call_type, [])), key=rank)
+
+    def hedge_after(self, provider: Provider, call_type: str) -> Optional[float]:
+        """Seconds after which a request to `provider` is hedged, None if it is not."""
+        if not self.hedge:
+            return None
+        deadline = self.p95(provider.name) or self.latency_targets.get(call_type)
+        return max(self.hedge_min_seconds, deadline) if deadline is not None else None
+
+    async def complete(self, call_type: str, system_prompt: str, user_prompt: str, max_tokens: int = 300) -> Completion:
+        """
+        Complete a request with the best provider for its call type.
+
+        Args:
+            call_type (str): EXTRACTION, ANALYSIS or another routed call type.
+            system_prompt (str): Instructions for the model.
+            user_prompt (str): The input to work on.
+            max_tokens (int): Maximum number of tokens to generate.
+
+        Returns:
+            Completion: The text and which provider produced it.
+
+        Raises:
+            LLMUnavailableError: If no provider is routed for the call type or all of them failed.
+        """
+        input_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        remaining = self.select(call_type, input_tokens, max_tokens)
+        if not remaining:
+            raise LLMUnavailableError(f"No LLM provider is configured for {call_type!r} calls")
+        loop = asyncio.get_running_loop()
+        in_flight = {}  # task -> (provider, start time)
+        errors = []
+
+        def launch():
+            provider = remaining.pop(0)
+            task = asyncio.create_task(self._call(provider, system_prompt, user_prompt, max_tokens, input_tokens))
+            in_flight[task] = (provider, loop.time())
+
+        launch()
+        try:
+            while in_flight:
+                timeout = None
+                if remaining and len(in_flight) == 1:
+                    [(provider, started)] = in_flight.values()
+                    deadline = self.hedge_after(provider, call_type)
+                    if deadline is not None:
+                        timeout = max(0.0, started + deadline - loop.time())
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"{provider.name} is slower than {timeout:.1f}s, hedging with {remaining[0].name}")
+                    self.counters["hedges"] += 1
+                    launch()
+                    continue
+                results = []
+                for task in done:
+                    provider, _ = in_flight.pop(task)
+                    if task.exception() is None:
+                        results.append(task.result())
+                    else:
+                        errors.append(f"{provider.name}: {task.exception()!r}")
+                        logger.warning(f"LLM provider {provider.name} failed: {task.exception()!r}")
+                if results:
+                    return results[0]
+                if not in_flight and remaining:
+                    self.counters["fallbacks"] += 1
+                    launch()
+        finally:
+            # The losers of a hedge
+            for task in in_flight:
+                task.cancel()
+        raise LLMUnavailableError(f"All LLM providers failed for {call_type!r} calls: {'; '.join(errors)}")
+
+    async def stream(self, call_type: str, system_prompt: str, user_prompt: str, max_tokens: int = 300) -> AsyncIterator[str]:
+        """
+        Stream a completion from the best provider for its call type.
+
+        Falls back to the next provider when one fails before sending anything.
+        Streams are not hedged, as their pieces cannot be taken from two providers.
+
+        Yields:
+            str: The next piece of the completion.
+
+        Raises:
+            LLMUnavailableError: If no provider is routed for the call type or all of them failed.
+        """
+        input_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        errors = []
+        for position, provider in enumerate(self.select(call_type, input_tokens, max_tokens)):
+            if position:
+                self.counters["fallbacks"] += 1
+            started = time.monotonic()
+            pieces = []
+            try:
+                async for piece in provider.stream(system_prompt, user_prompt, max_tokens):
+                    pieces.append(piece)
+                    yield piece
+            except Exception as e:
+                self._record_error(provider)
+                if pieces:
+                    raise
+                errors.append(f"{provider.name}: {e!r}")
+                logger.warning(f"LLM provider {provider.name} failed: {e!r}")
+                continue
+            output_tokens = estimate_tokens("".join(pieces))
+            self._record_success(provider, time.monotonic() - started, provider.cost(input_tokens, output_tokens))
+            return
+        if not errors:
+            raise LLMUnavailableError(f"No LLM provider is configured for {call_type!r} calls")
+        raise LLMUnavailableError(f"All LLM providers failed for {call_type!r} calls: {'; '.join(errors)}")
+
+    async def _call(self, provider: Provider, system_prompt: str, user_prompt: str, max_tokens: int, input_tokens: int) -> Completion:
+        started = time.monotonic()
+        try:
+            text = await provider.complete(system_prompt, user_prompt, max_tokens)
+        except asyncio.CancelledError:
+            # Lost a hedge: it took at least this long, which keeps a slow provider from looking fast
+            self._stats[provider.name].record_latency(time.monotonic() - started)
+            raise
+        except Exception:
+            self._record_error(provider)
+            raise
+        latency = time.monotonic() - started
+        cost = provider.cost(input_tokens, estimate_tokens(text))
+        self._record_success(provider, latency, cost)
+        return Completion(text, provider.name, latency, cost)
+
+    def _record_success(self, provider: Provider, latency: float, cost: float):
+        stats = self._stats[provider.name]
+        stats.record_latency(latency)
+        stats.calls += 1
+        stats.cost += cost
+        stats.consecutive_errors = 0
+
+    def _record_error(self, provider: Provider):
+        stats = self._stats[provider.name]
+        stats.calls += 1
+        stats.errors += 1
+        stats.consecutive_errors += 1
+        if stats.consecutive_errors >= self.max_errors:
+            stats.unavailable_until = time.monotonic() + self.cooldown_seconds
+            logger.warning(f"LLM provider {provider.name} failed {stats.consecutive_errors} times in a row; "
+                           f"skipping it for {self.cooldown_seconds:.0f}s")
+
+    def stats(self) -> dict:
+        """Latency percentiles, call and error counts and spent cost per provider."""
+        now = time.monotonic()
+        return {
+            "providers": {
+                name: {
+                    "model": self.providers[name].model,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "p50_seconds": stats.percentile(0.5),
+                    "p95_seconds": stats.percentile(0.95),
+                    "cost_usd": round(stats.cost, 6),
+                    "available": stats.unavailable_until <= now,
+                }
+                for name, stats in self._stats.items()
+            },
+            # Ranked for a typical request of 1000 input and 300 output tokens
+            "routes": {
+                call_type: [provider.name for provider in self.select(call_type, 1000, 300)] for call_type in self.routes
+            },
+            **self.counters,
+        }
+
+
+def _build_provider(name: str) -> Optional[Provider]:
+    api, _, model = name.partition(":")
+    input_cost, output_cost = settings.LLM_PROVIDER_COSTS.get(name, (0.0, 0.0))
+    if api == "anthropic":
+        return AnthropicProvider(model, input_cost, output_cost)
+    if api == "openai":
+        if not settings.OPENAI_API_KEY:
+            logger.debug(f"Skipping LLM provider {name}: no OpenAI API key configured")
+            return None
+        return OpenAIProvider(model, settings.OPENAI_API_KEY, settings.OPENAI_API_BASE_URL, input_cost, output_cost)
+    logger.warning(f"Unknown LLM provider {name!r}")
+    return None
+
+
+def default_routes() -> Dict[str, List[str]]:
+    """Routes over the configured fast and large Anthropic and OpenAI models."""
+    fast_anthropic = f"anthropic:{settings.ANTHROPIC_FAST_MODEL}"
+    large_anthropic = f"anthropic:{settings.ANTHROPIC_LARGE_MODEL}"
+    return {
+        EXTRACTION: [fast_anthropic, f"openai:{settings.OPENAI_FAST_MODEL}", large_anthropic],
+        ANALYSIS: [large_anthropic, f"openai:{settings.OPENAI_LARGE_MODEL}"],
+    }
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_router() -> LLMRouter:
+    """Return the process-wide router over the routed providers, creating it on first use."""
+    global _router
+    if _router is None:
+        routes = settings.LLM_ROUTES or default_routes()
+        names = dict.fromkeys(name for names in routes.values() for name in names)
+        providers = [provider for provider in map(_build_provider, names) if provider is not None]
+        _router = LLMRouter(
+            providers,
+            routes,
+            latency_targets=settings.LLM_LATENCY_TARGETS,
+            window=settings.LLM_LATENCY_WINDOW,
+            min_samples=settings.LLM_LATENCY_MIN_SAMPLES,
+            max_age_seconds=settings.LLM_LATENCY_MAX_AGE_SECONDS,
+            hedge=settings.LLM_HEDGE_ENABLED,
+            hedge_min_seconds=settings.LLM_HEDGE_MIN_SECONDS,
+            max_errors=settings.LLM_PROVIDER_MAX_ERRORS,
+            cooldown_seconds=settings.LLM_PROVIDER_COOLDOWN_SECONDS,
+        )
+    return _router
+
+
+async def close_router():
+    """Close the providers of the process-wide router if it was created."""
+    global _router
+    if _router is not None:
+        for provider in _router.providers.values():
+            await provider.aclose()
+        _router = None
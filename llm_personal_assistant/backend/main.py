@@ -5,19 +5,23 @@ This module sets up the FastAPI application and includes the main router.
 It also initializes the database connection and other necessary components.
 """
 
-import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, Request, Query
+from fastapi import FastAPI, Depends, HTTPException, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from config import settings
-from database import init_db, get_db, engine
-from modules import task_manager, prompt_system, llm_integration
-from integrations import google_calendar, ticktick
-from scheduler import start_scheduler
+from database import init_db, get_db, get_read_db, close_db, engine, AsyncSessionLocal
+from modules import task_manager, prompt_system, llm_integration, search, pending_actions, communication, reporting
+from modules.write_queue import task_write_queue
+from integrations import google_calendar, ticktick, ticktick_sync, calendar_sync
+from llm.client import close_llm_client
+from llm.cache import llm_cache
+from llm.router import close_router, get_router
+import ai_autonomy
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import Optional
+import json
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -30,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -37,11 +42,33 @@ app.add_middleware(
 async def startup_event():
     """Initialize database and other startup tasks."""
     await init_db()
+    await search.init_search_index()
+    await reporting.init_reporting()
+    await ai_autonomy.autonomy_store.load()
+    ai_autonomy.autonomy_store.start()
     async with AsyncSession(engine) as session:
         await prompt_system.initialize_prompts(session)
+        await prompt_system.initialize_rollups(session)
+    if settings.TASK_GROUP_COMMIT:
+        task_write_queue.start()
+    # Imported here so APScheduler is not loaded just by importing the app
+    from scheduler import start_scheduler
     start_scheduler()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop scheduled jobs and release pooled connections held by the application."""
+    from scheduler import stop_scheduler
+    await stop_scheduler()
+    await ai_autonomy.autonomy_store.stop()
+    await close_router()
+    await close_llm_client()
+    await ticktick.ticktick_client.aclose()
+    await task_write_queue.stop()
+    await close_db()
+
+
 @app.get("/")
 async def root():
     """Root endpoint for testing purposes."""
@@ -49,28 +76,198 @@ async def root():
 
 
 @app.get("/prompts/daily")
-async def get_daily_prompt(db: AsyncSession = Depends(get_db)):
+async def get_daily_prompt(db: AsyncSession = Depends(get_read_db)):
     """Retrieve the daily prompt."""
     prompt = await prompt_system.get_daily_prompt(db)
     return {"prompt": prompt.question if prompt else "No daily prompt available."}
 
 
+@app.post("/prompts/respond")
+async def respond_to_prompt(body: prompt_system.PromptResponseCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Save a response to a prompt and create the tasks and events the LLM suggests.
+
+    Args:
+        body (PromptResponseCreate): The prompt ID, the user's response and optionally the user ID.
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: The LLM analysis of the response.
+    """
+    prompt = await prompt_system.get_prompt_by_id(db, body.prompt_id)
+    if not prompt:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    await prompt_system.save_prompt_response(db, prompt.id, body.response)
+    analysis = await llm_integration.process_prompt_response(db, prompt, body.response, user_id=body.user_id)
+    return {"analysis": analysis}
+
+
+@app.post("/prompts/respond/stream")
+async def respond_to_prompt_stream(body: prompt_system.PromptResponseCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Streaming variant of /prompts/respond using Server-Sent Events.
+
+    Every task and event is persisted and sent as its own 'task' or 'event'
+    message (or 'pending' when it awaits approval) as soon as the LLM has
+    finished writing it, followed by a final
+    'done' message carrying the complete analysis.
+
+    Args:
+        body (PromptResponseCreate): The prompt ID, the user's response and optionally the user ID.
+        db (AsyncSession): The database session.
+
+    Returns:
+        StreamingResponse: A text/event-stream response.
+    """
+    prompt = await prompt_system.get_prompt_by_id(db, body.prompt_id)
+    if not prompt:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    await prompt_system.save_prompt_response(db, prompt.id, body.response)
+
+    async def event_stream():
+        async with AsyncSessionLocal() as session:
+            try:
+                async for item in llm_integration.stream_prompt_response(
+                        session, prompt, body.response, user_id=body.user_id
+                ):
+                    payload = item.get("data", item.get("analysis"))
+                    yield f"event: {item['type']}\ndata: {json.dumps(payload, default=str)}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/prompts/{prompt_id}/responses")
+async def get_prompt_responses(
+        prompt_id: int,
+        response: Response,
+        since: Optional[datetime] = Query(None),
+        until: Optional[datetime] = Query(None),
+        order: str = Query("desc", regex="^(asc|desc)$"),
+        cursor: Optional[str] = Query(None),
+        limit: int = Query(100, ge=1, le=500),
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Retrieve the responses to a prompt within a time range.
+
+    Responses are paginated with a keyset cursor: when more are available, the
+    cursor for the next page is returned in the X-Next-Cursor response header.
+
+    Args:
+        prompt_id (int): The ID of the prompt.
+        response (Response): The outgoing response, used to set X-Next-Cursor.
+        since (datetime, optional): Only responses at or after this time.
+        until (datetime, optional): Only responses before this time.
+        order (str): 'desc' for newest first, or 'asc'.
+        cursor (str, optional): The X-Next-Cursor of the previous page.
+        limit (int): Maximum number of responses to return.
+        db (AsyncSession): The database session.
+
+    Returns:
+        list: A list of prompt responses.
+    """
+    try:
+        responses, next_cursor = await prompt_system.get_responses(
+            db, prompt_id, limit=limit, cursor=cursor, descending=order == "desc", since=since, until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return responses
+
+
+@app.get("/prompts/{prompt_id}/rollups")
+async def get_prompt_rollups(
+        prompt_id: int,
+        period: prompt_system.RollupPeriod = Query(prompt_system.RollupPeriod.DAY),
+        since: Optional[date] = Query(None),
+        until: Optional[date] = Query(None),
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Response counts of a prompt per day, week or month.
+
+    Args:
+        prompt_id (int): The ID of the prompt.
+        period (RollupPeriod): 'day', 'week' or 'month'.
+        since (date, optional): Only periods starting on or after this date.
+        until (date, optional): Only periods starting before this date.
+        db (AsyncSession): The database session.
+
+    Returns:
+        list: One summary per period with responses, oldest first.
+    """
+    return await prompt_system.get_rollups(db, prompt_id, period, since=since, until=until)
+
+
 @app.get("/tasks/")
-async def get_tasks(source: Optional[str] = Query(None), db: AsyncSession = Depends(get_db)):
+async def get_tasks(
+        response: Response,
+        source: Optional[str] = Query(None),
+        max_staleness: Optional[int] = Query(None, ge=0),
+        completed: Optional[bool] = Query(None),
+        cursor: Optional[str] = Query(None),
+        sort: str = Query("due_date", regex="^(due_date|updated_at)$"),
+        order: str = Query("asc", regex="^(asc|desc)$"),
+        due_after: Optional[datetime] = Query(None),
+        due_before: Optional[datetime] = Query(None),
+        title_prefix: Optional[str] = Query(None),
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=500),
+        db: AsyncSession = Depends(get_read_db)
+):
     """
     Retrieve a list of tasks from either local storage or TickTick.
 
+    Local tasks are paginated with a keyset cursor: when more tasks are
+    available, the cursor for the next page is returned in the X-Next-Cursor
+    response header. TickTick tasks are served from a local replica kept fresh
+    by a background delta sync.
+
     Args:
+        response (Response): The outgoing response, used to set X-Next-Cursor.
         source (str, optional): The source of tasks ('ticktick' or None for local).
+        max_staleness (int, optional): For TickTick, the maximum acceptable replica age
+            in seconds; an older replica is refreshed first.
+        completed (bool, optional): Only return completed or open tasks.
+        cursor (str, optional): For local tasks, the X-Next-Cursor of the previous page.
+        sort (str): For local tasks, 'due_date' or 'updated_at'.
+        order (str): For local tasks, 'asc' or 'desc'.
+        due_after (datetime, optional): For local tasks, only tasks due at or after this time.
+        due_before (datetime, optional): For local tasks, only tasks due before this time.
+        title_prefix (str, optional): For local tasks, only tasks whose title starts with this text.
+        skip (int): For TickTick, the number of tasks to skip.
+        limit (int): Maximum number of tasks to return.
         db (AsyncSession): The database session.
 
     Returns:
         list: A list of tasks.
     """
     if source == 'ticktick':
-        return ticktick.get_tasks()
-    else:
-        return await task_manager.get_tasks(db)
+        return await ticktick_sync.get_tasks(
+            db, max_staleness=max_staleness, completed=completed, skip=skip, limit=limit
+        )
+
+    try:
+        tasks, next_cursor = await task_manager.get_tasks(
+            db,
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            descending=order == "desc",
+            completed=completed,
+            due_after=due_after,
+            due_before=due_before,
+            title_prefix=title_prefix,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return tasks
 
 
 @app.post("/tasks/")
@@ -91,11 +288,27 @@ async def create_task(
         dict: The created task.
     """
     if source == 'ticktick':
-        return ticktick.create_task(task.title, task.description, task.due_date)
+        return await ticktick_sync.create_task(db, task.title, task.description, task.due_date)
     else:
         return await task_manager.create_task(db, task)
 
 
+@app.post("/tasks/bulk")
+async def create_tasks_bulk(body: task_manager.TaskBulkCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Create several local tasks in one transaction.
+
+    Args:
+        body (TaskBulkCreate): The tasks to create.
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: The IDs of the created tasks, in request order.
+    """
+    ids = await task_manager.create_tasks_bulk(db, body.tasks)
+    return {"ids": ids}
+
+
 @app.put("/tasks/{task_id}")
 async def update_task(
         task_id: str,
@@ -116,11 +329,27 @@ async def update_task(
         dict: The updated task.
     """
     if source == 'ticktick':
-        return ticktick.update_task(task_id, task.title, task.description, task.due_date, task.completed)
+        return await ticktick_sync.update_task(db, task_id, task.title, task.description, task.due_date, task.completed)
     else:
         return await task_manager.update_task(db, task_id, task)
 
 
+@app.patch("/tasks/")
+async def update_tasks_bulk(body: task_manager.TaskBulkUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Apply the same changes to many local tasks in one statement.
+
+    Args:
+        body (TaskBulkUpdate): The task IDs and the changes to apply to each.
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: The IDs of the tasks that were updated.
+    """
+    ids = await task_manager.update_tasks_bulk(db, body.ids, body.changes)
+    return {"ids": ids}
+
+
 @app.delete("/tasks/{task_id}")
 async def delete_task(
         task_id: str,
@@ -139,7 +368,7 @@ async def delete_task(
         dict: A message indicating success or failure.
     """
     if source == 'ticktick':
-        success = ticktick.delete_task(task_id)
+        success = await ticktick_sync.delete_task(db, task_id)
     else:
         success = await task_manager.delete_task(db, task_id)
 
@@ -148,13 +377,174 @@ async def delete_task(
     return {"message": "Task deleted successfully"}
 
 
+@app.get("/pending-actions")
+async def get_pending_actions(
+        status: str = Query(pending_actions.PENDING, regex="^(pending|approving|approved|rejected)$"),
+        after_id: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=500),
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List AI-proposed tasks and events, by default those awaiting approval.
+
+    Args:
+        status (str): Which actions to list.
+        after_id (int): Only list actions with a greater ID, for paging.
+        limit (int): Maximum number of actions to return.
+        db (AsyncSession): The database session.
+
+    Returns:
+        list: Pending actions in creation order.
+    """
+    return await pending_actions.get_actions(db, status=status, after_id=after_id, limit=limit)
+
+
+@app.post("/pending-actions/approve")
+async def approve_pending_actions(body: pending_actions.PendingActionIds, db: AsyncSession = Depends(get_db)):
+    """
+    Carry out pending actions without re-running the analysis.
+
+    Args:
+        body (PendingActionIds): The IDs of the actions to approve.
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: The approved actions and those that failed and remain pending.
+    """
+    return await pending_actions.approve_actions(db, body.ids)
+
+
+@app.post("/pending-actions/reject")
+async def reject_pending_actions(body: pending_actions.PendingActionIds, db: AsyncSession = Depends(get_db)):
+    """
+    Discard pending actions.
+
+    Args:
+        body (PendingActionIds): The IDs of the actions to reject.
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: The IDs of the rejected actions.
+    """
+    return {"rejected": await pending_actions.reject_actions(db, body.ids)}
+
+
+@app.post("/recipients")
+async def create_recipient(recipient: communication.RecipientCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Register a recipient for scheduled prompts.
+
+    Args:
+        recipient (RecipientCreate): The recipient's name, channel ('log' or 'webhook') and address.
+        db (AsyncSession): The database session.
+
+    Returns:
+        Recipient: The created recipient.
+    """
+    if recipient.channel not in settings.DELIVERY_RATE_LIMITS:
+        raise HTTPException(status_code=400, detail=f"Unknown channel: {recipient.channel}")
+    return await communication.create_recipient(db, recipient)
+
+
+@app.get("/deliveries/metrics")
+async def get_delivery_metrics():
+    """Metrics of the most recent prompt delivery run per time period."""
+    return communication.delivery_pipeline.last_runs
+
+
+@app.get("/reports/summary")
+async def get_report_summary(db: AsyncSession = Depends(get_read_db)):
+    """
+    Overall task statistics: counts, completion rate, overdue tasks and average lead time.
+
+    Returns:
+        dict: The task summary.
+    """
+    return await reporting.get_summary(db)
+
+
+@app.get("/reports/weekly")
+async def get_weekly_report(
+        since: Optional[date] = Query(None),
+        until: Optional[date] = Query(None),
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Tasks created and completed per week, with the average lead time of the completions.
+
+    Args:
+        since (date, optional): Only weeks containing or after this date.
+        until (date, optional): Only weeks starting before this date.
+        db (AsyncSession): The database session.
+
+    Returns:
+        list: One entry per week with activity, oldest first.
+    """
+    return await reporting.get_weekly(db, since=since, until=until)
+
+
+@app.get("/reports/overdue")
+async def get_overdue_report(
+        limit: int = Query(100, ge=1, le=1000),
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Open overdue tasks per due day, most recent first.
+
+    Args:
+        limit (int): Maximum number of days to return.
+        db (AsyncSession): The database session.
+
+    Returns:
+        list: The number of open tasks per overdue day.
+    """
+    return await reporting.get_overdue_by_day(db, limit=limit)
+
+
+@app.get("/search")
+async def search_all(
+        q: str = Query(..., min_length=1),
+        scope: str = Query("all", regex="^(tasks|responses|all)$"),
+        limit: int = Query(20, ge=1, le=100),
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Full-text search over tasks and past prompt responses.
+
+    Every word of the query is matched as a prefix, results are ranked by
+    relevance and carry a snippet with the matches highlighted.
+
+    Args:
+        q (str): The search query.
+        scope (str): What to search: 'tasks', 'responses' or 'all'.
+        limit (int): Maximum number of results per scope.
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: Matching tasks and/or responses, best match first.
+    """
+    if not search.search_available:
+        raise HTTPException(status_code=503, detail="Full-text search is not available")
+    results = {}
+    if scope in ("tasks", "all"):
+        results["tasks"] = await search.search_tasks(db, q, limit)
+    if scope in ("responses", "all"):
+        results["responses"] = await search.search_responses(db, q, limit)
+    return results
+
+
 @app.get("/calendar/events")
-async def get_calendar_events(days: int = 7):
+async def get_calendar_events(days: int = 7, refresh: bool = False, db: AsyncSession = Depends(get_read_db)):
     """
-    Retrieve upcoming events from Google Calendar.
+    Retrieve upcoming events from the local Google Calendar mirror.
+
+    The mirror is kept up to date by a background incremental sync; it is
+    synced inline on first use or when `refresh` is set.
 
     Args:
         days (int): Number of days to look ahead for events. Defaults to 7.
+        refresh (bool): Sync with Google before answering. Defaults to False.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A dictionary containing events or error messages.
@@ -163,7 +553,10 @@ async def get_calendar_events(days: int = 7):
         HTTPException: If there's an error retrieving events.
     """
     try:
-        events = await google_calendar.get_upcoming_events(days)
+        if refresh or not await calendar_sync.has_synced(db):
+            await calendar_sync.sync_calendar()
+        now = datetime.utcnow()
+        events = await calendar_sync.get_events(db, now, now + timedelta(days=days))
         return {"events": events}
     except FileNotFoundError:
         return {
@@ -211,7 +604,8 @@ async def refresh_calendar_auth():
         HTTPException: If there's an error during the re-authentication process.
     """
     try:
-        google_calendar.get_calendar_service()  # This will trigger re-authentication if needed
+        google_calendar.calendar_service.invalidate()
+        await google_calendar.calendar_service.aget_service()  # This will trigger re-authentication if needed
         return {"message": "Calendar authentication refreshed successfully"}
     except HTTPException as e:
         if e.status_code == 302:
@@ -221,18 +615,48 @@ async def refresh_calendar_auth():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/llm/cache/stats")
+async def get_llm_cache_stats():
+    """Return hit/miss counters of the LLM response cache."""
+    return {"enabled": llm_cache.enabled, **llm_cache.stats}
+
+
+@app.get("/llm/providers/stats")
+async def get_llm_provider_stats():
+    """Return latency percentiles, errors and cost per LLM provider, and the current choice per call type."""
+    return get_router().stats()
+
+
 @app.get("/ai-autonomy")
-async def get_ai_autonomy():
-    """Get the current AI autonomy setting."""
-    return {"autonomous": llm_integration.get_ai_autonomy()}
+async def get_ai_autonomy(user_id: Optional[str] = Query(None), action: Optional[str] = Query(None)):
+    """
+    Get the effective AI autonomy setting.
+
+    Args:
+        user_id (str, optional): The user to look up; defaults to the global setting.
+        action (str, optional): The action to look up, e.g. 'create_task'.
+
+    Returns:
+        dict: Whether the AI may act without confirmation.
+    """
+    return {"autonomous": ai_autonomy.get_ai_autonomy(user_id, action)}
 
 
 @app.post("/ai-autonomy")
-async def set_ai_autonomy(autonomous: bool):
-    """Set the AI autonomy setting."""
-    llm_integration.set_ai_autonomy(autonomous)
-    return {"message": "AI autonomy setting updated", "autonomous": autonomous}
+async def set_ai_autonomy(body: ai_autonomy.AutonomyUpdate):
+    """
+    Set the AI autonomy setting, globally or for a user and/or action.
+
+    Args:
+        body (AutonomyUpdate): The new value and, optionally, the user and action it applies to.
+
+    Returns:
+        dict: A confirmation message and the stored value.
+    """
+    await ai_autonomy.set_ai_autonomy(body.autonomous, body.user_id, body.action)
+    return {"message": "AI autonomy setting updated", "autonomous": body.autonomous}
 
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,289 @@
+"""
+Delivery of scheduled prompts to recipients.
+
+Each scheduler tick runs a DeliveryPipeline. The pipeline streams active
+recipients from the database in keyset-paginated chunks and claims one
+delivery row per recipient and period. Claims are idempotent: the row's
+unique key means a restarted or overlapping run never sends the same period
+twice. Claimed jobs fan out to a bounded pool of async workers, and each
+channel has its own token-bucket rate limit. Results are written back in
+batches, and every run reports its throughput.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+from pydantic import BaseModel
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text, UniqueConstraint, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from config import settings
+from database import AsyncSessionLocal, Base
+from modules import prompt_system
+
+logger = logging.getLogger(__name__)
+
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class Recipient(Base):
+    __tablename__ = "recipients"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=True)
+    channel = Column(String, nullable=False, default="log")
+    address = Column(String, nullable=True)
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_recipients_active_id", "active", "id"),
+    )
+
+
+class PromptDelivery(Base):
+    __tablename__ = "prompt_deliveries"
+
+    id = Column(Integer, primary_key=True)
+    recipient_id = Column(Integer, nullable=False)
+    period_key = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=SENDING)
+    attempts = Column(Integer, nullable=False, default=1)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("recipient_id", "period_key", name="uq_prompt_deliveries_recipient_period"),
+        Index("ix_prompt_deliveries_period_status", "period_key", "status"),
+    )
+
+
+class RecipientCreate(BaseModel):
+    name: Optional[str] = None
+    channel: str = "log"
+    address: Optional[str] = None
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` operations per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LogChannel:
+    """Writes prompts to the application log; the default channel."""
+
+    async def send(self, recipient: dict, prompts: List[str]):
+        logger.info(f"Prompts for recipient {recipient['id']} ({recipient['name']}): {prompts}")
+
+    async def aclose(self):
+        pass
+
+
+class WebhookChannel:
+    """POSTs prompts as JSON to the recipient's address over a pooled HTTP client."""
+
+    def __init__(self, timeout: float):
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, recipient: dict, prompts: List[str]):
+        response = await self._client.post(
+            recipient["address"], json={"recipient_id": recipient["id"], "prompts": prompts}
+        )
+        response.raise_for_status()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def default_channels() -> dict:
+    return {
+        "log": LogChannel(),
+        "webhook": WebhookChannel(timeout=settings.DELIVERY_WEBHOOK_TIMEOUT),
+    }
+
+
+class DeliveryPipeline:
+    """Sends the prompts of a time period to every active recipient exactly once per period."""
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            channels: Optional[dict] = None,
+            workers: Optional[int] = None,
+            chunk_size: Optional[int] = None,
+            rate_limits: Optional[Dict[str, float]] = None,
+    ):
+        self.session_factory = session_factory
+        self.channels = channels
+        self.workers = workers or settings.DELIVERY_WORKERS
+        self.chunk_size = chunk_size or settings.DELIVERY_CHUNK_SIZE
+        self.rate_limits = rate_limits or settings.DELIVERY_RATE_LIMITS
+        self.last_runs: Dict[str, dict] = {}
+
+    async def deliver(self, timeperiod: prompt_system.TimeperiodEnum, period: Optional[str] = None) -> dict:
+        """
+        Deliver the prompts of `timeperiod` for one period.
+
+        Args:
+            timeperiod (TimeperiodEnum): Which prompts to send.
+            period (str, optional): Identifies the period for idempotency; defaults
+                to today's date, so each daily/weekly/monthly tick is its own period.
+
+        Returns:
+            dict: Metrics of the run.
+        """
+        period_key = f"{timeperiod.value}:{period or datetime.utcnow().date().isoformat()}"
+        async with self.session_factory() as session:
+            prompts = [p.question for p in await prompt_system.get_prompts_for_timeperiod(session, timeperiod)]
+        metrics = {"period": period_key, "claimed": 0, "skipped": 0, "sent": 0, "failed": 0}
+        if not prompts:
+            logger.info(f"No {timeperiod.value} prompts to deliver")
+            return metrics
+
+        started = time.perf_counter()
+        channels = self.channels or default_channels()
+        buckets = {name: TokenBucket(rate) for name, rate in self.rate_limits.items()}
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        results = []
+
+        async def worker():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                delivery_id, recipient = job
+                try:
+                    channel = channels.get(recipient["channel"])
+                    if channel is None:
+                        raise ValueError(f"Unknown channel: {recipient['channel']}")
+                    bucket = buckets.get(recipient["channel"])
+                    if bucket:
+                        await bucket.acquire()
+                    await channel.send(recipient, prompts)
+                except Exception as e:
+                    metrics["failed"] += 1
+                    results.append({"id": delivery_id, "status": FAILED, "error": str(e), "sent_at": None})
+                else:
+                    metrics["sent"] += 1
+                    results.append({"id": delivery_id, "status": SENT, "error": None, "sent_at": datetime.utcnow()})
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            async for jobs, skipped in self._claim_chunks(period_key):
+                metrics["claimed"] += len(jobs)
+                metrics["skipped"] += skipped
+                for job in jobs:
+                    await queue.put(job)
+                # Outcomes are recorded here rather than by the workers, which only ever send
+                await self._record(results)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self._record(results)
+            if self.channels is None:
+                for channel in channels.values():
+                    await channel.aclose()
+
+        elapsed = time.perf_counter() - started
+        metrics["seconds"] = round(elapsed, 3)
+        metrics["per_second"] = round(metrics["claimed"] / elapsed, 1) if elapsed else 0.0
+        self.last_runs[timeperiod.value] = metrics
+        logger.info(f"Delivered {period_key}: {metrics}")
+        return metrics
+
+    async def _claim_chunks(self, period_key: str):
+        """Yield (jobs, skipped) per chunk of active recipients, claiming their deliveries."""
+        last_id = 0
+        while True:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    select(Recipient.id, Recipient.name, Recipient.channel, Recipient.address)
+                    .filter(Recipient.active.is_(True), Recipient.id > last_id)
+                    .order_by(Recipient.id)
+                    .limit(self.chunk_size)
+                )
+                recipients = {row.id: dict(row._mapping) for row in result.all()}
+                if not recipients:
+                    return
+                last_id = max(recipients)
+
+                stmt = (
+                    insert(PromptDelivery)
+                    .on_conflict_do_nothing(index_elements=["recipient_id", "period_key"])
+                    .returning(PromptDelivery.id, PromptDelivery.recipient_id)
+                )
+                claimed = (await session.execute(stmt, [
+                    {"recipient_id": recipient_id, "period_key": period_key, "status": SENDING}
+                    for recipient_id in recipients
+                ])).all()
+                # Deliveries that failed in an earlier run are retried; ones that were
+                # sent, or were in flight when the process stopped, are not sent again.
+                retried = (await session.execute(
+                    update(PromptDelivery)
+                    .where(
+                        PromptDelivery.period_key == period_key,
+                        PromptDelivery.status == FAILED,
+                        PromptDelivery.recipient_id.in_(list(recipients)),
+                    )
+                    .values(status=SENDING, attempts=PromptDelivery.attempts + 1)
+                    .returning(PromptDelivery.id, PromptDelivery.recipient_id)
+                    .execution_options(synchronize_session=False)
+                )).all()
+                await session.commit()
+
+            jobs = [(row.id, recipients[row.recipient_id]) for row in [*claimed, *retried]]
+            yield jobs, len(recipients) - len(jobs)
+
+    async def _record(self, results: list):
+        """
+        Write delivery outcomes with one bulk UPDATE by primary key.
+
+        Written outcomes are removed from `results`. If the write fails the
+        error is logged and the outcomes stay in `results` for the next call.
+        """
+        if not results:
+            return
+        batch = results[:]
+        results.clear()
+        try:
+            async with self.session_factory() as session:
+                await session.execute(update(PromptDelivery), batch)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Recording {len(batch)} delivery outcomes failed: {e}")
+            results.extend(batch)
+
+
+delivery_pipeline = DeliveryPipeline()
+
+
+async def create_recipient(db, recipient: RecipientCreate) -> Recipient:
+    db_recipient = Recipient(**recipient.dict())
+    db.add(db_recipient)
+    await db.commit()
+    return db_recipient
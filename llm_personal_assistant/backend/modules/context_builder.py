@@ -0,0 +1,201 @@
+"""
+Context for LLM analyses.
+
+Before a prompt response is analyzed, the assistant gathers what it already
+knows: open tasks relevant to the response, upcoming calendar events and
+earlier answers to the same prompt. This lets the model avoid suggesting
+tasks and events that already exist. Everything is read locally: relevance
+comes from the full-text index (BM25), events from the calendar mirror.
+
+Items are added in priority order until a fixed token budget is used up, so
+the context never grows the request beyond a known size. Built contexts are
+cached per user for a short time, and any committed task write invalidates
+them.
+"""
+
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database import Task
+from integrations import calendar_sync
+from modules import prompt_system, search, task_manager
+
+logger = logging.getLogger(__name__)
+
+# Sections in the order they appear in the context
+RELEVANT_TASKS = "Open tasks related to this response"
+EVENTS = "Upcoming calendar events"
+UPCOMING_TASKS = "Other open tasks due soon"
+RESPONSES = "Earlier answers to this prompt"
+SECTIONS = (RELEVANT_TASKS, EVENTS, UPCOMING_TASKS, RESPONSES)
+
+RESPONSE_PREVIEW_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English text."""
+    return math.ceil(len(text) / 4)
+
+
+class ContextCache:
+    """Built contexts per (user, prompt, response), invalidated as a whole on task writes."""
+
+    def __init__(self, ttl_seconds: int = None, size: int = None):
+        self._entries = TTLCache(
+            maxsize=size or settings.CONTEXT_CACHE_SIZE,
+            ttl=ttl_seconds if ttl_seconds is not None else settings.CONTEXT_CACHE_TTL_SECONDS,
+        )
+        # Bumped on invalidation, so a context built during a write is not cached
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(user_id: Optional[str], prompt_id: int, response: str) -> tuple:
+        return user_id or "*", prompt_id, hashlib.sha256(response.encode("utf-8")).hexdigest()
+
+    def get(self, key: tuple) -> Optional[str]:
+        value = self._entries.get(key)
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key: tuple, value: str, generation: int):
+        if generation == self.generation:
+            self._entries[key] = value
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop the contexts of one user, or of everyone when no user is given."""
+        self.generation += 1
+        self.stats["invalidations"] += 1
+        if user_id is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries.keys() if key[0] == user_id]:
+            self._entries.pop(key, None)
+
+
+context_cache = ContextCache()
+
+
+def _on_task_write(event: str, task_ids: List[int], values: List[dict]):
+    # Tasks are not owned by a user yet, so every user's context may be stale
+    context_cache.invalidate()
+
+
+task_manager.add_write_listener(_on_task_write)
+
+
+def _format_task(task: dict) -> str:
+    due = task.get("due_date")
+    return f"- {task['title']}" + (f" (due {due:%Y-%m-%d})" if due else "")
+
+
+def _format_event(event: dict) -> str:
+    start = event.get("start", {})
+    when = start.get("dateTime") or start.get("date") or ""
+    return f"- {event.get('summary') or 'Untitled event'} ({when[:16].replace('T', ' ')})"
+
+
+def _format_response(response: prompt_system.PromptResponse) -> str:
+    text = " ".join(response.response.split())
+    if len(text) > RESPONSE_PREVIEW_CHARS:
+        text = text[:RESPONSE_PREVIEW_CHARS].rstrip() + "…"
+    return f"- {response.timestamp:%Y-%m-%d}: {text}"
+
+
+async def _candidates(db: AsyncSession, prompt: prompt_system.Prompt, response: str) -> List[Tuple[str, str]]:
+    """(section, line) pairs in priority order."""
+    now = datetime.now()
+    candidates = []
+    seen_tasks = set()
+
+    if search.search_available:
+        matches = await search.search_tasks(db, response, limit=settings.CONTEXT_MAX_TASKS * 2, any_term=True)
+        for task in matches:
+            if not task["completed"] and len(seen_tasks) < settings.CONTEXT_MAX_TASKS:
+                seen_tasks.add(task["id"])
+                candidates.append((RELEVANT_TASKS, _format_task(task)))
+
+    events = await calendar_sync.get_events(db, now, now + timedelta(days=settings.CONTEXT_EVENT_DAYS))
+    candidates.extend((EVENTS, _format_event(event)) for event in events[:settings.CONTEXT_MAX_EVENTS])
+
+    result = await db.execute(
+        select(Task.id, Task.title, Task.due_date)
+        .filter(Task.completed.isnot(True), Task.due_date >= now)
+        .order_by(Task.due_date, Task.id)
+        .limit(settings.CONTEXT_MAX_TASKS)
+    )
+    for task in result.mappings().all():
+        if task["id"] not in seen_tasks:
+            candidates.append((UPCOMING_TASKS, _format_task(task)))
+
+    # One extra, since the response being analyzed has usually been saved already
+    responses, _ = await prompt_system.get_responses(db, prompt.id, limit=settings.CONTEXT_MAX_RESPONSES + 1)
+    earlier = [r for r in responses if r.response != response][:settings.CONTEXT_MAX_RESPONSES]
+    candidates.extend((RESPONSES, _format_response(r)) for r in earlier)
+    return candidates
+
+
+def pack(candidates: List[Tuple[str, str]], budget_tokens: int) -> str:
+    """
+    Render (section, line) candidates, in priority order, within a token budget.
+
+    A section's heading counts against the budget once its first line is taken.
+    Lines that do not fit are skipped, so a shorter later line may still fit.
+    """
+    taken = {section: [] for section in SECTIONS}
+    used = 0
+    for section, line in candidates:
+        cost = estimate_tokens(line) + (0 if taken[section] else estimate_tokens(f"{section}:"))
+        if used + cost > budget_tokens:
+            continue
+        taken[section].append(line)
+        used += cost
+    return "\n\n".join(f"{section}:\n" + "\n".join(lines) for section, lines in taken.items() if lines)
+
+
+async def build_context(
+        db: AsyncSession,
+        prompt: prompt_system.Prompt,
+        response: str,
+        user_id: Optional[str] = None,
+        budget_tokens: Optional[int] = None,
+) -> str:
+    """
+    Assemble what the assistant already knows that is relevant to a response.
+
+    Args:
+        db (AsyncSession): The database session.
+        prompt (Prompt): The prompt that was answered.
+        response (str): The user's response.
+        user_id (str, optional): The user the context is cached for.
+        budget_tokens (int, optional): Maximum estimated size, defaults to CONTEXT_TOKEN_BUDGET.
+
+    Returns:
+        str: The context text, empty when there is nothing to add or context is disabled.
+    """
+    if not settings.CONTEXT_ENABLED:
+        return ""
+    budget_tokens = budget_tokens or settings.CONTEXT_TOKEN_BUDGET
+    key = context_cache.make_key(user_id, prompt.id, response) + (budget_tokens,)
+    cached = context_cache.get(key)
+    if cached is not None:
+        return cached
+
+    generation = context_cache.generation
+    try:
+        context = pack(await _candidates(db, prompt, response), budget_tokens)
+    except Exception as e:
+        # Analyses still work without context, just with more duplicate suggestions
+        logger.error(f"Error building LLM context: {e}")
+        return ""
+    context_cache.set(key, context, generation)
+    logger.debug(f"Built LLM context of ~{estimate_tokens(context)} tokens")
+    return context
@@ -0,0 +1,137 @@
+"""
+Date and time parsing for LLM output.
+
+Dates suggested by the LLM are mostly ISO-8601 or a handful of common
+formats, which are parsed directly. Only free text such as "next Friday"
+falls back to dateparser, restricted to the configured languages. Results
+are memoized per (text, reference minute), and a whole analysis can be
+parsed in one batch in a worker thread so dateparser never blocks the event
+loop.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMATS = (
+    "%Y/%m/%d",
+    "%m/%d/%Y",
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%B %d %Y",
+    "%b %d %Y",
+    "%d %B %Y",
+    "%d %b %Y",
+)
+
+TIME_FORMATS = (
+    "%H:%M",
+    "%H:%M:%S",
+    "%I:%M %p",
+    "%I:%M%p",
+    "%I %p",
+    "%I%p",
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def reference_now() -> datetime:
+    """The current time truncated to the minute, used as the cache's reference date."""
+    return datetime.now().replace(second=0, microsecond=0)
+
+
+def _fast_parse(text: str, reference: datetime) -> Optional[datetime]:
+    """Parse ISO-8601 and common fixed formats without dateparser."""
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.combine(reference.date(), datetime.strptime(text, fmt).time())
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=settings.DATE_PARSE_CACHE_SIZE)
+def _parse_cached(text: str, reference: datetime) -> Optional[datetime]:
+    parsed = _fast_parse(text, reference)
+    if parsed is not None:
+        return parsed
+    # dateparser loads its language data on import, so only pay for it when needed
+    import dateparser
+
+    return dateparser.parse(
+        text,
+        languages=settings.DATE_PARSE_LANGUAGES,
+        settings={"RELATIVE_BASE": reference},
+    )
+
+
+def parse(text: Optional[str], reference: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Parse a date and/or time expression.
+
+    Args:
+        text (str): The expression, e.g. '2024-09-04', '3:30 PM' or 'next Friday'.
+        reference (datetime, optional): The time relative expressions are resolved
+            against; defaults to now. Truncated to the minute for caching.
+
+    Returns:
+        datetime: The parsed value, or None if the text could not be parsed.
+    """
+    if not text or not isinstance(text, str):
+        return None
+    text = _WHITESPACE.sub(" ", text.strip())
+    if not text:
+        return None
+    reference = (reference or datetime.now()).replace(second=0, microsecond=0)
+    return _parse_cached(text, reference)
+
+
+def parse_date(text: Optional[str], reference: Optional[datetime] = None) -> Optional[date]:
+    """Parse an expression and return its date, or None."""
+    parsed = parse(text, reference)
+    return parsed.date() if parsed else None
+
+
+def parse_time(text: Optional[str], reference: Optional[datetime] = None) -> Optional[time]:
+    """Parse an expression and return its time of day, or None."""
+    parsed = parse(text, reference)
+    return parsed.time() if parsed else None
+
+
+async def parse_many(texts: Iterable[str], reference: Optional[datetime] = None) -> Dict[str, Optional[datetime]]:
+    """
+    Parse many expressions in one worker thread.
+
+    Results are memoized, so later parse() calls with the same reference are
+    served from the cache without touching dateparser.
+
+    Returns:
+        dict: Each distinct input mapped to its parsed value.
+    """
+    unique = {text for text in texts if text and isinstance(text, str)}
+    if not unique:
+        return {}
+    reference = reference or reference_now()
+    return await asyncio.to_thread(lambda: {text: parse(text, reference) for text in unique})
+
+
+def cache_info():
+    """Hit/miss statistics of the parse cache."""
+    return _parse_cached.cache_info()
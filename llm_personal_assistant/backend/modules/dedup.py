@@ -0,0 +1,291 @@
+"""
+Near-duplicate detection for LLM-suggested tasks.
+
+Repeated or similar answers make the LLM suggest tasks that already exist.
+Before suggested tasks are created, they are looked up in an in-memory
+MinHash/LSH index over the open tasks. Candidates sharing an LSH bucket are
+verified by their exact shingle similarity, so a lookup touches a handful of
+tasks, not all of them.
+
+Titles are normalized (lowercase words without filler words such as 'the'
+or 'to') and cut into character trigrams. Descriptions weigh in when both
+tasks have one. The index is built from the database on first use and kept
+up to date through task_manager write listeners afterwards. Signatures are
+computed with NumPy when it is installed, and in plain Python otherwise.
+"""
+
+import asyncio
+import functools
+import logging
+import random
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from sqlalchemy import select
+
+from config import settings
+from database import ReadSessionLocal, Task
+from modules import task_manager
+
+logger = logging.getLogger(__name__)
+
+# What to do with a suggested task that duplicates an open task
+REJECT = "reject"
+MERGE = "merge"
+
+STOPWORDS = frozenset(
+    "a an and at by for from in into my of on or our the to with your".split()
+)
+SHINGLE_SIZE = 3
+# Weight of the description similarity when both tasks have a description
+DESCRIPTION_WEIGHT = 0.2
+
+_WORDS = re.compile(r"\w+")
+_MASK = (1 << 64) - 1
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """NumPy if it is installed; it speeds up signatures but is not required."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase words of `text` without filler words, joined by single spaces."""
+    words = _WORDS.findall((text or "").lower())
+    return " ".join(word for word in words if word not in STOPWORDS)
+
+
+def shingles(text: Optional[str]) -> FrozenSet[str]:
+    """Character trigrams of the normalized text; short texts are their own shingle."""
+    normalized = normalize(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class Duplicate:
+    task_id: int
+    similarity: float
+
+
+class DuplicateIndex:
+    """
+    MinHash/LSH index over the titles and descriptions of open tasks.
+
+    With `bands` bands of `rows` hashes each, two tasks share a bucket with
+    probability 1 - (1 - s**rows)**bands for title similarity s, which is close
+    to 1 above the match threshold and close to 0 for unrelated tasks.
+    """
+
+    def __init__(self, session_factory=ReadSessionLocal, bands: int = None, rows: int = None, seed: int = 1):
+        self.session_factory = session_factory
+        self.bands = bands or settings.DEDUP_LSH_BANDS
+        self.rows = rows or settings.DEDUP_LSH_ROWS
+        rng = random.Random(seed)
+        # Each MinHash function is the shingle hash XORed with its own random mask:
+        # cheap enough in pure Python and close to independent permutations in practice
+        self._masks = [rng.getrandbits(64) for _ in range(self.bands * self.rows)]
+        self._mask_array = None
+        self._buckets: List[Dict[tuple, Set[int]]] = [{} for _ in range(self.bands)]
+        self._tasks: Dict[int, tuple] = {}  # id -> (title shingles, description shingles, band keys)
+        self._stale: Set[int] = set()
+        self._built = False
+        self._building = False
+        self._build_lock = asyncio.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def _band_keys(self, title_shingles: FrozenSet[str]) -> List[tuple]:
+        hashes = [hash(shingle) & _MASK for shingle in title_shingles]
+        np = _numpy()
+        if np is None:
+            signature = [min([h ^ mask for h in hashes]) for mask in self._masks]
+        else:
+            # Same values as the pure Python path, computed for all masks at once
+            if self._mask_array is None:
+                self._mask_array = np.array(self._masks, dtype=np.uint64)[:, None]
+            values = np.array(hashes, dtype=np.uint64)
+            signature = (values ^ self._mask_array).min(axis=1).tolist()
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def add(self, task_id: int, title: Optional[str], description: Optional[str] = None):
+        """Index an open task, replacing any earlier entry for it."""
+        self.remove(task_id)
+        title_shingles = shingles(title)
+        if not title_shingles:
+            return
+        keys = self._band_keys(title_shingles)
+        for buckets, key in zip(self._buckets, keys):
+            buckets.setdefault(key, set()).add(task_id)
+        self._tasks[task_id] = (title_shingles, shingles(description), keys)
+
+    def remove(self, task_id: int):
+        entry = self._tasks.pop(task_id, None)
+        if entry is None:
+            return
+        for buckets, key in zip(self._buckets, entry[2]):
+            members = buckets.get(key)
+            if members is not None:
+                members.discard(task_id)
+                if not members:
+                    del buckets[key]
+
+    def find(self, title: Optional[str], description: Optional[str] = None, threshold: float = None) -> Optional[Duplicate]:
+        """
+        The most similar indexed task, if its similarity reaches `threshold`.
+
+        Similarity is the Jaccard similarity of the title shingles, blended with
+        that of the descriptions when both tasks have one.
+        """
+        threshold = threshold if threshold is not None else settings.DEDUP_THRESHOLD
+        title_shingles = shingles(title)
+        if not title_shingles:
+            return None
+        description_shingles = shingles(description)
+        candidates = set()
+        for buckets, key in zip(self._buckets, self._band_keys(title_shingles)):
+            candidates |= buckets.get(key, set())
+        best = None
+        for task_id in candidates:
+            other_title, other_description, _ = self._tasks[task_id]
+            similarity = jaccard(title_shingles, other_title)
+            if description_shingles and other_description:
+                similarity = (
+                    (1 - DESCRIPTION_WEIGHT) * similarity
+                    + DESCRIPTION_WEIGHT * jaccard(description_shingles, other_description)
+                )
+            if similarity >= threshold and (best is None or similarity > best.similarity):
+                best = Duplicate(task_id, similarity)
+        return best
+
+    async def ensure_ready(self):
+        """Build the index on first use, and re-read tasks whose changes it could not apply directly."""
+        if not self._built:
+            async with self._build_lock:
+                if not self._built:
+                    await self._build()
+        if self._stale:
+            stale, self._stale = self._stale, set()
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    select(Task.id, Task.title, Task.description, Task.completed).filter(Task.id.in_(stale))
+                )
+                rows = result.all()
+            for task_id in stale:
+                self.remove(task_id)
+            for row in rows:
+                if not row.completed:
+                    self.add(row.id, row.title, row.description)
+
+    async def _build(self):
+        # Writes committed while building are re-read afterwards
+        self._building = True
+        try:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    select(Task.id, Task.title, Task.description).filter(Task.completed.isnot(True))
+                )
+                rows = result.all()
+            # Hashing every open task is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(lambda: [self.add(row.id, row.title, row.description) for row in rows])
+        finally:
+            self._building = False
+        self._built = True
+        logger.info(f"Built duplicate index over {len(self._tasks)} open tasks")
+
+    def on_task_write(self, event: str, task_ids: List[int], values: List[dict]):
+        """task_manager write listener keeping the index in sync once it is built."""
+        if self._building:
+            self._stale.update(task_ids)
+            return
+        if not self._built:
+            return
+        for task_id, written in zip(task_ids, values):
+            if event == task_manager.DELETED or written.get("completed"):
+                self.remove(task_id)
+                self._stale.discard(task_id)
+            elif event == task_manager.CREATED:
+                self.add(task_id, written.get("title"), written.get("description"))
+            elif {"title", "description", "completed"} & written.keys():
+                # The write only carries the changed fields; read the task again on next use
+                self._stale.add(task_id)
+
+
+duplicate_index = DuplicateIndex()
+task_manager.add_write_listener(duplicate_index.on_task_write)
+
+
+async def filter_duplicates(tasks: List[task_manager.TaskCreate], policy: Optional[str] = None):
+    """
+    Split suggested tasks into new ones and duplicates of open tasks or of each other.
+
+    Args:
+        tasks (list): The suggested TaskCreate objects.
+        policy (str, optional): REJECT or MERGE, defaults to DEDUP_POLICY. It is
+            recorded with each duplicate; merging is up to the caller.
+
+    Returns:
+        tuple: (new tasks, duplicates), where each duplicate is a dict with the
+        suggested 'task', the 'duplicate_of' task ID (None for a repeat within the
+        batch), the 'similarity' and the 'action'.
+    """
+    if not settings.DEDUP_ENABLED or not tasks:
+        return tasks, []
+    policy = policy or settings.DEDUP_POLICY
+    await duplicate_index.ensure_ready()
+    batch = DuplicateIndex(session_factory=None, bands=duplicate_index.bands, rows=duplicate_index.rows)
+    new_tasks, duplicates = [], []
+    for position, task in enumerate(tasks):
+        match = duplicate_index.find(task.title, task.description)
+        if match is not None:
+            duplicates.append({
+                "task": task, "duplicate_of": match.task_id, "similarity": round(match.similarity, 3), "action": policy,
+            })
+            continue
+        if batch.find(task.title, task.description) is not None:
+            duplicates.append({"task": task, "duplicate_of": None, "similarity": None, "action": REJECT})
+            continue
+        batch.add(position, task.title, task.description)
+        new_tasks.append(task)
+    if duplicates:
+        logger.info(f"Skipped {len(duplicates)} of {len(tasks)} suggested tasks as duplicates")
+    return new_tasks, duplicates
+
+
+async def merge_duplicate(db, duplicate: dict):
+    """
+    Fill in the due date and description of an open task from a duplicate suggestion.
+
+    Only fields the existing task lacks are set; returns the updated task, or
+    None if there was nothing to add.
+    """
+    existing = await db.get(Task, duplicate["duplicate_of"])
+    suggested = duplicate["task"]
+    if existing is None:
+        return None
+    changes = {}
+    if existing.due_date is None and suggested.due_date is not None:
+        changes["due_date"] = suggested.due_date
+    if not existing.description and suggested.description:
+        changes["description"] = suggested.description
+    if not changes:
+        return None
+    return await task_manager.update_task(db, existing.id, task_manager.TaskUpdate(**changes))
@@ -0,0 +1,123 @@
+"""
+Incremental JSON parsing for streamed LLM analyses.
+
+The LLM answers with a JSON object such as {"tasks": [...], "events": [...]},
+possibly surrounded by free text. This module consumes that output chunk by
+chunk and emits each object inside the top-level arrays as soon as its closing
+brace arrives, so callers can act on it before the completion has finished.
+"""
+
+import json
+import logging
+from typing import Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingAnalysisParser:
+    """
+    Emit the elements of top-level JSON arrays while the text is still arriving.
+
+    Args:
+        keys (iterable): Top-level keys whose array elements should be emitted.
+    """
+
+    def __init__(self, keys: Iterable[str] = ("tasks", "events")):
+        self.keys = set(keys)
+        self.text = ""
+        self.done = False
+        self._start = None
+        self._end = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string = None
+        self._last_string = None
+        self._current_key = None
+        self._array_key = None
+        self._capture = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, dict]]:
+        """
+        Consume the next piece of text.
+
+        Args:
+            chunk (str): The next part of the LLM completion.
+
+        Returns:
+            list: (key, object) pairs for every array element completed by this chunk.
+        """
+        offset = len(self.text)
+        self.text += chunk
+        completed = []
+        for index, char in enumerate(chunk, start=offset):
+            if self.done:
+                break
+            if self._capture is not None:
+                self._capture.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string is not None:
+                        self._last_string = "".join(self._string)
+                        self._string = None
+                    continue
+                if self._string is not None and not self._escape:
+                    self._string.append(char)
+                continue
+
+            if not self._stack:
+                if char == "{":
+                    self._stack.append("{")
+                    self._start = index
+                continue
+
+            if char == '"':
+                self._in_string = True
+                # Only top-level keys need to be remembered.
+                self._string = [] if len(self._stack) == 1 else None
+            elif char == ":" and len(self._stack) == 1:
+                self._current_key = self._last_string
+            elif char in "{[":
+                if char == "[" and len(self._stack) == 1:
+                    self._array_key = self._current_key
+                elif char == "{" and self._stack == ["{", "["] and self._array_key in self.keys:
+                    self._capture = ["{"]
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                if char == "}" and self._capture is not None and self._stack == ["{", "["]:
+                    element = self._decode("".join(self._capture))
+                    if element is not None:
+                        completed.append((self._array_key, element))
+                    self._capture = None
+                elif not self._stack:
+                    self.done = True
+                    self._end = index + 1
+        return completed
+
+    def result(self) -> dict:
+        """Parse the whole JSON object received so far."""
+        if self._start is None:
+            raise ValueError("No JSON object found in the API response")
+        start = self._start
+        end = self._end if self._end is not None else self.text.rfind("}") + 1
+        try:
+            return json.loads(self.text[start:end])
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse JSON from the API response: {e}")
+            raise ValueError("Failed to parse JSON from the API response")
+
+    @staticmethod
+    def _decode(text: str):
+        try:
+            element = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse streamed JSON element: {e}")
+            return None
+        return element if isinstance(element, dict) else None
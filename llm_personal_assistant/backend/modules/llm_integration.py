@@ -2,62 +2,81 @@
 LLM integration module for analyzing prompt responses and generating tasks and calendar events.
 """
 
-from config import settings
-import requests
 import json
-from integrations import google_calendar
-from datetime import datetime, timedelta
+from integrations import google_calendar, calendar_sync
+from datetime import datetime, time, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from modules import task_manager
 from modules.prompt_system import Prompt
-import dateparser
+from modules.json_stream import StreamingAnalysisParser
+from llm.cache import llm_cache
+from llm.router import EXTRACTION, LLMUnavailableError, get_router
+from modules import date_parsing
+from modules import pending_actions
+from modules import context_builder
+from modules import dedup
+from ai_autonomy import EVENT_ACTION, TASK_ACTION, get_ai_autonomy
 
 import logging
 logger = logging.getLogger(__name__)
 
-# Anthropic API configuration
-ANTHROPIC_API_URL = "https://api.anthropic.com/v1/complete"
-ANTHROPIC_API_KEY = settings.ANTHROPIC_API_KEY
-ANTHROPIC_API_VERSION = "2023-06-01"
-
-async def analyze_prompt_response(prompt: str, response: str):
-    """
-    Analyze a user's response to a prompt and generate tasks and calendar events.
-    """
-    system_prompt = f"""You are an AI assistant helping to manage tasks and schedules for someone with ADHD. 
+ANALYSIS_SYSTEM_PROMPT = """You are an AI assistant helping to manage tasks and schedules for someone with ADHD. 
     Analyze the following prompt and response, then suggest tasks to be added to their to-do list 
     and events to be added to their calendar. Format your response as a JSON object with 'tasks' 
     and 'events' keys. Each task should have 'title', 'description', and 'due_date' fields. 
-    Each event should have 'title', 'start_time', and 'end_time' fields."""
+    Each event should have 'title', 'start_time', and 'end_time' fields. 
+    If existing tasks and events are listed, do not suggest them again."""
+
 
+def build_user_prompt(prompt: str, response: str, context: str = "") -> str:
+    """The user part of an analysis request, preceded by what is already known, if anything."""
     user_prompt = f"Prompt: {prompt}\nResponse: {response}"
+    if context:
+        return f"Already known:\n{context}\n\n{user_prompt}"
+    return user_prompt
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-API-Key": ANTHROPIC_API_KEY,
-        "anthropic-version": ANTHROPIC_API_VERSION
-    }
 
-    data = {
-        "prompt": f"Human: {system_prompt}\n\n{user_prompt}\n\nAssistant:",
-        "model": "claude-v1",
-        "max_tokens_to_sample": 300,
-        "stop_sequences": ["Human:"]
-    }
+def analysis_cache_key(prompt: str, response: str) -> str:
+    """
+    The LLM cache key of an analysis.
+
+    Only the prompt and response are hashed. The context changes with every
+    task write, so including it would make repeated answers miss the cache;
+    suggestions that have become duplicates since are filtered out by dedup.
+    """
+    return llm_cache.make_key(EXTRACTION, ANALYSIS_SYSTEM_PROMPT, build_user_prompt(prompt, response))
 
+
+async def analyze_prompt_response(prompt: str, response: str, use_cache: bool = True, context: str = ""):
+    """
+    Analyze a user's response to a prompt and generate tasks and calendar events.
+
+    This is an extraction call, answered by a cheap, fast model. Repeated
+    answers to the same prompt are served from the LLM response cache unless
+    use_cache is False.
+    """
+    user_prompt = build_user_prompt(prompt, response, context)
+    key = analysis_cache_key(prompt, response)
+    return await llm_cache.get_or_compute(
+        key,
+        lambda: _request_analysis(ANALYSIS_SYSTEM_PROMPT, user_prompt),
+        bypass=not use_cache,
+    )
+
+
+async def _request_analysis(system_prompt: str, user_prompt: str):
+    """
+    Send an analysis request to the LLM and parse the JSON object in its completion.
+    """
     try:
-        response = requests.post(ANTHROPIC_API_URL, headers=headers, json=data)
-        response.raise_for_status()
-    except requests.RequestException as e:
+        result = await get_router().complete(EXTRACTION, system_prompt, user_prompt, max_tokens=300)
+    except LLMUnavailableError as e:
         logger.error(f"API request failed: {e}")
         raise
 
-    result = response.json()
-    logger.debug(f"API Response: {result}")
-
     # Extract the completion from the API response
-    completion = result.get('completion', '')
-    logger.debug(f"Completion: {completion}")
+    completion = result.text
+    logger.debug(f"Completion from {result.provider} in {result.latency:.2f}s: {completion}")
 
     # Find the start of the JSON object in the completion
     json_start = completion.find('{')
@@ -79,111 +98,264 @@ async def analyze_prompt_response(prompt: str, response: str):
     return parsed_result
 
 
-def parse_date(date_string):
+# Fields of LLM-suggested tasks and events that hold dates or times
+DATE_FIELDS = ('due_date', 'date', 'start_date', 'end_date', 'start_time', 'end_time')
+
+
+def parse_date(date_string, reference=None):
     """
-    Parse a date string into a datetime object.
+    Parse a date string into a date object.
     """
     if not date_string:
         return None
 
-    parsed_date = dateparser.parse(date_string)
+    parsed_date = date_parsing.parse_date(date_string, reference)
     if parsed_date:
-        return parsed_date.date()
+        return parsed_date
     else:
         logger.error(f"Unable to parse date: {date_string}")
         return None
 
 
-def parse_time(time_string):
+def parse_time(time_string, reference=None):
     """
-    Parse a time string into a datetime object.
+    Parse a time string into a time object.
     """
     if not time_string:
         return None
 
-    parsed_time = dateparser.parse(time_string)
+    parsed_time = date_parsing.parse_time(time_string, reference)
     if parsed_time:
-        return parsed_time.time()
+        return parsed_time
     else:
         logger.error(f"Unable to parse time: {time_string}")
         return None
 
 
-async def process_prompt_response(db: AsyncSession, prompt: Prompt, response: str):
+async def preparse_dates(items, reference=None):
+    """Parse the date fields of all given tasks/events in one batch off the event loop."""
+    await date_parsing.parse_many(
+        (item.get(field) for item in items if isinstance(item, dict) for field in DATE_FIELDS),
+        reference,
+    )
+
+
+async def process_prompt_response(
+        db: AsyncSession, prompt: Prompt, response: str, use_cache: bool = True, user_id: str = None
+):
     """
     Process a user's response to a prompt, analyze it with the LLM, and create tasks and calendar events.
+
+    Tasks and events the AI is not allowed to create autonomously, according to
+    the autonomy settings of user_id, are stored as pending actions for the user
+    to approve instead. Suggested tasks that
+    duplicate open tasks are skipped, or merged into them when DEDUP_POLICY is
+    'merge', and listed under 'duplicates' in the returned analysis.
     """
-    analysis = await analyze_prompt_response(prompt.question, response)
+    context = await context_builder.build_context(db, prompt, response, user_id=user_id)
+    analysis = await analyze_prompt_response(prompt.question, response, use_cache=use_cache, context=context)
     logger.debug(f"Analysis result: {analysis}")
 
     if not isinstance(analysis, dict):
         logger.error(f"Unexpected analysis type: {type(analysis)}")
         raise TypeError(f"Expected dict, got {type(analysis)}")
 
+    reference = date_parsing.reference_now()
+    await preparse_dates([*analysis.get('tasks', []), *analysis.get('events', [])], reference)
+
     # Create tasks
+    tasks = []
     for task_data in analysis.get('tasks', []):
         if not isinstance(task_data, dict):
             logger.error(f"Unexpected task_data type: {type(task_data)}")
             continue
+        tasks.append(task_from_data(task_data, reference))
 
-        due_date = parse_date(task_data.get('due_date'))
-
-        await task_manager.create_task(
-            db,
-            task_data.get('title', 'Untitled Task'),
-            task_data.get('description', ''),
-            due_date
-        )
+    # Suggestions that repeat open tasks are not created again
+    tasks, duplicates = await dedup.filter_duplicates(tasks)
 
+    pending_tasks = []
+    if get_ai_autonomy(user_id, TASK_ACTION):
+        await task_manager.create_tasks_bulk(db, tasks)
+        for duplicate in duplicates:
+            if duplicate['action'] == dedup.MERGE and duplicate['duplicate_of'] is not None:
+                await dedup.merge_duplicate(db, duplicate)
+    else:
+        pending_tasks = tasks
 
-    # Create calendar events
+    # Create calendar events in a single batch request
+    events = []
     for event_data in analysis.get('events', []):
         if not isinstance(event_data, dict):
             logger.error(f"Unexpected event_data type: {type(event_data)}")
             continue
 
-        start_date = parse_date(event_data.get('start_date', event_data.get('date')))
-        end_date = parse_date(event_data.get('end_date', event_data.get('date')))
-        start_time = parse_time(event_data.get('start_time'))
-        end_time = parse_time(event_data.get('end_time'))
-
-        # If no date is specified, use today's date
-        if not start_date:
-            start_date = datetime.now().date()
-        if not end_date:
-            end_date = start_date
-
-        if start_time:
-            start_datetime = datetime.combine(start_date, start_time)
-        else:
-            logger.error(f"Unable to determine start time for event: {event_data}")
+        times = event_times(event_data, reference)
+        if not times:
             continue
 
-        if end_time:
-            end_datetime = datetime.combine(end_date, end_time)
-        else:
-            # If no end time is provided, assume the event is 1 hour long
-            end_datetime = start_datetime + timedelta(hours=1)
+        events.append((event_data.get('title', 'Untitled Event'), *times))
 
-        await create_calendar_event(
-            db,
-            event_data.get('title', 'Untitled Event'),
-            start_datetime.isoformat(),
-            end_datetime.isoformat()
-        )
+    pending_events = []
+    if get_ai_autonomy(user_id, EVENT_ACTION):
+        await create_calendar_events(db, events)
+    else:
+        pending_events = [event_body(*event) for event in events]
+
+    # Actions the AI may not take on its own are kept for the user to approve
+    await pending_actions.store_actions(db, pending_tasks, pending_events, prompt_id=prompt.id)
 
+    if duplicates:
+        # A copy, so the cached analysis is left untouched
+        analysis = {**analysis, 'duplicates': [describe_duplicate(duplicate) for duplicate in duplicates]}
     return analysis
 
 
-async def create_calendar_event(db: AsyncSession, title: str, start_time: str, end_time: str):
+def describe_duplicate(duplicate: dict) -> dict:
+    """Represent a skipped duplicate suggestion for API responses."""
+    return {
+        'title': duplicate['task'].title,
+        'duplicate_of': duplicate['duplicate_of'],
+        'similarity': duplicate['similarity'],
+        'action': duplicate['action'],
+    }
+
+
+def event_times(event_data: dict, reference: datetime = None):
     """
-    Create a calendar event using the Google Calendar API.
+    Resolve the start and end of an LLM-suggested event.
+
+    Args:
+        event_data (dict): The event as suggested by the LLM.
+        reference (datetime, optional): The time relative dates are resolved against.
+
+    Returns:
+        tuple: ISO formatted (start_time, end_time), or None if no start time could be determined.
     """
-    if not start_time or not end_time:
-        logger.error(f"Error creating calendar event: Missing start_time or end_time for event '{title}'")
+    start_date = parse_date(event_data.get('start_date', event_data.get('date')), reference)
+    end_date = parse_date(event_data.get('end_date', event_data.get('date')), reference)
+    start_time = parse_time(event_data.get('start_time'), reference)
+    end_time = parse_time(event_data.get('end_time'), reference)
+
+    # If no date is specified, use today's date
+    if not start_date:
+        start_date = (reference or datetime.now()).date()
+    if not end_date:
+        end_date = start_date
+
+    if start_time:
+        start_datetime = datetime.combine(start_date, start_time)
+    else:
+        logger.error(f"Unable to determine start time for event: {event_data}")
+        return None
+
+    if end_time:
+        end_datetime = datetime.combine(end_date, end_time)
+    else:
+        # If no end time is provided, assume the event is 1 hour long
+        end_datetime = start_datetime + timedelta(hours=1)
+
+    return start_datetime.isoformat(), end_datetime.isoformat()
+
+
+def task_from_data(task_data: dict, reference: datetime = None) -> task_manager.TaskCreate:
+    """Build a TaskCreate from an LLM-suggested task."""
+    due_date = parse_date(task_data.get('due_date'), reference)
+    return task_manager.TaskCreate(
+        title=task_data.get('title') or 'Untitled Task',
+        description=task_data.get('description', ''),
+        due_date=datetime.combine(due_date, time()) if due_date else None,
+    )
+
+
+async def stream_prompt_response(
+        db: AsyncSession, prompt: Prompt, response: str, use_cache: bool = True, user_id: str = None
+):
+    """
+    Analyze a user's response with a streamed completion, persisting results as they arrive.
+
+    Each task or event is created as soon as its JSON object is complete in the
+    LLM output, instead of after the whole completion has been received. Items
+    the AI may not create autonomously for user_id are stored as pending actions instead.
+
+    Yields:
+        dict: {'type': 'task' | 'event' | 'pending' | 'duplicate', 'data': ...} for every item, then
+        {'type': 'done', 'analysis': ...} with the full analysis.
+    """
+    context = await context_builder.build_context(db, prompt, response, user_id=user_id)
+    user_prompt = build_user_prompt(prompt.question, response, context)
+    key = analysis_cache_key(prompt.question, response)
+
+    cached = await llm_cache.get(key) if use_cache and llm_cache.enabled else None
+    if cached is not None:
+        for kind in ('tasks', 'events'):
+            for item in cached.get(kind, []):
+                if isinstance(item, dict):
+                    created = await _materialize(db, kind, item, prompt.id, user_id)
+                    if created:
+                        yield created
+        yield {'type': 'done', 'analysis': cached}
+        return
+
+    parser = StreamingAnalysisParser()
+    chunks = get_router().stream(EXTRACTION, ANALYSIS_SYSTEM_PROMPT, user_prompt, max_tokens=300)
+    async for chunk in chunks:
+        for kind, item in parser.feed(chunk):
+            created = await _materialize(db, kind, item, prompt.id, user_id)
+            if created:
+                yield created
+
+    analysis = parser.result()
+    if llm_cache.enabled:
+        await llm_cache.set(key, analysis)
+    yield {'type': 'done', 'analysis': analysis}
+
+
+async def _materialize(db: AsyncSession, kind: str, item: dict, prompt_id: int = None, user_id: str = None):
+    """Persist a single streamed task or event (or its pending action) and describe it for the client."""
+    reference = date_parsing.reference_now()
+    await preparse_dates([item], reference)
+    if kind == 'tasks':
+        task_data = task_from_data(item, reference)
+        autonomous = get_ai_autonomy(user_id, TASK_ACTION)
+        _, duplicates = await dedup.filter_duplicates([task_data])
+        if duplicates:
+            if autonomous and duplicates[0]['action'] == dedup.MERGE:
+                await dedup.merge_duplicate(db, duplicates[0])
+            return {'type': 'duplicate', 'data': describe_duplicate(duplicates[0])}
+        if not autonomous:
+            return await _store_pending(db, TASK_ACTION, [task_data], [], prompt_id)
+        task = await task_manager.create_task(db, task_data)
+        return {
+            'type': 'task',
+            'data': {
+                'id': task.id,
+                'title': task.title,
+                'description': task.description,
+                'due_date': task.due_date.isoformat() if task.due_date else None,
+                'completed': task.completed,
+            },
+        }
+
+    times = event_times(item, reference)
+    if not times:
         return None
+    title = item.get('title', 'Untitled Event')
+    if not get_ai_autonomy(user_id, EVENT_ACTION):
+        return await _store_pending(db, EVENT_ACTION, [], [event_body(title, *times)], prompt_id)
+    event = await create_calendar_event(db, title, *times)
+    return {'type': 'event', 'data': event or {'summary': item.get('title'), 'error': 'not created'}}
+
+
+async def _store_pending(db: AsyncSession, action: str, tasks: list, events: list, prompt_id: int = None):
+    [action_id] = await pending_actions.store_actions(db, tasks, events, prompt_id=prompt_id)
+    payload = json.loads(tasks[0].json()) if tasks else events[0]
+    return {'type': 'pending', 'data': {'id': action_id, 'action': action, 'payload': payload}}
+
 
-    event = {
+def event_body(title: str, start_time: str, end_time: str) -> dict:
+    """Build a Google Calendar event resource."""
+    return {
         'summary': title,
         'start': {
             'dateTime': start_time,
@@ -195,9 +367,52 @@ async def create_calendar_event(db: AsyncSession, title: str, start_time: str, e
         },
     }
 
+
+async def create_calendar_event(db: AsyncSession, title: str, start_time: str, end_time: str):
+    """
+    Create a calendar event using the Google Calendar API.
+    """
+    if not start_time or not end_time:
+        logger.error(f"Error creating calendar event: Missing start_time or end_time for event '{title}'")
+        return None
+
     try:
-        created_event = await google_calendar.create_event(event)
+        created_event = await google_calendar.create_event(event_body(title, start_time, end_time))
+        await calendar_sync.upsert_events(db, [created_event])
+        await db.commit()
         return created_event
     except Exception as e:
         logger.error(f"Error creating calendar event: {e}")
         return None
+
+
+async def create_calendar_events(db: AsyncSession, events: list):
+    """
+    Create several calendar events with one Google Calendar batch request.
+
+    Args:
+        db (AsyncSession): The database session.
+        events (list): (title, start_time, end_time) tuples.
+
+    Returns:
+        list: One {'event': ..., 'error': ...} result per input event, in order.
+    """
+    if not events:
+        return []
+
+    try:
+        results = await google_calendar.create_events_batch([event_body(*event) for event in events])
+    except Exception as e:
+        logger.error(f"Error creating calendar events: {e}")
+        return [{'event': None, 'error': str(e)} for _ in events]
+
+    for (title, _, _), result in zip(events, results):
+        if result['error']:
+            logger.error(f"Error creating calendar event '{title}': {result['error']}")
+
+    # Write the new events through to the local calendar mirror
+    created = [result['event'] for result in results if result['event']]
+    if created:
+        await calendar_sync.upsert_events(db, created)
+        await db.commit()
+    return results
@@ -0,0 +1,244 @@
+"""
+Pending AI actions awaiting user approval.
+
+When the AI is not allowed to act on its own, the tasks and calendar events
+it proposes are stored here instead of being discarded, so the user can
+approve or reject them later without running the analysis again. Approving a
+batch sends all of its events in one Calendar batch request and inserts all
+of its tasks with one statement.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ai_autonomy import EVENT_ACTION, TASK_ACTION
+from config import settings
+from database import Base
+from integrations import calendar_sync, google_calendar
+from modules import task_manager
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+APPROVING = "approving"
+APPROVED = "approved"
+REJECTED = "rejected"
+
+
+class PendingAction(Base):
+    __tablename__ = "pending_actions"
+
+    id = Column(Integer, primary_key=True)
+    action = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default=PENDING)
+    prompt_id = Column(Integer, nullable=True)
+    result_id = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    resolved_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pending_actions_status_id", "status", "id"),
+    )
+
+
+class PendingActionIds(BaseModel):
+    ids: List[int]
+
+
+def describe(action: PendingAction) -> dict:
+    """Represent a pending action for API responses."""
+    return {
+        "id": action.id,
+        "action": action.action,
+        "payload": json.loads(action.payload),
+        "status": action.status,
+        "prompt_id": action.prompt_id,
+        "result_id": action.result_id,
+        "error": action.error,
+        "created_at": action.created_at,
+        "resolved_at": action.resolved_at,
+    }
+
+
+async def store_actions(
+        db: AsyncSession,
+        tasks: List[task_manager.TaskCreate],
+        events: List[dict],
+        prompt_id: Optional[int] = None,
+) -> List[int]:
+    """
+    Store proposed tasks and Calendar event resources for later approval.
+
+    Returns:
+        list: The IDs of the stored pending actions, tasks first.
+    """
+    rows = [
+        {"action": TASK_ACTION, "payload": task.json(), "status": PENDING, "prompt_id": prompt_id}
+        for task in tasks
+    ] + [
+        {"action": EVENT_ACTION, "payload": json.dumps(event), "status": PENDING, "prompt_id": prompt_id}
+        for event in events
+    ]
+    if not rows:
+        return []
+    result = await db.execute(
+        insert(PendingAction).returning(PendingAction.id, sort_by_parameter_order=True), rows
+    )
+    ids = list(result.scalars().all())
+    await db.commit()
+    return ids
+
+
+async def get_actions(db: AsyncSession, status: str = PENDING, after_id: int = 0, limit: int = 100):
+    """List actions with the given status in creation order, starting after `after_id`."""
+    result = await db.execute(
+        select(PendingAction)
+        .filter(PendingAction.status == status, PendingAction.id > after_id)
+        .order_by(PendingAction.id)
+        .limit(limit)
+    )
+    return [describe(action) for action in result.scalars().all()]
+
+
+async def _record_outcomes(db: AsyncSession, outcomes: dict):
+    """Store {action_id: (status, result_id, error)} and commit."""
+    now = datetime.utcnow()
+    # ORM bulk UPDATE by primary key: one executemany for all statuses
+    await db.execute(update(PendingAction), [
+        {"id": action_id, "status": status, "result_id": result_id, "error": error, "resolved_at": now}
+        for action_id, (status, result_id, error) in outcomes.items()
+    ])
+    await db.commit()
+
+
+async def approve_actions(db: AsyncSession, ids: List[int]) -> dict:
+    """
+    Carry out pending actions.
+
+    The actions are first claimed so a concurrent approval cannot apply them
+    twice; claims older than PENDING_ACTION_CLAIM_TIMEOUT_SECONDS, left behind
+    by a crashed process, can be taken over. All events go out in one Calendar
+    batch request and their outcomes are committed right away, so an event
+    that was created is never sent again. The new tasks and their statuses are
+    then written in one transaction. If anything fails, the actions that were
+    not carried out go back to pending with the error recorded.
+
+    Returns:
+        dict: {'approved': [...], 'failed': [...]} descriptions of the processed actions;
+        failed actions stay pending with their error recorded.
+    """
+    if not ids:
+        return {"approved": [], "failed": []}
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.PENDING_ACTION_CLAIM_TIMEOUT_SECONDS)
+    result = await db.execute(
+        update(PendingAction)
+        .where(
+            PendingAction.id.in_(ids),
+            or_(
+                PendingAction.status == PENDING,
+                # Claims from before claimed_at was recorded have no time and count as stale
+                and_(
+                    PendingAction.status == APPROVING,
+                    or_(PendingAction.claimed_at.is_(None), PendingAction.claimed_at < stale),
+                ),
+            ),
+        )
+        .values(status=APPROVING, claimed_at=now)
+        .returning(PendingAction.id, PendingAction.action, PendingAction.payload)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = sorted(result.all())
+    await db.commit()
+
+    tasks = [row for row in claimed if row.action == TASK_ACTION]
+    events = [row for row in claimed if row.action == EVENT_ACTION]
+    unresolved = {row.id for row in claimed}
+    task_ids, new_tasks = [], []
+    error = "Approval was interrupted"
+    try:
+        if events:
+            try:
+                results = await google_calendar.create_events_batch([json.loads(row.payload) for row in events])
+            except Exception as e:
+                logger.error(f"Error creating calendar events for pending actions: {e}")
+                results = [{"event": None, "error": str(e)} for _ in events]
+            outcomes = {}
+            for row, event_result in zip(events, results):
+                if event_result["error"]:
+                    # Left pending with the error recorded, so it can be approved again
+                    outcomes[row.id] = (PENDING, None, str(event_result["error"]))
+                else:
+                    outcomes[row.id] = (APPROVED, event_result["event"].get("id"), None)
+            await _record_outcomes(db, outcomes)
+            unresolved.difference_update(outcomes)
+
+            created_events = [event_result["event"] for event_result in results if event_result["event"]]
+            if created_events:
+                try:
+                    await calendar_sync.upsert_events(db, created_events)
+                    await db.commit()
+                except Exception as e:
+                    # The events exist in Google; the next calendar sync mirrors them
+                    await db.rollback()
+                    logger.warning(f"Error mirroring approved calendar events: {e}")
+
+        if tasks:
+            new_tasks = [task_manager.TaskCreate.parse_raw(row.payload) for row in tasks]
+            task_ids = await task_manager.insert_tasks(db, new_tasks)
+            await _record_outcomes(db, {row.id: (APPROVED, str(task_id), None) for row, task_id in zip(tasks, task_ids)})
+            unresolved.difference_update(row.id for row in tasks)
+    except Exception as e:
+        logger.error(f"Error approving pending actions: {e}")
+        task_ids, new_tasks = [], []
+        error = str(e)
+    finally:
+        if unresolved:
+            await db.rollback()
+            await db.execute(
+                update(PendingAction)
+                .where(PendingAction.id.in_(unresolved), PendingAction.status == APPROVING)
+                .values(status=PENDING, error=error, claimed_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+    task_manager.notify_write(task_manager.CREATED, task_ids, [task.dict() for task in new_tasks])
+
+    result = await db.execute(
+        select(PendingAction).filter(PendingAction.id.in_([row.id for row in claimed])).order_by(PendingAction.id)
+    )
+    processed = [describe(action) for action in result.scalars().all()]
+    return {
+        "approved": [action for action in processed if action["status"] == APPROVED],
+        "failed": [action for action in processed if action["status"] == PENDING],
+    }
+
+
+async def reject_actions(db: AsyncSession, ids: List[int]) -> List[int]:
+    """
+    Reject pending actions without carrying them out.
+
+    Returns:
+        list: The IDs of the actions that were pending and are now rejected.
+    """
+    if not ids:
+        return []
+    result = await db.execute(
+        update(PendingAction)
+        .where(PendingAction.id.in_(ids), PendingAction.status == PENDING)
+        .values(status=REJECTED, resolved_at=datetime.utcnow())
+        .returning(PendingAction.id)
+        .execution_options(synchronize_session=False)
+    )
+    rejected = sorted(result.scalars().all())
+    await db.commit()
+    return rejected
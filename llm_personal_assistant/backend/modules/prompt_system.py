@@ -3,15 +3,27 @@ Prompt system for the LLM-powered personal assistant.
 
 This module defines the structure for prompts and provides functionality
 to retrieve and manage prompts for different time periods.
+
+Responses are read back by prompt and time range with keyset pagination.
+Per-day and per-week rollups are updated in the same transaction as each
+new response, so summaries over long histories read a handful of rollup
+rows instead of scanning every response.
 """
 
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, select
+from sqlalchemy import (
+    Column, Date, Integer, String, Enum, ForeignKey, DateTime, Index, UniqueConstraint,
+    and_, delete, exists, func, literal, or_, select,
+)
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import Base
+from pydantic import BaseModel
+import base64
 import enum
-from datetime import datetime
-from typing import List
+import json
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
 
 class TimeperiodEnum(enum.Enum):
     DAILY = "daily"
@@ -37,6 +49,38 @@ class PromptResponse(Base):
 
     prompt = relationship("Prompt", back_populates="responses")
 
+    # Backs the per-prompt time-range reads in get_responses
+    __table_args__ = (
+        Index("ix_prompt_responses_prompt_id_timestamp", "prompt_id", "timestamp"),
+    )
+
+class RollupPeriod(enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class PromptResponseRollup(Base):
+    """Response counts and sizes per prompt and day or week (weeks start on Monday)."""
+    __tablename__ = "prompt_response_rollups"
+
+    id = Column(Integer, primary_key=True)
+    prompt_id = Column(Integer, nullable=False)
+    period = Column(String, nullable=False)
+    period_start = Column(Date, nullable=False)
+    response_count = Column(Integer, nullable=False, default=0)
+    response_chars = Column(Integer, nullable=False, default=0)
+    first_response_at = Column(DateTime, nullable=True)
+    last_response_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("prompt_id", "period", "period_start", name="uq_prompt_response_rollups_period"),
+    )
+
+class PromptResponseCreate(BaseModel):
+    prompt_id: int
+    response: str
+    user_id: Optional[str] = None  # selects the user's AI autonomy settings
+
 # Sample prompts
 SAMPLE_PROMPTS = [
     {"question": "What are your main goals for today?", "timeperiod": TimeperiodEnum.DAILY},
@@ -53,10 +97,9 @@ SAMPLE_PROMPTS = [
 
 async def initialize_prompts(db: AsyncSession):
     """Initialize the database with sample prompts if it's empty."""
-    result = await db.execute(select(Prompt))
-    existing_prompts = result.scalars().all()
+    has_prompts = await db.scalar(select(exists().select_from(Prompt)))
 
-    if not existing_prompts:
+    if not has_prompts:
         for prompt_data in SAMPLE_PROMPTS:
             prompt = Prompt(**prompt_data)
             db.add(prompt)
@@ -67,14 +110,247 @@ async def get_prompts_for_timeperiod(db: AsyncSession, timeperiod: TimeperiodEnu
     result = await db.execute(select(Prompt).filter(Prompt.timeperiod == timeperiod))
     return result.scalars().all()
 
+def period_start(period: RollupPeriod, day: date) -> date:
+    """The first day of the day, week (Monday) or month containing `day`."""
+    if period == RollupPeriod.WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == RollupPeriod.MONTH:
+        return day.replace(day=1)
+    return day
+
+async def _add_to_rollups(db: AsyncSession, prompt_id: int, response: str, timestamp: datetime):
+    """Count a new response in its day and week rollups with one upsert."""
+    stmt = insert(PromptResponseRollup).values([
+        {
+            "prompt_id": prompt_id,
+            "period": period.value,
+            "period_start": period_start(period, timestamp.date()),
+            "response_count": 1,
+            "response_chars": len(response),
+            "first_response_at": timestamp,
+            "last_response_at": timestamp,
+        }
+        for period in (RollupPeriod.DAY, RollupPeriod.WEEK)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["prompt_id", "period", "period_start"],
+        set_={
+            "response_count": PromptResponseRollup.response_count + stmt.excluded.response_count,
+            "response_chars": PromptResponseRollup.response_chars + stmt.excluded.response_chars,
+            "first_response_at": func.min(PromptResponseRollup.first_response_at, stmt.excluded.first_response_at),
+            "last_response_at": func.max(PromptResponseRollup.last_response_at, stmt.excluded.last_response_at),
+        },
+    )
+    await db.execute(stmt)
+
 async def save_prompt_response(db: AsyncSession, prompt_id: int, response: str):
-    """Save a user's response to a prompt."""
-    prompt_response = PromptResponse(prompt_id=prompt_id, response=response)
-    db.add(prompt_response)
+    """Save a user's response to a prompt and count it in the rollups, in one transaction."""
+    timestamp = datetime.utcnow()
+    prompt_response = await db.scalar(
+        insert(PromptResponse)
+        .values(prompt_id=prompt_id, response=response, timestamp=timestamp)
+        .returning(PromptResponse)
+    )
+    await _add_to_rollups(db, prompt_id, response, timestamp)
     await db.commit()
-    await db.refresh(prompt_response)
     return prompt_response
 
+def encode_response_cursor(descending: bool, prompt_response: PromptResponse) -> str:
+    """Encode the position after `prompt_response` as an opaque pagination cursor."""
+    payload = [descending, prompt_response.timestamp.isoformat(), prompt_response.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_response_cursor(cursor: str, descending: bool) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_response_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for a different ordering.
+    """
+    try:
+        cursor_descending, value, response_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_descending != descending:
+        raise ValueError("Cursor does not match the requested ordering")
+    return value, int(response_id)
+
+async def get_responses(
+        db: AsyncSession,
+        prompt_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        descending: bool = True,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+):
+    """
+    Retrieve a page of a prompt's responses ordered by time, using keyset pagination.
+
+    Args:
+        db (AsyncSession): The database session.
+        prompt_id (int): The prompt whose responses to return.
+        limit (int): Maximum number of responses to return.
+        cursor (str, optional): Cursor returned with the previous page.
+        descending (bool): Newest first when True.
+        since (datetime, optional): Only responses at or after this time.
+        until (datetime, optional): Only responses before this time.
+
+    Returns:
+        tuple: (list of responses, cursor for the next page or None on the last page)
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    query = select(PromptResponse).filter(PromptResponse.prompt_id == prompt_id)
+    if since is not None:
+        query = query.filter(PromptResponse.timestamp >= since)
+    if until is not None:
+        query = query.filter(PromptResponse.timestamp < until)
+    if cursor:
+        value, response_id = decode_response_cursor(cursor, descending)
+        if descending:
+            query = query.filter(or_(
+                PromptResponse.timestamp < value,
+                and_(PromptResponse.timestamp == value, PromptResponse.id < response_id),
+            ))
+        else:
+            query = query.filter(or_(
+                PromptResponse.timestamp > value,
+                and_(PromptResponse.timestamp == value, PromptResponse.id > response_id),
+            ))
+    if descending:
+        query = query.order_by(PromptResponse.timestamp.desc(), PromptResponse.id.desc())
+    else:
+        query = query.order_by(PromptResponse.timestamp, PromptResponse.id)
+
+    # Fetch one extra row to learn whether another page follows
+    result = await db.execute(query.limit(limit + 1))
+    responses = result.scalars().all()
+    next_cursor = None
+    if len(responses) > limit:
+        responses = responses[:limit]
+        next_cursor = encode_response_cursor(descending, responses[-1])
+    return responses, next_cursor
+
+async def get_rollups(
+        db: AsyncSession,
+        prompt_id: int,
+        period: RollupPeriod = RollupPeriod.DAY,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+) -> List[dict]:
+    """
+    Response counts of a prompt per day, week or month, oldest first.
+
+    Monthly figures are summed from the daily rollups of the month.
+
+    Args:
+        db (AsyncSession): The database session.
+        prompt_id (int): The prompt to summarize.
+        period (RollupPeriod): The bucket size.
+        since (date, optional): Only periods starting on or after this date.
+        until (date, optional): Only periods starting before this date.
+
+    Returns:
+        list: One dict per period with at least one response.
+    """
+    source = RollupPeriod.DAY if period == RollupPeriod.MONTH else period
+    if period == RollupPeriod.MONTH:
+        start = func.date(PromptResponseRollup.period_start, literal("start of month"))
+    else:
+        start = PromptResponseRollup.period_start
+    query = (
+        select(
+            start.label("period_start"),
+            func.sum(PromptResponseRollup.response_count).label("response_count"),
+            func.sum(PromptResponseRollup.response_chars).label("response_chars"),
+            func.min(PromptResponseRollup.first_response_at).label("first_response_at"),
+            func.max(PromptResponseRollup.last_response_at).label("last_response_at"),
+        )
+        .filter(PromptResponseRollup.prompt_id == prompt_id, PromptResponseRollup.period == source.value)
+        .group_by(start)
+        .order_by(start)
+    )
+    if since is not None:
+        query = query.filter(PromptResponseRollup.period_start >= period_start(period, since))
+    if until is not None:
+        query = query.filter(PromptResponseRollup.period_start < until)
+    result = await db.execute(query)
+    return [
+        {
+            "period": period.value,
+            "period_start": date.fromisoformat(str(row.period_start)),
+            "response_count": row.response_count,
+            "response_chars": row.response_chars,
+            "first_response_at": _as_datetime(row.first_response_at),
+            "last_response_at": _as_datetime(row.last_response_at),
+        }
+        for row in result.all()
+    ]
+
+def _as_datetime(value) -> Optional[datetime]:
+    # Aggregates over DateTime columns come back from SQLite as text
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+async def rebuild_rollups(db: AsyncSession, prompt_id: Optional[int] = None) -> int:
+    """
+    Recompute the day and week rollups from the stored responses.
+
+    Args:
+        db (AsyncSession): The database session.
+        prompt_id (int, optional): Only rebuild this prompt's rollups.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    clear = delete(PromptResponseRollup)
+    if prompt_id is not None:
+        clear = clear.where(PromptResponseRollup.prompt_id == prompt_id)
+    await db.execute(clear)
+    written = 0
+    buckets = {
+        RollupPeriod.DAY: func.date(PromptResponse.timestamp),
+        # Next Sunday (or the day itself), minus six days: the week's Monday
+        RollupPeriod.WEEK: func.date(PromptResponse.timestamp, literal("weekday 0"), literal("-6 days")),
+    }
+    for period, bucket in buckets.items():
+        query = (
+            select(
+                PromptResponse.prompt_id,
+                literal(period.value),
+                bucket,
+                func.count(),
+                func.coalesce(func.sum(func.length(PromptResponse.response)), 0),
+                func.min(PromptResponse.timestamp),
+                func.max(PromptResponse.timestamp),
+            )
+            .filter(PromptResponse.prompt_id.isnot(None), PromptResponse.timestamp.isnot(None))
+            .group_by(PromptResponse.prompt_id, bucket)
+        )
+        if prompt_id is not None:
+            query = query.filter(PromptResponse.prompt_id == prompt_id)
+        result = await db.execute(
+            insert(PromptResponseRollup).from_select(
+                ["prompt_id", "period", "period_start", "response_count", "response_chars",
+                 "first_response_at", "last_response_at"],
+                query,
+            )
+        )
+        written += result.rowcount
+    await db.commit()
+    return written
+
+async def initialize_rollups(db: AsyncSession):
+    """Build the rollups from existing responses when the rollup table is still empty."""
+    has_rollups = await db.scalar(select(exists().select_from(PromptResponseRollup)))
+    has_responses = await db.scalar(select(exists().select_from(PromptResponse)))
+    if has_responses and not has_rollups:
+        await rebuild_rollups(db)
+
 async def get_prompt_by_id(db: AsyncSession, prompt_id: int):
     """Retrieve a prompt by its ID."""
     result = await db.execute(select(Prompt).filter(Prompt.id == prompt_id))
@@ -0,0 +1,306 @@
+"""
+Task reporting: completion rate, overdue tasks, lead time and weekly throughput.
+
+Reports are read from two small summary tables instead of aggregating the
+tasks table on every request. task_weekly_stats counts the tasks created and
+completed per week, along with their total lead time (creation to
+completion). task_due_stats counts the open tasks per due day. SQLite
+triggers on the tasks table keep both up to date on every insert, update and
+delete, whichever code path makes the change.
+
+The first build, when the triggers are created, aggregates the existing rows
+in one pass. It is vectorized with NumPy when NumPy is installed, and falls
+back to plain Python otherwise.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import Column, Date, Float, Integer, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Base, Task, engine
+
+logger = logging.getLogger(__name__)
+
+
+class TaskWeeklyStats(Base):
+    __tablename__ = "task_weekly_stats"
+
+    week_start = Column(Date, primary_key=True)  # Monday
+    created = Column(Integer, nullable=False, default=0, server_default="0")
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+    lead_time_seconds = Column(Float, nullable=False, default=0.0, server_default="0")
+    lead_time_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class TaskDueStats(Base):
+    __tablename__ = "task_due_stats"
+
+    due_day = Column(Date, primary_key=True)
+    open_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+def _stats_statements(row: str, sign: str) -> List[str]:
+    """Statements adding (sign '+') or removing (sign '-') one task row to or from the stats."""
+    def week(column):
+        # Next Sunday (or the day itself), minus six days: the week's Monday
+        return f"date({row}.{column}, 'weekday 0', '-6 days')"
+
+    done = f"coalesce({row}.completed, 0)"
+    lead_time = f"(julianday({row}.completed_at) - julianday({row}.created_at)) * 86400"
+    return [
+        f"INSERT OR IGNORE INTO task_weekly_stats(week_start) "
+        f"SELECT {week('created_at')} WHERE {row}.created_at IS NOT NULL",
+        f"UPDATE task_weekly_stats SET created = created {sign} 1 WHERE week_start = {week('created_at')}",
+        f"INSERT OR IGNORE INTO task_weekly_stats(week_start) "
+        f"SELECT {week('completed_at')} WHERE {done} AND {row}.completed_at IS NOT NULL",
+        f"UPDATE task_weekly_stats SET completed = completed {sign} 1, "
+        f"lead_time_seconds = lead_time_seconds {sign} coalesce({lead_time}, 0), "
+        f"lead_time_count = lead_time_count {sign} ({row}.created_at IS NOT NULL) "
+        f"WHERE {done} AND week_start = {week('completed_at')}",
+        f"INSERT OR IGNORE INTO task_due_stats(due_day) "
+        f"SELECT date({row}.due_date) WHERE NOT {done} AND {row}.due_date IS NOT NULL",
+        f"UPDATE task_due_stats SET open_count = open_count {sign} 1 "
+        f"WHERE NOT {done} AND due_day = date({row}.due_date)",
+    ]
+
+
+def _trigger_statements() -> List[str]:
+    """DDL for the triggers that keep the summary tables in sync with the tasks table."""
+    def body(statements):
+        return " ".join(f"{statement};" for statement in statements)
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS tasks_stats_ai AFTER INSERT ON tasks BEGIN "
+        f"{body(_stats_statements('new', '+'))} END",
+        f"CREATE TRIGGER IF NOT EXISTS tasks_stats_ad AFTER DELETE ON tasks BEGIN "
+        f"{body(_stats_statements('old', '-'))} END",
+        f"CREATE TRIGGER IF NOT EXISTS tasks_stats_au AFTER UPDATE OF created_at, completed, completed_at, due_date "
+        f"ON tasks BEGIN {body(_stats_statements('old', '-') + _stats_statements('new', '+'))} END",
+    ]
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def aggregate_python(rows) -> tuple:
+    """
+    Aggregate (created_at, completed, completed_at, due_date) task rows.
+
+    Returns:
+        tuple: ({week_start: [created, completed, lead_time_seconds, lead_time_count]},
+        {due_day: open_count})
+    """
+    weeks = defaultdict(lambda: [0, 0, 0.0, 0])
+    due = defaultdict(int)
+    for created_at, completed, completed_at, due_date in rows:
+        if created_at is not None:
+            weeks[_week_start(created_at.date())][0] += 1
+        if completed and completed_at is not None:
+            stats = weeks[_week_start(completed_at.date())]
+            stats[1] += 1
+            if created_at is not None:
+                stats[2] += (completed_at - created_at).total_seconds()
+                stats[3] += 1
+        if not completed and due_date is not None:
+            due[due_date.date()] += 1
+    return dict(weeks), dict(due)
+
+
+def aggregate_numpy(rows) -> tuple:
+    """Vectorized aggregate_python over columnar arrays; requires NumPy."""
+    import numpy as np
+
+    created_at, completed, completed_at, due_date = (list(column) for column in zip(*rows)) if rows else ([],) * 4
+    created = np.array(created_at, dtype="datetime64[us]")
+    finished = np.array(completed_at, dtype="datetime64[us]")
+    due = np.array(due_date, dtype="datetime64[us]")
+    done = np.array([bool(value) for value in completed], dtype=bool)
+
+    def week_starts(values):
+        days = values.astype("datetime64[D]")
+        # 1970-01-01 was a Thursday, weekday 3 counting from Monday
+        return days - (days.astype(np.int64) + 3) % 7
+
+    weeks = defaultdict(lambda: [0, 0, 0.0, 0])
+
+    def add(keys, index, weights=None):
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=weights, minlength=len(unique))
+        for key, total in zip(unique.astype(object), sums):
+            weeks[key][index] += total.item() if weights is not None else int(total)
+
+    has_created = ~np.isnat(created)
+    add(week_starts(created[has_created]), 0)
+    finished_mask = done & ~np.isnat(finished)
+    add(week_starts(finished[finished_mask]), 1)
+    lead_mask = finished_mask & has_created
+    lead_seconds = (finished[lead_mask] - created[lead_mask]) / np.timedelta64(1, "s")
+    add(week_starts(finished[lead_mask]), 2, lead_seconds)
+    add(week_starts(finished[lead_mask]), 3)
+
+    open_due = due[~done & ~np.isnat(due)].astype("datetime64[D]")
+    days, counts = np.unique(open_due, return_counts=True)
+    return dict(weeks), {day: int(count) for day, count in zip(days.astype(object), counts)}
+
+
+async def rebuild_stats(conn) -> int:
+    """
+    Recompute both summary tables from the tasks table on a connection in a transaction.
+
+    Returns:
+        int: The number of tasks aggregated.
+    """
+    result = await conn.execute(select(Task.created_at, Task.completed, Task.completed_at, Task.due_date))
+    rows = [tuple(row) for row in result.all()]
+    try:
+        weeks, due = aggregate_numpy(rows)
+    except ImportError:
+        weeks, due = aggregate_python(rows)
+    await conn.execute(delete(TaskWeeklyStats))
+    await conn.execute(delete(TaskDueStats))
+    if weeks:
+        await conn.execute(insert(TaskWeeklyStats), [
+            {
+                "week_start": week_start,
+                "created": created,
+                "completed": completed,
+                "lead_time_seconds": lead_time_seconds,
+                "lead_time_count": lead_time_count,
+            }
+            for week_start, (created, completed, lead_time_seconds, lead_time_count) in weeks.items()
+        ])
+    if due:
+        await conn.execute(insert(TaskDueStats), [
+            {"due_day": due_day, "open_count": open_count} for due_day, open_count in due.items()
+        ])
+    return len(rows)
+
+
+async def init_reporting():
+    """
+    Create the statistics triggers if they do not exist yet.
+
+    When they are newly created, tasks completed before completion times were
+    recorded get their last update time as completion time, and the summary
+    tables are built from the existing tasks.
+    """
+    async with engine.begin() as conn:
+        existing = set(
+            (await conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars().all()
+        )
+        if "tasks_stats_ai" in existing:
+            return
+        await conn.exec_driver_sql(
+            "UPDATE tasks SET completed_at = updated_at WHERE completed AND completed_at IS NULL"
+        )
+        for statement in _trigger_statements():
+            await conn.exec_driver_sql(statement)
+        count = await rebuild_stats(conn)
+        logger.info(f"Built task statistics from {count} tasks")
+
+
+async def get_summary(db: AsyncSession, now: Optional[datetime] = None) -> dict:
+    """
+    Overall task statistics.
+
+    Args:
+        db (AsyncSession): The database session.
+        now (datetime, optional): The time tasks are overdue at; defaults to the
+            current local time, which is what due dates are entered in.
+
+    Returns:
+        dict: Task counts, completion rate, overdue count and average lead time.
+    """
+    now = now or datetime.now()
+    totals = (await db.execute(select(
+        func.coalesce(func.sum(TaskWeeklyStats.created), 0),
+        func.coalesce(func.sum(TaskWeeklyStats.completed), 0),
+        func.coalesce(func.sum(TaskWeeklyStats.lead_time_seconds), 0.0),
+        func.coalesce(func.sum(TaskWeeklyStats.lead_time_count), 0),
+    ))).one()
+    total, completed, lead_time_seconds, lead_time_count = totals
+    return {
+        "total": total,
+        "completed": completed,
+        "open": total - completed,
+        "completion_rate": completed / total if total else None,
+        "overdue": await count_overdue(db, now),
+        "average_lead_time_hours": lead_time_seconds / lead_time_count / 3600 if lead_time_count else None,
+    }
+
+
+async def _count_due_today(db: AsyncSession, now: datetime) -> int:
+    """Open tasks due today before `now`, counted on the tasks table's due date index."""
+    today = datetime.combine(now.date(), datetime.min.time())
+    return await db.scalar(
+        select(func.count()).select_from(Task).filter(
+            Task.completed.isnot(True), Task.due_date >= today, Task.due_date < now
+        )
+    )
+
+
+async def count_overdue(db: AsyncSession, now: datetime) -> int:
+    """Open tasks due before `now`: whole past days from the summary table, plus today's part."""
+    past_days = await db.scalar(
+        select(func.coalesce(func.sum(TaskDueStats.open_count), 0)).filter(TaskDueStats.due_day < now.date())
+    )
+    return past_days + await _count_due_today(db, now)
+
+
+async def get_overdue_by_day(db: AsyncSession, now: Optional[datetime] = None, limit: int = 100) -> List[dict]:
+    """Counts of open overdue tasks per due day, most recent first; today counts up to `now`."""
+    now = now or datetime.now()
+    result = await db.execute(
+        select(TaskDueStats.due_day, TaskDueStats.open_count)
+        .filter(TaskDueStats.due_day < now.date(), TaskDueStats.open_count > 0)
+        .order_by(TaskDueStats.due_day.desc())
+        .limit(limit)
+    )
+    days = [{"due_day": row.due_day, "open": row.open_count} for row in result.all()]
+    due_today = await _count_due_today(db, now)
+    if due_today:
+        days.insert(0, {"due_day": now.date(), "open": due_today})
+    return days[:limit]
+
+
+async def get_weekly(
+        db: AsyncSession,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+) -> List[dict]:
+    """
+    Weekly throughput, oldest first.
+
+    Args:
+        db (AsyncSession): The database session.
+        since (date, optional): Only weeks containing or after this date.
+        until (date, optional): Only weeks starting before this date.
+
+    Returns:
+        list: Per week the tasks created and completed, the share of created
+        tasks that were completed, and the average lead time of the completions.
+    """
+    query = select(TaskWeeklyStats).order_by(TaskWeeklyStats.week_start)
+    if since is not None:
+        query = query.filter(TaskWeeklyStats.week_start >= _week_start(since))
+    if until is not None:
+        query = query.filter(TaskWeeklyStats.week_start < until)
+    result = await db.execute(query)
+    return [
+        {
+            "week_start": stats.week_start,
+            "created": stats.created,
+            "completed": stats.completed,
+            "completion_ratio": stats.completed / stats.created if stats.created else None,
+            "average_lead_time_hours": (
+                stats.lead_time_seconds / stats.lead_time_count / 3600 if stats.lead_time_count else None
+            ),
+        }
+        for stats in result.scalars().all()
+        if stats.created or stats.completed
+    ]
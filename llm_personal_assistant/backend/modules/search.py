@@ -0,0 +1,159 @@
+"""
+Full-text search over tasks and prompt responses.
+
+Search is backed by SQLite FTS5 external-content tables (tasks_fts and
+prompt_responses_fts) that index the existing rows without duplicating them.
+Triggers on the source tables keep the indexes in sync, so no application code
+needs to remember to update them. Results are ranked with BM25 and include a
+highlighted snippet of the matching text.
+"""
+
+import logging
+import re
+from typing import List
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+HIGHLIGHT_START = "["
+HIGHLIGHT_END = "]"
+SNIPPET_TOKENS = 12
+
+# Column weights for bm25(): a title match outranks a description match
+TASK_TITLE_WEIGHT = 10.0
+TASK_DESCRIPTION_WEIGHT = 1.0
+
+# (index table, source table, indexed columns)
+SEARCH_INDEXES = [
+    ("tasks_fts", "tasks", ("title", "description")),
+    ("prompt_responses_fts", "prompt_responses", ("response",)),
+]
+
+search_available = False
+
+
+def _index_statements(index: str, source: str, columns: tuple) -> List[str]:
+    """DDL for an external-content FTS5 table and the triggers that keep it in sync."""
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+        f"{cols}, content='{source}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+async def init_search_index():
+    """
+    Create the FTS5 tables and triggers if they do not exist yet.
+
+    A newly created index is populated from the rows already in its source
+    table. If the SQLite build lacks FTS5, search is disabled with a warning.
+    """
+    global search_available
+    async with engine.begin() as conn:
+        existing = set(
+            (await conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars().all()
+        )
+        try:
+            for index, source, columns in SEARCH_INDEXES:
+                for statement in _index_statements(index, source, columns):
+                    await conn.exec_driver_sql(statement)
+                if index not in existing:
+                    await conn.exec_driver_sql(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+                    logger.info(f"Built full-text index {index}")
+        except Exception as e:
+            logger.warning(f"Full-text search is unavailable: {e}")
+            search_available = False
+            return
+    search_available = True
+
+
+def build_match_query(query: str, any_term: bool = False, min_length: int = 1) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so 'groc list' matches
+    'groceries listed'. Terms are implicitly ANDed. FTS5 operators in the input
+    are treated as plain words.
+
+    Args:
+        query (str): Free text.
+        any_term (bool): OR the terms instead, so rows matching any word are found;
+            BM25 then ranks rows matching more and rarer words first.
+        min_length (int): Skip words shorter than this, e.g. to drop 'a' or 'to'.
+
+    Returns:
+        str: The MATCH expression, or an empty string if the query has no words.
+    """
+    terms = dict.fromkeys(term for term in re.findall(r"\w+", query) if len(term) >= min_length)
+    return (" OR " if any_term else " ").join(f'"{term}"*' for term in terms)
+
+
+async def search_tasks(db: AsyncSession, query: str, limit: int = 20, any_term: bool = False) -> List[dict]:
+    """
+    Search task titles and descriptions.
+
+    Args:
+        db (AsyncSession): The database session.
+        query (str): Free-text search query.
+        limit (int): Maximum number of results.
+        any_term (bool): Match tasks containing any of the words rather than all of them.
+
+    Returns:
+        list: Matching tasks, best match first, each with a highlighted snippet.
+    """
+    match = build_match_query(query, any_term=any_term, min_length=3 if any_term else 1)
+    if not match:
+        return []
+    result = await db.execute(
+        text(
+            "SELECT t.id, t.title, t.due_date, t.completed, "
+            f"snippet(tasks_fts, -1, :start, :end, '…', {SNIPPET_TOKENS}) AS snippet, "
+            f"bm25(tasks_fts, {TASK_TITLE_WEIGHT}, {TASK_DESCRIPTION_WEIGHT}) AS score "
+            "FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid "
+            "WHERE tasks_fts MATCH :match ORDER BY score LIMIT :limit"
+        ).columns(id=Integer, title=String, due_date=DateTime, completed=Boolean, snippet=String, score=Float),
+        {"match": match, "start": HIGHLIGHT_START, "end": HIGHLIGHT_END, "limit": limit},
+    )
+    return [dict(row) for row in result.mappings().all()]
+
+
+async def search_responses(db: AsyncSession, query: str, limit: int = 20) -> List[dict]:
+    """
+    Search the text of past prompt responses.
+
+    Args:
+        db (AsyncSession): The database session.
+        query (str): Free-text search query.
+        limit (int): Maximum number of results.
+
+    Returns:
+        list: Matching responses, best match first, each with a highlighted snippet.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+    result = await db.execute(
+        text(
+            "SELECT r.id, r.prompt_id, r.timestamp, "
+            f"snippet(prompt_responses_fts, 0, :start, :end, '…', {SNIPPET_TOKENS}) AS snippet, "
+            "bm25(prompt_responses_fts) AS score "
+            "FROM prompt_responses_fts JOIN prompt_responses r ON r.id = prompt_responses_fts.rowid "
+            "WHERE prompt_responses_fts MATCH :match ORDER BY score LIMIT :limit"
+        ).columns(id=Integer, prompt_id=Integer, timestamp=DateTime, snippet=String, score=Float),
+        {"match": match, "start": HIGHLIGHT_START, "end": HIGHLIGHT_END, "limit": limit},
+    )
+    return [dict(row) for row in result.mappings().all()]
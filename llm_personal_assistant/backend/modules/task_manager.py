@@ -2,56 +2,300 @@
 Task management module for the LLM-powered personal assistant.
 
 This module handles the creation, retrieval, updating, and deletion of tasks.
+
+Other modules that keep derived state about tasks (caches, indexes) register
+a write listener, which is called after every committed task write.
 """
 
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
+from sqlalchemy import and_, delete, func, insert, or_, update
 from database import Task
+from modules.write_queue import task_write_queue
 from pydantic import BaseModel
-from typing import Optional
+from typing import Callable, List, Optional, Tuple
 from datetime import datetime
+import base64
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns tasks can be listed by; each is paired with Task.id as a tiebreaker
+SORT_COLUMNS = {
+    "due_date": Task.due_date,
+    "updated_at": Task.updated_at,
+}
+
+# Task write events passed to write listeners
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+_write_listeners: List[Callable[[str, List[int], List[dict]], None]] = []
+
+def add_write_listener(listener: Callable[[str, List[int], List[dict]], None]):
+    """
+    Register a function called after task writes are committed.
+
+    It receives the event (CREATED, UPDATED or DELETED), the IDs of the affected
+    tasks and, per task, the values that were written (empty for deletions).
+    Listeners must be quick and must not do I/O; their exceptions are logged.
+    """
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+def remove_write_listener(listener: Callable[[str, List[int], List[dict]], None]):
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+def notify_write(event: str, task_ids: List[int], values: Optional[List[dict]] = None):
+    """Tell the write listeners about committed task writes."""
+    if not task_ids:
+        return
+    values = values if values is not None else [{} for _ in task_ids]
+    for listener in list(_write_listeners):
+        try:
+            listener(event, task_ids, values)
+        except Exception as e:
+            logger.error(f"Task write listener {listener!r} failed: {e}")
 
 class TaskCreate(BaseModel):
     title: str
     description: Optional[str] = None
     due_date: Optional[datetime] = None
 
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate]
+
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     due_date: Optional[datetime] = None
     completed: Optional[bool] = None
 
-async def create_task(db: Session, task: TaskCreate):
+class TaskBulkUpdate(BaseModel):
+    ids: List[int]
+    changes: TaskUpdate
+
+async def _create_task(db: Session, task: TaskCreate):
     db_task = Task(**task.dict())
     db.add(db_task)
-    await db.commit()
-    await db.refresh(db_task)
+    await db.flush()
+    return db_task
+
+async def create_task(db: Session, task: TaskCreate):
+    if task_write_queue.running:
+        db_task = await task_write_queue.submit(_create_task, task)
+    else:
+        db_task = await _create_task(db, task)
+        await db.commit()
+        await db.refresh(db_task)
+    notify_write(CREATED, [db_task.id], [task.dict()])
     return db_task
 
-async def get_tasks(db: Session, skip: int = 0, limit: int = 100):
-    query = select(Task).offset(skip).limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+async def create_tasks_bulk(db: Session, tasks: List[TaskCreate]) -> List[int]:
+    """
+    Insert a batch of tasks in a single transaction.
+
+    Returns:
+        list: The IDs of the created tasks, in input order.
+    """
+    ids = await insert_tasks(db, tasks)
+    if ids:
+        await db.commit()
+        notify_write(CREATED, ids, [task.dict() for task in tasks])
+    return ids
+
+async def insert_tasks(db: Session, tasks: List[TaskCreate]) -> List[int]:
+    """
+    Insert a batch of tasks with one statement without committing; returns their IDs in input order.
+
+    The caller commits, then calls notify_write(CREATED, ...).
+    """
+    if not tasks:
+        return []
+    stmt = insert(Task).returning(Task.id, sort_by_parameter_order=True)
+    result = await db.execute(stmt, [task.dict() for task in tasks])
+    return list(result.scalars().all())
+
+def encode_cursor(sort: str, descending: bool, task: Task) -> str:
+    """Encode the position after `task` as an opaque pagination cursor."""
+    value = getattr(task, sort)
+    payload = [sort, descending, value.isoformat() if value else None, task.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> Tuple[Optional[datetime], int]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for a different ordering.
+    """
+    try:
+        cursor_sort, cursor_descending, value, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or cursor_descending != descending:
+        raise ValueError("Cursor does not match the requested ordering")
+    return (datetime.fromisoformat(value) if value else None), int(task_id)
+
+def _after_cursor(column, value, task_id, descending):
+    """Keyset condition for rows after (value, task_id); SQLite sorts NULLs first."""
+    if not descending:
+        if value is None:
+            return or_(and_(column.is_(None), Task.id > task_id), column.isnot(None))
+        return or_(column > value, and_(column == value, Task.id > task_id))
+    if value is None:
+        return and_(column.is_(None), Task.id < task_id)
+    return or_(column < value, column.is_(None), and_(column == value, Task.id < task_id))
+
+async def get_tasks(
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "due_date",
+        descending: bool = False,
+        completed: Optional[bool] = None,
+        due_after: Optional[datetime] = None,
+        due_before: Optional[datetime] = None,
+        title_prefix: Optional[str] = None,
+):
+    """
+    Retrieve a page of tasks using keyset pagination.
+
+    Args:
+        db (Session): The database session.
+        limit (int): Maximum number of tasks to return.
+        cursor (str, optional): Cursor returned with the previous page.
+        sort (str): Column to order by, 'due_date' or 'updated_at' (ties broken by id).
+        descending (bool): Whether to sort in descending order.
+        completed (bool, optional): Only return completed or open tasks.
+        due_after (datetime, optional): Only return tasks due at or after this time.
+        due_before (datetime, optional): Only return tasks due before this time.
+        title_prefix (str, optional): Only return tasks whose title starts with this text.
+
+    Returns:
+        tuple: (list of tasks, cursor for the next page or None on the last page)
+
+    Raises:
+        ValueError: If the sort column or cursor is invalid.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unsupported sort column: {sort}")
+    column = SORT_COLUMNS[sort]
+
+    query = select(Task)
+    if completed is not None:
+        query = query.filter(Task.completed == completed)
+    if due_after is not None:
+        query = query.filter(Task.due_date >= due_after)
+    if due_before is not None:
+        query = query.filter(Task.due_date < due_before)
+    if title_prefix:
+        # A range instead of LIKE so the title index can be used
+        query = query.filter(Task.title >= title_prefix, Task.title < title_prefix + "\U0010ffff")
+    if cursor:
+        value, task_id = decode_cursor(cursor, sort, descending)
+        query = query.filter(_after_cursor(column, value, task_id, descending))
+
+    if descending:
+        query = query.order_by(column.desc(), Task.id.desc())
+    else:
+        query = query.order_by(column.asc(), Task.id.asc())
+
+    result = await db.execute(query.limit(limit + 1))
+    tasks = result.scalars().all()
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        return tasks, encode_cursor(sort, descending, tasks[-1])
+    return tasks, None
+
+def _update_values(changes: TaskUpdate) -> dict:
+    """Column values for an update; completing a task records when, reopening it clears that."""
+    update_data = changes.dict(exclude_unset=True)
+    if "completed" in update_data:
+        # Marking an already completed task as completed keeps its original completion time
+        update_data["completed_at"] = (
+            func.coalesce(Task.completed_at, datetime.utcnow()) if update_data["completed"] else None
+        )
+    return update_data
+
+async def _update_task(db: Session, task_id: int, task: TaskUpdate):
+    update_data = _update_values(task)
+    if not update_data:
+        return await db.get(Task, task_id)
+    # One UPDATE ... RETURNING instead of loading the row, mutating it and reading it back
+    stmt = (
+        update(Task)
+        .where(Task.id == task_id)
+        .values(**update_data)
+        .returning(Task)
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
 
 async def update_task(db: Session, task_id: int, task: TaskUpdate):
-    query = select(Task).filter(Task.id == task_id)
-    result = await db.execute(query)
-    db_task = result.scalar_one_or_none()
+    if task_write_queue.running:
+        db_task = await task_write_queue.submit(_update_task, task_id, task)
+    else:
+        db_task = await _update_task(db, task_id, task)
+        if db_task:
+            await db.commit()
     if db_task:
-        update_data = task.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_task, key, value)
-        await db.commit()
-        await db.refresh(db_task)
+        notify_write(UPDATED, [db_task.id], [task.dict(exclude_unset=True)])
     return db_task
 
+async def _update_tasks_bulk(db: Session, task_ids: List[int], changes: TaskUpdate) -> List[int]:
+    update_data = _update_values(changes)
+    if not task_ids or not update_data:
+        return []
+    stmt = (
+        update(Task)
+        .where(Task.id.in_(task_ids))
+        .values(**update_data)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return sorted(result.scalars().all())
+
+async def update_tasks_bulk(db: Session, task_ids: List[int], changes: TaskUpdate) -> List[int]:
+    """
+    Apply one set of changes to many tasks in a single statement.
+
+    Returns:
+        list: The IDs of the tasks that were updated; IDs that do not exist are skipped.
+    """
+    if task_write_queue.running:
+        updated = await task_write_queue.submit(_update_tasks_bulk, task_ids, changes)
+    else:
+        updated = await _update_tasks_bulk(db, task_ids, changes)
+        if updated:
+            await db.commit()
+    notify_write(UPDATED, updated, [changes.dict(exclude_unset=True) for _ in updated])
+    return updated
+
+async def _delete_task(db: Session, task_id: int):
+    stmt = (
+        delete(Task)
+        .where(Task.id == task_id)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
 async def delete_task(db: Session, task_id: int):
-    query = select(Task).filter(Task.id == task_id)
-    result = await db.execute(query)
-    db_task = result.scalar_one_or_none()
-    if db_task:
-        await db.delete(db_task)
-        await db.commit()
-        return True
-    return False
\ No newline at end of file
+    if task_write_queue.running:
+        deleted_id = await task_write_queue.submit(_delete_task, task_id)
+    else:
+        deleted_id = await _delete_task(db, task_id)
+        if deleted_id is not None:
+            await db.commit()
+    if deleted_id is None:
+        return False
+    # The ID as stored, since callers may pass it as a string taken from the URL
+    notify_write(DELETED, [deleted_id])
+    return True
@@ -0,0 +1,136 @@
+"""
+Group commit for task mutations.
+
+When enabled, task creates, updates and deletes are queued instead of each
+committing on its own. A single writer drains the queue and applies the
+operations in one transaction per batch. A batch closes after a short window
+or when it reaches a maximum size, whichever comes first. Each caller waits
+on a future that resolves once its batch has been committed, so bursts of
+writes share one commit instead of paying for one each.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from config import settings
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TaskWriteQueue:
+    """
+    Single-writer queue that applies mutations in batched transactions.
+
+    Operations are coroutine functions taking a session as their first
+    argument. They must flush but not commit; the queue commits the batch.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, window_ms: float = None, max_batch: int = None):
+        self.session_factory = session_factory
+        self.window = (window_ms if window_ms is not None else settings.TASK_GROUP_COMMIT_WINDOW_MS) / 1000
+        self.max_batch = max_batch or settings.TASK_GROUP_COMMIT_MAX_OPS
+        self._queue = None
+        self._worker = None
+        self.stats = {"batches": 0, "operations": 0, "fallbacks": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        """Start the writer task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(f"Task group commit enabled (window={self.window * 1000:g}ms, max_batch={self.max_batch})")
+
+    async def stop(self):
+        """Apply everything already queued, then stop the writer."""
+        if not self.running:
+            return
+        self._queue.put_nowait(_STOP)
+        await self._worker
+        self._worker = None
+
+    async def submit(self, operation: Callable[..., Awaitable[Any]], *args) -> Any:
+        """
+        Queue an operation and wait until its batch is committed.
+
+        Returns:
+            The operation's return value.
+
+        Raises:
+            Exception: Whatever the operation raised when applied on its own.
+        """
+        if not self.running:
+            raise RuntimeError("Task write queue is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, args, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._apply(batch)
+
+    async def _apply(self, batch):
+        """Apply a batch in one transaction, falling back to one transaction per operation on failure."""
+        try:
+            async with self.session_factory() as session:
+                results = [await operation(session, *args) for operation, args, _ in batch]
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Group commit of {len(batch)} operations failed, applying individually: {e}")
+            self.stats["fallbacks"] += 1
+            for operation, args, future in batch:
+                try:
+                    async with self.session_factory() as session:
+                        result = await operation(session, *args)
+                        await session.commit()
+                except Exception as op_error:
+                    _resolve(future, error=op_error)
+                else:
+                    _resolve(future, result)
+        else:
+            for (_, _, future), result in zip(batch, results):
+                _resolve(future, result)
+        self.stats["batches"] += 1
+        self.stats["operations"] += len(batch)
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Exception = None):
+    if future.done():  # the caller went away
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+task_write_queue = TaskWriteQueue()
@@ -1,34 +1,151 @@
 """
 Scheduler module for triggering prompts at appropriate intervals.
+
+Jobs are kept in a SQL job store, so a restart does not lose track of a run
+that was due while the process was down: a missed run is still executed
+within the misfire grace time, and several missed runs are coalesced into
+one. When the API runs with several workers, only the worker holding the
+scheduler lease in the database runs jobs; the others keep trying to take
+the lease over and start running jobs if the leader stops renewing it.
 """
 
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from modules import prompt_system
-from database import AsyncSessionLocal
+from modules.communication import delivery_pipeline
 from config import settings
+from leases import acquire_lease, init_leases, release_lease
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "scheduler"
+# Identifies this worker process as a lease holder
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _jobstore():
+    """A SQL job store on the application database, or an in-memory one for in-memory databases."""
+    url = settings.SCHEDULER_JOBSTORE_URL or settings.DATABASE_URL
+    if ":memory:" in url:
+        return MemoryJobStore()
+    # APScheduler's job store is synchronous
+    return SQLAlchemyJobStore(url=url.replace("+aiosqlite", "", 1))
+
 
-scheduler = AsyncIOScheduler()
+scheduler = AsyncIOScheduler(
+    jobstores={"default": _jobstore()},
+    job_defaults={
+        "coalesce": settings.SCHEDULER_COALESCE,
+        "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECONDS,
+        "max_instances": settings.SCHEDULER_MAX_INSTANCES,
+    },
+)
+
+_lease_task = None
 
 async def trigger_daily_prompts():
-    async with AsyncSessionLocal() as session:
-        prompts = await prompt_system.get_prompts_for_timeperiod(session, prompt_system.TimeperiodEnum.DAILY)
-        # Here you would typically send a notification or email to the user
-        # For now, we'll just print the prompts
-        print("Daily prompts:", [p.question for p in prompts])
+    await delivery_pipeline.deliver(prompt_system.TimeperiodEnum.DAILY)
 
 async def trigger_weekly_prompts():
-    async with AsyncSessionLocal() as session:
-        prompts = await prompt_system.get_prompts_for_timeperiod(session, prompt_system.TimeperiodEnum.WEEKLY)
-        print("Weekly prompts:", [p.question for p in prompts])
+    await delivery_pipeline.deliver(prompt_system.TimeperiodEnum.WEEKLY)
 
 async def trigger_monthly_prompts():
-    async with AsyncSessionLocal() as session:
-        prompts = await prompt_system.get_prompts_for_timeperiod(session, prompt_system.TimeperiodEnum.MONTHLY)
-        print("Monthly prompts:", [p.question for p in prompts])
+    await delivery_pipeline.deliver(prompt_system.TimeperiodEnum.MONTHLY)
+
+def job_definitions() -> list:
+    """
+    The scheduled jobs as (id, textual function reference, trigger).
+
+    Functions are given by reference so they can be stored in the job store.
+    """
+    return [
+        ("daily_prompts", "scheduler:trigger_daily_prompts", CronTrigger(hour=9)),  # Run daily at 9 AM
+        ("weekly_prompts", "scheduler:trigger_weekly_prompts", CronTrigger(day_of_week='mon', hour=9)),  # Run weekly on Mondays at 9 AM
+        ("monthly_prompts", "scheduler:trigger_monthly_prompts", CronTrigger(day=1, hour=9)),  # Run monthly on the 1st at 9 AM
+        (
+            "calendar_sync",
+            "integrations.calendar_sync:refresh_calendar_mirror",
+            IntervalTrigger(minutes=settings.CALENDAR_SYNC_INTERVAL_MINUTES),
+        ),  # Keep the local calendar mirror fresh
+        (
+            "ticktick_sync",
+            "integrations.ticktick_sync:refresh_ticktick_replica",
+            IntervalTrigger(minutes=settings.TICKTICK_SYNC_INTERVAL_MINUTES),
+        ),  # Keep the local TickTick replica fresh
+    ]
+
+def _sync_jobs():
+    """
+    Add missing jobs and replace changed ones.
+
+    Unchanged jobs are left alone: replacing them would recompute their next
+    run time and drop a run that was missed while no worker was leading.
+    """
+    options = (settings.SCHEDULER_COALESCE, settings.SCHEDULER_MISFIRE_GRACE_SECONDS, settings.SCHEDULER_MAX_INSTANCES)
+    for job_id, func, trigger in job_definitions():
+        job = scheduler.get_job(job_id)
+        if job is not None and (
+            job.func_ref == func
+            and str(job.trigger) == str(trigger)
+            and (job.coalesce, job.misfire_grace_time, job.max_instances) == options
+        ):
+            continue
+        scheduler.add_job(func, trigger, id=job_id, name=job_id, replace_existing=True)
+        logger.info(f"Scheduled job {job_id}: {trigger}")
+
+async def _lead():
+    """Renew the scheduler lease periodically and run jobs only while holding it."""
+    await init_leases()
+    leading = False
+    while True:
+        try:
+            holds_lease = await acquire_lease(LEASE_NAME, WORKER_ID, settings.SCHEDULER_LEASE_SECONDS)
+        except Exception as e:
+            logger.error(f"Error renewing the scheduler lease: {e}")
+            holds_lease = False
+        if holds_lease and not leading:
+            logger.info(f"Worker {WORKER_ID} is now the scheduler leader")
+            if scheduler.running:
+                scheduler.resume()
+            else:
+                scheduler.start(paused=True)
+                _sync_jobs()
+                scheduler.resume()
+        elif leading and not holds_lease:
+            logger.warning(f"Worker {WORKER_ID} lost the scheduler lease; pausing jobs")
+            scheduler.pause()
+        leading = holds_lease
+        await asyncio.sleep(settings.SCHEDULER_LEASE_RENEW_SECONDS)
 
 def start_scheduler():
-    scheduler.add_job(trigger_daily_prompts, CronTrigger(hour=9))  # Run daily at 9 AM
-    scheduler.add_job(trigger_weekly_prompts, CronTrigger(day_of_week='mon', hour=9))  # Run weekly on Mondays at 9 AM
-    scheduler.add_job(trigger_monthly_prompts, CronTrigger(day=1, hour=9))  # Run monthly on the 1st at 9 AM
-    scheduler.start()
\ No newline at end of file
+    """Start competing for the scheduler lease; jobs run once this worker holds it."""
+    global _lease_task
+    if _lease_task is None or _lease_task.done():
+        _lease_task = asyncio.create_task(_lead())
+
+async def stop_scheduler():
+    """Stop running jobs and hand the lease over to another worker."""
+    global _lease_task
+    if _lease_task is None:
+        return
+    _lease_task.cancel()
+    try:
+        await _lease_task
+    except asyncio.CancelledError:
+        pass
+    _lease_task = None
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    try:
+        await release_lease(LEASE_NAME, WORKER_ID)
+    except Exception as e:
+        logger.error(f"Error releasing the scheduler lease: {e}")
@@ -0,0 +1,63 @@
+"""
+Microbenchmark of date parsing for LLM analyses.
+
+Compares plain dateparser.parse (the previous implementation) with the
+date_parsing service on a corpus of typical LLM date and time fields, both
+with a cold cache (fast paths plus restricted dateparser fallback) and a warm
+cache.
+
+Usage (from the backend directory):
+    python ../benchmarks/bench_date_parsing.py [--rounds 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+for name in ("ANTHROPIC_API_KEY", "SECRET_KEY", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"):
+    os.environ.setdefault(name, "benchmark")
+
+import dateparser  # noqa: E402
+
+from modules import date_parsing  # noqa: E402
+
+CORPUS = [
+    "2024-09-04", "2024-09-04T15:30:00", "2024-09-04T15:30:00Z", "09/04/2024", "September 4, 2024",
+    "15:30", "3:30 PM", "9 AM", "10:00", "tomorrow", "next Friday", "in 2 days", "end of the month",
+    "Monday", "today",
+]
+
+
+def timed(label, function, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in CORPUS:
+            function(text)
+    elapsed = time.perf_counter() - started
+    per_call = elapsed / (rounds * len(CORPUS)) * 1e6
+    print(f"{label:<22} {per_call:10.1f} us/field")
+    return per_call
+
+
+def main(args):
+    dateparser.parse("warm up language data")
+    baseline = timed("dateparser.parse", dateparser.parse, args.rounds)
+
+    def cold(text):
+        date_parsing._parse_cached.cache_clear()
+        return date_parsing.parse(text)
+
+    cold_cost = timed("service, cold cache", cold, args.rounds)
+    for text in CORPUS:
+        date_parsing.parse(text)
+    warm_cost = timed("service, warm cache", date_parsing.parse, args.rounds)
+    print(f"speedup cold {baseline / cold_cost:8.1f}x, warm {baseline / warm_cost:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20)
+    main(parser.parse_args())
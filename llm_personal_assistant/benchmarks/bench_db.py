@@ -0,0 +1,89 @@
+"""
+Benchmark the database engine profile.
+
+Runs a mixed workload that mirrors the task endpoints (mostly paged task
+listings with some task inserts) from concurrent clients against a temporary
+SQLite file, once with the previous setup (NullPool, default rollback journal)
+and once with the pooled, WAL-tuned engines from database.py, and reports
+requests per second for each.
+
+Usage (from the backend directory):
+    python ../benchmarks/bench_db.py [--clients 16] [--seconds 5] [--write-ratio 0.1]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+for name in ("ANTHROPIC_API_KEY", "SECRET_KEY", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"):
+    os.environ.setdefault(name, "benchmark")
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from database import Base, create_sqlite_engine  # noqa: E402
+from modules import task_manager  # noqa: E402
+
+SEED_TASKS = 5000
+
+
+async def run_workload(write_sessions, read_sessions, clients, seconds, write_ratio):
+    deadline = time.perf_counter() + seconds
+    counts = [0] * clients
+
+    async def client(index):
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            if rng.random() < write_ratio:
+                async with write_sessions() as db:
+                    await task_manager.create_tasks_bulk(db, [task_manager.TaskCreate(title=f"bench {index}")])
+            else:
+                async with read_sessions() as db:
+                    await task_manager.get_tasks(db, limit=50, completed=False)
+            counts[index] += 1
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return sum(counts) / seconds
+
+
+async def bench(label, write_engine, read_engine, args):
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    write_sessions = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+    read_sessions = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+    async with write_sessions() as db:
+        await task_manager.create_tasks_bulk(
+            db, [task_manager.TaskCreate(title=f"seed {i}") for i in range(SEED_TASKS)]
+        )
+    rate = await run_workload(write_sessions, read_sessions, args.clients, args.seconds, args.write_ratio)
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+    print(f"{label:<10} {rate:10.1f} req/s")
+    return rate
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite+aiosqlite:///{directory}/baseline.db"
+        baseline_engine = create_async_engine(url, poolclass=NullPool)
+        before = await bench("baseline", baseline_engine, baseline_engine, args)
+
+        url = f"sqlite+aiosqlite:///{directory}/tuned.db"
+        after = await bench("tuned", create_sqlite_engine(url), create_sqlite_engine(url, read_only=True), args)
+    print(f"speedup    {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+Benchmark of the duplicate-task index.
+
+Builds the MinHash/LSH index over a synthetic set of open tasks and measures
+the lookup time per suggested task. It also measures how often a reworded
+existing task is found and how often an unrelated title is flagged. A linear
+scan computing the exact similarity against every task is timed for
+comparison.
+
+Usage (from the backend directory):
+    python ../benchmarks/bench_dedup.py [--tasks 100000] [--lookups 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+for name in ("ANTHROPIC_API_KEY", "SECRET_KEY", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"):
+    os.environ.setdefault(name, "benchmark")
+
+from config import settings  # noqa: E402
+from modules import dedup  # noqa: E402
+from modules.dedup import DuplicateIndex, jaccard, shingles  # noqa: E402
+
+VERBS = ["call", "email", "buy", "book", "pay", "clean", "fix", "review", "schedule", "finish", "plan", "renew"]
+FILLERS = ["the", "my", "a", "to"]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_titles(count, rng):
+    # Random words stand in for a varied real-world vocabulary
+    nouns = [
+        "".join(rng.choice(LETTERS) for _ in range(rng.randint(4, 9))) for _ in range(max(count // 5, 100))
+    ]
+    return [
+        f"{rng.choice(VERBS)} {rng.choice(nouns)} {rng.choice(nouns)} {rng.choice(['today', 'soon', 'asap', 'later'])}"
+        for _ in range(count)
+    ]
+
+
+def reword(title, rng):
+    """A near-duplicate: a filler word inserted and one trailing word changed."""
+    words = title.split()
+    words.insert(1, rng.choice(FILLERS))
+    words[-1] = rng.choice(["now", "this week", "tomorrow"]) if rng.random() < 0.3 else words[-1]
+    return " ".join(words).capitalize()
+
+
+def main(args):
+    if args.pure_python:
+        dedup._numpy = lambda: None
+    print(f"signatures: {'plain Python' if dedup._numpy() is None else 'NumPy'}")
+    rng = random.Random(7)
+    titles = make_titles(args.tasks, rng)
+    index = DuplicateIndex(session_factory=None)
+    started = time.perf_counter()
+    for task_id, title in enumerate(titles):
+        index.add(task_id, title)
+    build = time.perf_counter() - started
+    print(f"build: {args.tasks} tasks in {build:.2f} s ({build / args.tasks * 1e6:.1f} us/task)")
+
+    sources = [rng.randrange(args.tasks) for _ in range(args.lookups)]
+    probes = [reword(titles[task_id], rng) for task_id in sources]
+    started = time.perf_counter()
+    matches = [index.find(probe) for probe in probes]
+    lookup = (time.perf_counter() - started) / args.lookups
+    # Recall over the rewordings still similar enough to their original to count as duplicates
+    eligible = [
+        match for probe, match, task_id in zip(probes, matches, sources)
+        if jaccard(shingles(probe), shingles(titles[task_id])) >= settings.DEDUP_THRESHOLD
+    ]
+    recall = sum(match is not None for match in eligible) / len(eligible) if eligible else 1.0
+    unrelated = make_titles(args.lookups, random.Random(99))
+    false_hits = sum(index.find(f"{title} xyz") is not None for title in unrelated)
+    print(f"lookup: {lookup * 1e6:.1f} us/candidate, recall {recall:.1%} of {len(eligible)} near-duplicates, "
+          f"unrelated flagged {false_hits / args.lookups:.1%} (threshold {settings.DEDUP_THRESHOLD})")
+
+    sample = titles[:args.scan_tasks]
+    title_shingles = [shingles(title) for title in sample]
+    probe = shingles(reword(sample[0], rng))
+    started = time.perf_counter()
+    max(jaccard(probe, other) for other in title_shingles)
+    scan = (time.perf_counter() - started) * args.tasks / len(sample)
+    print(f"linear scan over {args.tasks} tasks (extrapolated): {scan * 1e3:.1f} ms/candidate, "
+          f"{scan / lookup:.0f}x slower")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--pure-python", action="store_true", help="compute signatures without NumPy")
+    parser.add_argument("--scan-tasks", type=int, default=20000, help="tasks actually scanned for the comparison")
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+Benchmark the prompt delivery pipeline.
+
+Registers N recipients in a temporary SQLite database and delivers the daily
+prompts to all of them through a channel that simulates network latency,
+then runs the same period again to confirm nothing is sent twice.
+
+Usage (from the backend directory):
+    python ../benchmarks/bench_delivery.py [--recipients 5000] [--latency-ms 50] [--rate 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+for name in ("ANTHROPIC_API_KEY", "SECRET_KEY", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"):
+    os.environ.setdefault(name, "benchmark")
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base, create_sqlite_engine  # noqa: E402
+from modules import prompt_system  # noqa: E402
+from modules.communication import DeliveryPipeline, Recipient  # noqa: E402
+
+
+class SlowChannel:
+    def __init__(self, latency):
+        self.latency = latency
+        self.sent = 0
+
+    async def send(self, recipient, prompts):
+        await asyncio.sleep(self.latency)
+        self.sent += 1
+
+    async def aclose(self):
+        pass
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_sqlite_engine(f"sqlite:///{directory}/delivery.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with sessions() as session:
+            await prompt_system.initialize_prompts(session)
+            await session.execute(insert(Recipient), [
+                {"name": f"user {i}", "channel": "bench", "active": True} for i in range(args.recipients)
+            ])
+            await session.commit()
+
+        channel = SlowChannel(args.latency_ms / 1000)
+        pipeline = DeliveryPipeline(
+            session_factory=sessions,
+            channels={"bench": channel},
+            workers=args.workers,
+            rate_limits={"bench": args.rate},
+        )
+        first = await pipeline.deliver(prompt_system.TimeperiodEnum.DAILY, period="bench")
+        second = await pipeline.deliver(prompt_system.TimeperiodEnum.DAILY, period="bench")
+        await engine.dispose()
+
+    print(f"first run:  {first}")
+    print(f"second run: {second}")
+    print(f"channel sends: {channel.sent}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--recipients", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--workers", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
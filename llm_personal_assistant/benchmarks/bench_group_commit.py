@@ -0,0 +1,74 @@
+"""
+Benchmark group commit of task writes.
+
+Concurrent clients create tasks through task_manager.create_task against a
+temporary SQLite file, first with one commit per call and then through the
+TaskWriteQueue, and the writes per second of each are reported. Commits are
+cheapest with synchronous=NORMAL in WAL mode; set SQLITE_SYNCHRONOUS=FULL to
+measure with an fsync on every commit.
+
+Usage (from the backend directory):
+    python ../benchmarks/bench_group_commit.py [--clients 64] [--writes 20]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+for name in ("ANTHROPIC_API_KEY", "SECRET_KEY", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"):
+    os.environ.setdefault(name, "benchmark")
+
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base, create_sqlite_engine  # noqa: E402
+from modules import task_manager  # noqa: E402
+from modules.write_queue import TaskWriteQueue  # noqa: E402
+
+
+async def bench(label, url, args, group_commit):
+    engine = create_sqlite_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    queue = TaskWriteQueue(session_factory=sessions)
+    original_queue = task_manager.task_write_queue
+    task_manager.task_write_queue = queue
+    if group_commit:
+        queue.start()
+
+    async def client(index):
+        for i in range(args.writes):
+            async with sessions() as db:
+                await task_manager.create_task(db, task_manager.TaskCreate(title=f"client {index} task {i}"))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    await queue.stop()
+    task_manager.task_write_queue = original_queue
+    await engine.dispose()
+    rate = args.clients * args.writes / elapsed
+    extra = f"  ({queue.stats['batches']} batches)" if group_commit else ""
+    print(f"{label:<14} {rate:10.1f} writes/s{extra}")
+    return rate
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        before = await bench("commit-per-op", f"sqlite:///{directory}/direct.db", args, group_commit=False)
+        after = await bench("group-commit", f"sqlite:///{directory}/grouped.db", args, group_commit=True)
+    print(f"speedup        {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--writes", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
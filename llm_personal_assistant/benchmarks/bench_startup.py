@@ -0,0 +1,78 @@
+"""
+Startup import-time benchmark with a regression budget.
+
+Imports the application in a fresh interpreter under `python -X importtime`,
+reports the cumulative import time of `main` and the slowest imports, and
+fails when the budget is exceeded or when a module that should load lazily
+(Google client libraries, dateparser, APScheduler, uvicorn) was imported.
+
+Usage (from the backend directory):
+    python ../benchmarks/bench_startup.py [--budget-ms 1300] [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+LAZY_MODULES = ("googleapiclient", "google_auth_oauthlib", "dateparser", "apscheduler", "uvicorn")
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+CHECK_LAZY = (
+    "import sys, main; "
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+
+def run_once():
+    env = dict(os.environ)
+    for name in ("ANTHROPIC_API_KEY", "SECRET_KEY", "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET"):
+        env.setdefault(name, "benchmark")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHECK_LAZY],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    output = result.stdout.strip().splitlines()
+    loaded_lazy = [name for name in output[-1].split(",") if name] if output else []
+    return imports, loaded_lazy
+
+
+def main(args):
+    totals = []
+    for _ in range(args.runs):
+        imports, loaded_lazy = run_once()
+        totals.append(next(cumulative for cumulative, _, name in imports if name == "main") / 1000)
+
+    print(f"import main: median {statistics.median(totals):.0f} ms, best {min(totals):.0f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest top-level imports of the last run:")
+    top_level = [(cumulative, name) for cumulative, depth, name in imports if depth <= 3 and name != "main"]
+    for cumulative, name in sorted(top_level, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if loaded_lazy:
+        print(f"FAIL: modules that should load lazily were imported: {', '.join(loaded_lazy)}")
+        failed = True
+    if statistics.median(totals) > args.budget_ms:
+        print("FAIL: startup import time is over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=1300.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+"""
+Shared pytest configuration for the backend tests.
+
+Puts the backend directory on the import path, provides the settings the
+application requires at import time, and offers a local stub HTTP server so
+that API clients can be exercised without network access. Tests marked
+'fastapi' import modules that need FastAPI; they import them inside the test
+and are skipped where the pinned FastAPI version cannot be imported.
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+
+
+def _fastapi_importable():
+    try:
+        import fastapi  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+FASTAPI_IMPORTABLE = _fastapi_importable()
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "fastapi: the test imports modules that depend on FastAPI")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip FastAPI-dependent tests where the pinned FastAPI cannot be imported (Python 3.11+)."""
+    if FASTAPI_IMPORTABLE:
+        return
+    skip = pytest.mark.skip(reason="FastAPI cannot be imported on this Python version")
+    for item in items:
+        if "fastapi" in item.keywords:
+            item.add_marker(skip)
+
+
+class StubServer:
+    """
+    Threaded local HTTP server that answers requests with a handler function.
+
+    The handler receives (method, path, headers, body), where a JSON body is
+    decoded and any other body is passed as text, and returns a tuple of
+    (status, body) or (status, body, headers). Dict and list bodies are sent as JSON.
+    Every received request is recorded in `requests`.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        stub = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = raw.decode()
+                stub.requests.append((self.command, self.path, dict(self.headers), body))
+                result = stub.handler(self.command, self.path, self.headers, body)
+                status, payload = result[0], result[1]
+                headers = result[2] if len(result) > 2 else {}
+                if isinstance(payload, (dict, list)):
+                    payload = json.dumps(payload)
+                data = (payload or "").encode() if isinstance(payload, str) else payload or b""
+                self.send_response(status)
+                headers.setdefault("Content-Type", "application/json")
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """Factory fixture starting a StubServer for the given handler."""
+    servers = []
+
+    def start(handler):
+        server = StubServer(handler).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
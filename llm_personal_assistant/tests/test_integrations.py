@@ -0,0 +1,379 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_sqlite_engine
+from integrations.ticktick import TickTickAuth, TickTickClient
+
+
+class TickTickDouble:
+    """Minimal stand-in for the TickTick token and task endpoints."""
+
+    def __init__(self, failures=None, refresh_delay=0.0):
+        self.tokens_issued = 0
+        self.valid_token = "token-0"
+        self.failures = list(failures or [])
+        self.refresh_delay = refresh_delay
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, headers, body):
+        if path == "/oauth/token":
+            time.sleep(self.refresh_delay)
+            with self._lock:
+                self.tokens_issued += 1
+                self.valid_token = f"token-{self.tokens_issued}"
+            return 200, {"access_token": self.valid_token, "refresh_token": "refresh", "expires_in": 3600}
+        if headers.get("Authorization") != f"Bearer {self.valid_token}":
+            return 401, {"error": "unauthorized"}
+        if self.failures:
+            status, retry_after = self.failures.pop(0), "0"
+            if isinstance(status, tuple):
+                status, retry_after = status
+            return status, {"error": "try again"}, {"Retry-After": retry_after}
+        if method == "DELETE":
+            return 200, ""
+        return 200, [{"id": "1", "title": "Task"}]
+
+
+@asynccontextmanager
+async def memory_sessions():
+    """Session factory of a fresh in-memory database with all tables."""
+    engine = create_sqlite_engine("sqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+def make_client(server, auth, **kwargs):
+    kwargs.setdefault("max_retries", 2)
+    return TickTickClient(f"{server.url}/open/v1", auth, retry_backoff=0.01, **kwargs)
+
+
+def make_auth(server, access_token="token-0", expired=False):
+    auth = TickTickAuth(token_url=f"{server.url}/oauth/token")
+    auth.access_token = access_token
+    auth.refresh_token = "refresh"
+    auth.expires_at = datetime.now() + (timedelta(seconds=-1) if expired else timedelta(hours=1))
+    return auth
+
+
+def run_with_client(server, auth, coro_factory):
+    async def run():
+        client = make_client(server, auth)
+        try:
+            return await coro_factory(client)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_request_reuses_token_and_returns_json(stub_server):
+    double = TickTickDouble()
+    server = stub_server(double)
+
+    result = run_with_client(server, make_auth(server), lambda client: client.request("GET", "/task"))
+
+    assert result == [{"id": "1", "title": "Task"}]
+    assert double.tokens_issued == 0
+    assert server.requests[0][1] == "/open/v1/task"
+
+
+def test_concurrent_requests_with_expired_token_refresh_once(stub_server):
+    double = TickTickDouble(refresh_delay=0.05)
+    server = stub_server(double)
+    auth = make_auth(server, access_token="stale", expired=True)
+
+    async def fan_out(client):
+        return await asyncio.gather(*(client.request("GET", "/task") for _ in range(10)))
+
+    results = run_with_client(server, auth, fan_out)
+
+    assert len(results) == 10
+    assert double.tokens_issued == 1
+
+
+def test_rejected_token_is_refreshed_and_request_retried(stub_server):
+    double = TickTickDouble()
+    server = stub_server(double)
+    auth = make_auth(server, access_token="revoked")
+
+    result = run_with_client(server, auth, lambda client: client.request("GET", "/task"))
+
+    assert result == [{"id": "1", "title": "Task"}]
+    assert double.tokens_issued == 1
+    assert parse_qs(server.requests[1][3])["grant_type"] == ["refresh_token"]
+
+
+def test_rate_limited_and_server_errors_are_retried(stub_server):
+    double = TickTickDouble(failures=[429, 503])
+    server = stub_server(double)
+
+    result = run_with_client(server, make_auth(server), lambda client: client.request("GET", "/task"))
+
+    assert result == [{"id": "1", "title": "Task"}]
+    assert len(server.requests) == 3
+
+
+def test_retry_after_is_honoured_up_to_the_maximum_backoff(stub_server):
+    double = TickTickDouble(failures=[(429, "3600"), (503, "Wed, 21 Oct 2099 07:28:00 GMT")])
+    server = stub_server(double)
+    auth = make_auth(server)
+
+    async def run():
+        client = make_client(server, auth, max_backoff=0.05)
+        started = time.monotonic()
+        try:
+            return await client.request("GET", "/task"), time.monotonic() - started
+        finally:
+            await client.aclose()
+
+    result, elapsed = asyncio.run(run())
+
+    assert result == [{"id": "1", "title": "Task"}]
+    assert len(server.requests) == 3
+    assert elapsed < 1.0
+
+
+def test_retries_are_bounded(stub_server):
+    double = TickTickDouble(failures=[500, 500, 500, 500])
+    server = stub_server(double)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with_client(server, make_auth(server), lambda client: client.request("GET", "/task"))
+    assert len(server.requests) == 3
+
+
+def test_empty_response_body_returns_none(stub_server):
+    server = stub_server(TickTickDouble())
+
+    result = run_with_client(server, make_auth(server), lambda client: client.request("DELETE", "/task/1"))
+
+    assert result is None
+
+
+class StubCalendarRequest:
+    def __init__(self, service, method, params):
+        self.service, self.method, self.params = service, method, params
+
+    def execute(self, http=None):
+        return self.service.respond(self.method, self.params)
+
+
+class StubCalendarService:
+    """Stand-in for the googleapiclient Calendar resource, answering with `respond`."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.batches = []
+
+    def events(self):
+        return self
+
+    def insert(self, **params):
+        return StubCalendarRequest(self, "insert", params)
+
+    def list(self, **params):
+        return StubCalendarRequest(self, "list", params)
+
+    def new_batch_http_request(self, callback):
+        service = self
+
+        class Batch:
+            def __init__(self):
+                self.requests = []
+                service.batches.append(self.requests)
+
+            def add(self, request, request_id):
+                self.requests.append((request, request_id))
+
+            def execute(self, http=None):
+                for request, request_id in self.requests:
+                    try:
+                        callback(request_id, request.execute(http), None)
+                    except Exception as e:
+                        callback(request_id, None, e)
+
+        return Batch()
+
+
+@pytest.mark.fastapi
+def test_calendar_batch_reports_results_per_event_in_input_order(monkeypatch):
+    from integrations import google_calendar
+
+    monkeypatch.setattr(google_calendar.calendar_service, "new_http", lambda: None)
+
+    def respond(method, params):
+        if params["body"]["summary"] == "event 7":
+            raise ValueError("rejected")
+        return {"id": f"id-{params['body']['summary']}", "htmlLink": ""}
+
+    service = StubCalendarService(respond)
+    events = [{"summary": f"event {i}"} for i in range(60)]
+
+    results = google_calendar._execute_batch(service, events)
+
+    assert [len(batch) for batch in service.batches] == [50, 10]
+    assert results[7] == {"event": None, "error": "rejected"}
+    assert [result["event"]["id"] for i, result in enumerate(results) if i != 7] == [
+        f"id-event {i}" for i in range(60) if i != 7
+    ]
+
+
+def fresh_calendar_holder():
+    from google.oauth2.credentials import Credentials
+
+    from integrations.google_calendar import CalendarServiceHolder
+
+    holder = CalendarServiceHolder(refresh_margin=timedelta(minutes=5))
+    holder._credentials = Credentials(
+        token="token-1", refresh_token="refresh", expiry=datetime.utcnow() + timedelta(hours=1)
+    )
+    holder._service = object()
+    return holder
+
+
+@pytest.mark.fastapi
+def test_calendar_http_is_reused_per_thread_and_never_refreshes_itself():
+    holder = fresh_calendar_holder()
+
+    first, second = holder.new_http(), holder.new_http()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        other = pool.submit(holder.new_http).result()
+
+    assert first.http is second.http
+    assert other.http is not first.http
+    assert first._refresh_status_codes == ()
+
+
+@pytest.mark.fastapi
+def test_calendar_401_refreshes_through_the_holder_and_retries_once(monkeypatch):
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    holder = fresh_calendar_holder()
+    refreshed = []
+    monkeypatch.setattr(holder, "refresh", refreshed.append)
+
+    class Request:
+        calls = 0
+
+        def execute(self, http=None):
+            self.calls += 1
+            if self.calls == 1:
+                raise HttpError(httplib2.Response({"status": 401}), b"")
+            return {"ok": True}
+
+    request = Request()
+
+    assert holder.execute(request) == {"ok": True}
+    assert request.calls == 2
+    assert refreshed == ["token-1"]
+
+
+def calendar_event(event_id, day):
+    return {
+        "id": event_id,
+        "summary": event_id,
+        "start": {"dateTime": f"2024-09-{day:02d}T10:00:00Z"},
+        "end": {"dateTime": f"2024-09-{day:02d}T11:00:00Z"},
+    }
+
+
+@pytest.mark.fastapi
+def test_calendar_sync_resyncs_fully_when_the_sync_token_expires(monkeypatch):
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    from integrations import calendar_sync
+    from integrations.google_calendar import calendar_service
+
+    remote = {"events": [calendar_event("a", 2), calendar_event("b", 3)], "token": 1}
+    requests = []
+
+    def respond(method, params):
+        requests.append(params)
+        if params.get("syncToken") == "token-1":
+            raise HttpError(httplib2.Response({"status": 410}), b"")
+        remote["token"] += 1
+        return {"items": remote["events"], "nextSyncToken": f"token-{remote['token'] - 1}"}
+
+    service = StubCalendarService(respond)
+
+    async def aget_service():
+        return service
+
+    monkeypatch.setattr(calendar_service, "aget_service", aget_service)
+    monkeypatch.setattr(calendar_service, "new_http", lambda: None)
+
+    async def scenario():
+        async with memory_sessions() as sessions:
+            monkeypatch.setattr(calendar_sync, "AsyncSessionLocal", sessions)
+            first = await calendar_sync.sync_calendar()
+            remote["events"] = [calendar_event("b", 3)]
+            second = await calendar_sync.sync_calendar()
+            async with sessions() as db:
+                events = await calendar_sync.get_events(db, datetime(2024, 9, 1), datetime(2024, 10, 1))
+                state = await db.get(calendar_sync.CalendarSyncState, calendar_sync.PRIMARY_CALENDAR)
+                return first, second, events, state
+
+    first, second, events, state = asyncio.run(scenario())
+
+    assert first == {"changes": 2, "full_sync": True}
+    assert second == {"changes": 1, "full_sync": True}
+    assert [params.get("syncToken") for params in requests] == [None, "token-1", None]
+    assert [event["id"] for event in events] == ["b"]
+    assert state.sync_token == "token-2"
+
+
+def ticktick_task(task_id, modified, title=None, status=0):
+    return {"id": task_id, "title": title or task_id, "status": status,
+            "modifiedTime": f"2024-09-01T{modified}:00.000+0000"}
+
+
+def test_ticktick_sync_rewrites_only_changed_tasks_and_removes_deleted_ones(monkeypatch):
+    from integrations import ticktick, ticktick_sync
+
+    remote = [ticktick_task("a", "10:00"), ticktick_task("b", "10:00"), ticktick_task("c", "10:00")]
+
+    async def get_tasks():
+        return list(remote)
+
+    monkeypatch.setattr(ticktick, "get_tasks", get_tasks)
+
+    async def scenario():
+        async with memory_sessions() as sessions:
+            monkeypatch.setattr(ticktick_sync, "AsyncSessionLocal", sessions)
+            first = await ticktick_sync.sync_tasks()
+            remote[:] = [
+                ticktick_task("a", "10:00"),
+                ticktick_task("b", "11:00", title="b renamed", status=ticktick_sync.COMPLETED_STATUS),
+                ticktick_task("d", "09:00"),
+            ]
+            second = await ticktick_sync.sync_tasks()
+            async with sessions() as db:
+                state = await db.get(ticktick_sync.TickTickSyncState, ticktick_sync.SYNC_STATE_KEY)
+                open_tasks = await ticktick_sync.get_tasks(db, completed=False)
+                done_tasks = await ticktick_sync.get_tasks(db, completed=True)
+                return first, second, state, open_tasks, done_tasks
+
+    first, second, state, open_tasks, done_tasks = asyncio.run(scenario())
+
+    assert first == {"updated": 3, "removed": 0}
+    # "b" moved past the watermark and "d" is new; "a" is untouched and "c" was deleted remotely.
+    assert second == {"updated": 2, "removed": 1}
+    assert state.watermark == datetime(2024, 9, 1, 11, 0)
+    assert sorted(task["id"] for task in open_tasks) == ["a", "d"]
+    assert [task["title"] for task in done_tasks] == ["b renamed"]
@@ -0,0 +1,321 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_sqlite_engine
+from llm.cache import LLMCacheEntry, LLMResponseCache
+from llm.client import LLMClient, parse_retry_after
+from llm.providers import AnthropicProvider, Provider
+from llm.router import LLMRouter, LLMUnavailableError, default_routes
+
+
+def make_client(url, **kwargs):
+    kwargs.setdefault("retry_backoff", 0.01)
+    return LLMClient(base_url=url, api_key="test-key", api_version="2023-06-01", http2=False, **kwargs)
+
+
+MODEL = "claude-haiku-4-5"
+USER_MESSAGE = [{"role": "user", "content": "hi"}]
+
+
+def message(text):
+    return {"type": "message", "role": "assistant", "content": [{"type": "text", "text": text}]}
+
+
+def test_create_message_sends_headers_and_returns_json(stub_server):
+    server = stub_server(lambda method, path, headers, body: (200, message('{"tasks": []}')))
+
+    async def run():
+        client = make_client(server.url)
+        try:
+            return await client.create_message(USER_MESSAGE, MODEL, max_tokens=100, system="Be brief")
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+
+    assert result == message('{"tasks": []}')
+    method, path, headers, body = server.requests[0]
+    assert (method, path) == ("POST", "/v1/messages")
+    assert headers["x-api-key"] == "test-key"
+    assert headers["anthropic-version"] == "2023-06-01"
+    assert body == {"model": MODEL, "max_tokens": 100, "messages": USER_MESSAGE, "system": "Be brief"}
+
+
+def test_create_message_retries_transient_errors(stub_server):
+    statuses = [529, 503]
+
+    def handler(method, path, headers, body):
+        if statuses:
+            return statuses.pop(0), {"error": "overloaded"}
+        return 200, message("ok")
+
+    server = stub_server(handler)
+
+    async def run():
+        client = make_client(server.url, max_retries=3)
+        try:
+            return await client.create_message(USER_MESSAGE, MODEL)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == message("ok")
+    assert len(server.requests) == 3
+
+
+def test_create_message_raises_after_retries_exhausted(stub_server):
+    server = stub_server(lambda method, path, headers, body: (500, {"error": "boom"}))
+
+    async def run():
+        client = make_client(server.url, max_retries=1)
+        try:
+            await client.create_message(USER_MESSAGE, MODEL)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert len(server.requests) == 2
+
+
+def test_create_message_does_not_retry_client_errors(stub_server):
+    server = stub_server(lambda method, path, headers, body: (400, {"error": "bad request"}))
+
+    async def run():
+        client = make_client(server.url, max_retries=3)
+        try:
+            await client.create_message(USER_MESSAGE, MODEL)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert len(server.requests) == 1
+
+
+def test_retry_after_is_parsed_and_capped(stub_server):
+    statuses = [(429, "3600"), (503, "Wed, 21 Oct 2099 07:28:00 GMT"), (503, "soon")]
+
+    def handler(method, path, headers, body):
+        if statuses:
+            status, retry_after = statuses.pop(0)
+            return status, {"error": "slow down"}, {"Retry-After": retry_after}
+        return 200, message("ok")
+
+    server = stub_server(handler)
+
+    async def run():
+        client = make_client(server.url, max_retries=3, max_backoff=0.05)
+        try:
+            return await client.create_message(USER_MESSAGE, MODEL)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == message("ok")
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("later") is None
+
+
+def sse(event_type, **data):
+    return f"event: {event_type}\ndata: {json.dumps({'type': event_type, **data})}\n\n"
+
+
+def test_stream_message_yields_text_deltas(stub_server):
+    pieces = ['{"tasks"', ": []", "}"]
+    events = "".join([
+        sse("message_start", message={"content": []}),
+        sse("content_block_start", index=0, content_block={"type": "text", "text": ""}),
+        sse("ping"),
+        *(sse("content_block_delta", index=0, delta={"type": "text_delta", "text": piece}) for piece in pieces),
+        sse("content_block_stop", index=0),
+        sse("message_delta", delta={"stop_reason": "end_turn"}),
+        sse("message_stop"),
+    ])
+    server = stub_server(lambda method, path, headers, body: (200, events, {"Content-Type": "text/event-stream"}))
+
+    async def run():
+        client = make_client(server.url)
+        try:
+            return [chunk async for chunk in client.stream_message(USER_MESSAGE, MODEL)]
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == pieces
+    method, path, headers, body = server.requests[0]
+    assert path == "/v1/messages"
+    assert body["stream"] is True
+
+
+def test_anthropic_provider_sends_the_system_prompt_and_joins_text_blocks(stub_server):
+    answer = {"content": [
+        {"type": "text", "text": "Hello"}, {"type": "tool_use", "id": "tool-1"}, {"type": "text", "text": "!"},
+    ]}
+    server = stub_server(lambda method, path, headers, body: (200, answer))
+
+    async def run():
+        client = make_client(server.url)
+        try:
+            return await AnthropicProvider(MODEL, client=client).complete("system", "user", 50)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == "Hello!"
+    body = server.requests[0][3]
+    assert (body["system"], body["messages"]) == ("system", [{"role": "user", "content": "user"}])
+
+
+
+def test_cache_shares_concurrent_misses_and_serves_from_sqlite_until_expiry():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"tasks": [len(calls)]}
+
+    async def run():
+        engine = create_sqlite_engine("sqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        cache = LLMResponseCache(ttl_seconds=60, memory_size=10, max_entries=10, session_factory=sessions)
+        key = cache.make_key("extraction", "system", "input")
+        try:
+            shared = await asyncio.gather(*(cache.get_or_compute(key, compute) for _ in range(5)))
+            cache.clear_memory()
+            from_db = await cache.get(key)
+            cache.clear_memory()
+            async with sessions() as session:
+                await session.execute(update(LLMCacheEntry).values(created_at=datetime.utcnow() - timedelta(minutes=2)))
+                await session.commit()
+            expired = await cache.get(key)
+            return shared, from_db, expired, cache.stats
+        finally:
+            await engine.dispose()
+
+    shared, from_db, expired, stats = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert shared == [{"tasks": [1]}] * 5
+    assert from_db == {"tasks": [1]}
+    assert expired is None
+    assert stats["db_hits"] == 1
+
+
+class FakeProvider(Provider):
+    """Local provider answering with its own name after a delay, or failing."""
+
+    def __init__(self, name, delay=0.0, cost=0.0, fail=False):
+        super().__init__(name, name, input_cost=cost, output_cost=cost)
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def complete(self, system_prompt, user_prompt, max_tokens):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise httpx.ConnectError("unreachable")
+        return self.name
+
+
+def make_router(*providers, **kwargs):
+    kwargs.setdefault("hedge_min_seconds", 0.0)
+    return LLMRouter(list(providers), {"extraction": [p.name for p in providers]}, **kwargs)
+
+
+def test_router_prefers_cheapest_provider_within_latency_target():
+    cheap = FakeProvider("cheap", cost=0.001)
+    pricey = FakeProvider("pricey", cost=0.01)
+    router = make_router(pricey, cheap, latency_targets={"extraction": 1.0}, min_samples=2, hedge=False)
+
+    assert [p.name for p in router.select("extraction", 100, 100)] == ["cheap", "pricey"]
+
+    async def run():
+        return await router.complete("extraction", "system", "input")
+
+    assert asyncio.run(run()).provider == "cheap"
+    # Once its p95 misses the target, the cheap provider is only used as a last resort
+    for _ in range(2):
+        router._record_success(cheap, 5.0, 0.0)
+    assert [p.name for p in router.select("extraction", 100, 100)] == ["pricey", "cheap"]
+
+
+def test_router_hedges_slow_provider():
+    slow = FakeProvider("slow", delay=5.0, cost=0.001)
+    fast = FakeProvider("fast", delay=0.01, cost=0.01)
+    router = make_router(slow, fast, latency_targets={"extraction": 0.05})
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        completion = await router.complete("extraction", "system", "input")
+        return completion, loop.time() - started
+
+    completion, elapsed = asyncio.run(run())
+
+    assert completion.text == "fast"
+    assert elapsed < 1.0
+    assert (slow.calls, fast.calls) == (1, 1)
+    assert router.counters["hedges"] == 1
+
+
+def test_router_falls_back_on_errors_and_cools_down_failing_provider():
+    broken = FakeProvider("broken", fail=True, cost=0.001)
+    backup = FakeProvider("backup", cost=0.01)
+    router = make_router(broken, backup, hedge=False, max_errors=2)
+
+    async def run():
+        return [(await router.complete("extraction", "system", "input")).text for _ in range(3)]
+
+    assert asyncio.run(run()) == ["backup"] * 3
+    assert broken.calls == 2
+    assert router.stats()["providers"]["broken"]["available"] is False
+
+
+def test_router_raises_when_all_providers_fail():
+    router = make_router(FakeProvider("a", fail=True), FakeProvider("b", fail=True), hedge=False)
+
+    async def run():
+        await router.complete("extraction", "system", "input")
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(run())
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(router.complete("analysis", "system", "input"))
+
+
+def test_router_keeps_a_hedge_running_when_the_first_provider_fails():
+    failing = FakeProvider("failing", delay=0.1, fail=True, cost=0.001)
+    hedge = FakeProvider("hedge", delay=0.3, cost=0.01)
+    router = make_router(failing, hedge, latency_targets={"extraction": 0.02})
+
+    async def run():
+        return await router.complete("extraction", "system", "input")
+
+    completion = asyncio.run(run())
+
+    # The failure arrives while the hedge is in flight: its answer is used, with no fallback request
+    assert completion.text == "hedge"
+    assert (failing.calls, hedge.calls) == (1, 1)
+    assert router.counters == {"hedges": 1, "fallbacks": 0}
+    assert router.stats()["providers"]["failing"]["errors"] == 1
+
+
+def test_default_routes_use_the_configured_models(monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "ANTHROPIC_FAST_MODEL", "claude-fast")
+    monkeypatch.setattr(settings, "ANTHROPIC_LARGE_MODEL", "claude-large")
+
+    assert default_routes() == {
+        "extraction": ["anthropic:claude-fast", f"openai:{settings.OPENAI_FAST_MODEL}", "anthropic:claude-large"],
+        "analysis": ["anthropic:claude-large", f"openai:{settings.OPENAI_LARGE_MODEL}"],
+    }
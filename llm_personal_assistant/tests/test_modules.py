@@ -0,0 +1,775 @@
+import asyncio
+import os
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import ai_autonomy
+from ai_autonomy import EVENT_ACTION, TASK_ACTION, AutonomyStore, check_ai_autonomy
+from config import settings
+from database import Base, Task, create_sqlite_engine
+from leases import acquire_lease, release_lease
+from modules import date_parsing, prompt_system, reporting, search, task_manager
+from modules.communication import SENT, DeliveryPipeline, PromptDelivery, Recipient
+from modules.dedup import DuplicateIndex
+from modules.json_stream import StreamingAnalysisParser
+from modules.write_queue import TaskWriteQueue
+
+
+def feed_in_chunks(parser, text, size):
+    emitted = []
+    for i in range(0, len(text), size):
+        emitted.extend(parser.feed(text[i:i + size]))
+    return emitted
+
+
+def test_streaming_parser_emits_elements_as_they_close():
+    text = (
+        'Sure! {"tasks": [{"title": "Pay {rent}", "description": "say \\"hi\\" ]"}, '
+        '{"title": "Nested", "meta": {"tags": ["a", "b"]}}], '
+        '"note": "[{not an element}]", '
+        '"events": [{"title": "Dentist", "start_time": "9am"}]} trailing {"tasks": [{}]}'
+    )
+    parser = StreamingAnalysisParser()
+
+    emitted = feed_in_chunks(parser, text, 3)
+
+    assert emitted == [
+        ("tasks", {"title": "Pay {rent}", "description": 'say "hi" ]'}),
+        ("tasks", {"title": "Nested", "meta": {"tags": ["a", "b"]}}),
+        ("events", {"title": "Dentist", "start_time": "9am"}),
+    ]
+    assert parser.done
+    assert parser.result()["events"] == [{"title": "Dentist", "start_time": "9am"}]
+
+
+def test_streaming_parser_emits_first_task_before_completion_ends():
+    parser = StreamingAnalysisParser()
+
+    assert parser.feed('{"tasks": [{"title": "A"}') == [("tasks", {"title": "A"})]
+    assert not parser.done
+
+
+def test_build_match_query_quotes_prefix_terms():
+    assert search.build_match_query('groc "list" OR x*') == '"groc"* "list"* "OR"* "x"*'
+    assert search.build_match_query("  --  ") == ""
+    assert search.build_match_query("call the dentist, the dentist", any_term=True, min_length=4) == '"call"* OR "dentist"*'
+
+
+@asynccontextmanager
+async def memory_sessions():
+    """Session factory of a fresh in-memory database with all tables."""
+    engine = create_sqlite_engine("sqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+def run_with_write_queue(scenario):
+    async def run():
+        engine = create_sqlite_engine("sqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        queue = TaskWriteQueue(sessionmaker(engine, class_=AsyncSession, expire_on_commit=False), window_ms=20)
+        queue.start()
+        try:
+            return await scenario(queue), queue.stats
+        finally:
+            await queue.stop()
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+async def add_task(db, title):
+    task = Task(title=title)
+    db.add(task)
+    await db.flush()
+    return task.id
+
+
+async def fail(db):
+    raise ValueError("bad operation")
+
+
+def test_write_queue_commits_concurrent_writes_in_one_batch():
+    ids, stats = run_with_write_queue(
+        lambda queue: asyncio.gather(*(queue.submit(add_task, f"task {i}") for i in range(10)))
+    )
+
+    assert sorted(ids) == list(range(1, 11))
+    assert stats["batches"] == 1
+
+
+def test_write_queue_isolates_a_failing_operation():
+    async def scenario(queue):
+        return await asyncio.gather(
+            queue.submit(add_task, "first"), queue.submit(fail), queue.submit(add_task, "second"),
+            return_exceptions=True,
+        )
+
+    (first, error, second), stats = run_with_write_queue(scenario)
+
+    assert isinstance(error, ValueError)
+    assert {first, second} == {1, 2}
+    assert stats["fallbacks"] == 1
+
+
+def test_date_parsing_fast_paths_and_relative_dates():
+    reference = datetime(2024, 9, 4, 12, 0)
+
+    assert date_parsing.parse("2024-09-05T15:30:00", reference) == datetime(2024, 9, 5, 15, 30)
+    assert date_parsing.parse("September 5, 2024", reference) == datetime(2024, 9, 5)
+    assert date_parsing.parse("3:30 PM", reference) == datetime(2024, 9, 4, 15, 30)
+    assert date_parsing.parse_date("tomorrow", reference) == datetime(2024, 9, 5).date()
+    assert date_parsing.parse("not a date at all", reference) is None
+
+
+class FlakyChannel:
+    def __init__(self, failing_ids):
+        self.failing_ids = set(failing_ids)
+        self.sent = []
+
+    async def send(self, recipient, prompts):
+        if recipient["id"] in self.failing_ids:
+            raise ConnectionError("unreachable")
+        self.sent.append(recipient["id"])
+
+    async def aclose(self):
+        pass
+
+
+def test_delivery_pipeline_is_idempotent_and_retries_failures():
+    channel = FlakyChannel(failing_ids={3})
+
+    async def run():
+        engine = create_sqlite_engine("sqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with sessions() as session:
+            await prompt_system.initialize_prompts(session)
+            session.add_all([Recipient(name=f"user {i}", channel="test") for i in range(5)])
+            await session.commit()
+        pipeline = DeliveryPipeline(sessions, channels={"test": channel}, workers=3, chunk_size=2)
+        try:
+            first = await pipeline.deliver(prompt_system.TimeperiodEnum.DAILY, period="day-1")
+            channel.failing_ids.clear()
+            second = await pipeline.deliver(prompt_system.TimeperiodEnum.DAILY, period="day-1")
+            return first, second
+        finally:
+            await engine.dispose()
+
+    first, second = asyncio.run(run())
+
+    assert (first["sent"], first["failed"]) == (4, 1)
+    assert (second["claimed"], second["sent"], second["skipped"]) == (1, 1, 4)
+    assert sorted(channel.sent) == [1, 2, 3, 4, 5]
+
+
+def test_delivery_survives_a_failed_outcome_write():
+    channel = FlakyChannel(failing_ids=set())
+    failing_writes = [1]
+
+    def fail_first_outcome_write(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE prompt_deliveries") and "sent_at" in statement and failing_writes:
+            failing_writes.pop()
+            raise OperationalError(statement, parameters, Exception("database is locked"))
+
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                await prompt_system.initialize_prompts(session)
+                session.add_all([Recipient(name=f"user {i}", channel="test") for i in range(5)])
+                await session.commit()
+            event.listen(sessions.kw["bind"].sync_engine, "before_cursor_execute", fail_first_outcome_write)
+            pipeline = DeliveryPipeline(sessions, channels={"test": channel}, workers=1, chunk_size=2)
+            metrics = await pipeline.deliver(prompt_system.TimeperiodEnum.DAILY, period="day-1")
+            async with sessions() as session:
+                statuses = (await session.execute(select(PromptDelivery.status))).scalars().all()
+            return metrics, statuses
+
+    metrics, statuses = asyncio.run(asyncio.wait_for(run(), timeout=10))
+
+    assert failing_writes == []
+    assert metrics["sent"] == 5
+    # The outcomes of the failed write are recorded by a later one
+    assert statuses == [SENT] * 5
+
+
+def test_scheduler_lease_has_one_holder_until_released_or_expired():
+    async def run():
+        engine = create_sqlite_engine("sqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            outcomes = [
+                await acquire_lease("scheduler", "a", 60, sessions),
+                await acquire_lease("scheduler", "b", 60, sessions),
+                await acquire_lease("scheduler", "a", 60, sessions),
+            ]
+            await release_lease("scheduler", "a", sessions)
+            outcomes.append(await acquire_lease("scheduler", "b", -1, sessions))
+            # b's lease has already expired, so a can take it over
+            outcomes.append(await acquire_lease("scheduler", "a", 60, sessions))
+            return outcomes
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run()) == [True, False, True, True, True]
+
+
+def test_prompt_response_rollups_match_a_rebuild():
+    async def run():
+        engine = create_sqlite_engine("sqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with sessions() as session:
+                await prompt_system.initialize_prompts(session)
+                for text in ("one", "three", "five5"):
+                    await prompt_system.save_prompt_response(session, 1, text)
+                incremental = await prompt_system.get_rollups(session, 1, prompt_system.RollupPeriod.WEEK)
+                await prompt_system.rebuild_rollups(session)
+                rebuilt = await prompt_system.get_rollups(session, 1, prompt_system.RollupPeriod.WEEK)
+                page, cursor = await prompt_system.get_responses(session, 1, limit=2)
+                rest, _ = await prompt_system.get_responses(session, 1, limit=2, cursor=cursor)
+            return incremental, rebuilt, [r.response for r in page + rest]
+        finally:
+            await engine.dispose()
+
+    incremental, rebuilt, responses = asyncio.run(run())
+
+    assert incremental == rebuilt
+    assert (rebuilt[0]["response_count"], rebuilt[0]["response_chars"]) == (3, 13)
+    assert rebuilt[0]["period_start"].weekday() == 0
+    assert responses == ["five5", "three", "one"]
+
+
+def test_task_stats_triggers_match_a_full_aggregation():
+    async def run():
+        engine = create_sqlite_engine("sqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for statement in reporting._trigger_statements():
+                await conn.exec_driver_sql(statement)
+        sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with sessions() as session:
+                session.add_all([
+                    Task(title=f"task {i}", created_at=datetime(2024, 3, 1 + i, 9), due_date=datetime(2024, 3, 10 + i))
+                    for i in range(6)
+                ])
+                await session.commit()
+                tasks = (await session.execute(select(Task).order_by(Task.id))).scalars().all()
+                tasks[0].completed, tasks[0].completed_at = True, datetime(2024, 3, 4, 9)
+                tasks[1].completed, tasks[1].completed_at = True, datetime(2024, 3, 12, 21)
+                tasks[2].due_date = datetime(2024, 4, 1)
+                await session.delete(tasks[3])
+                await session.commit()
+                result = await session.execute(select(Task.created_at, Task.completed, Task.completed_at, Task.due_date))
+                expected = reporting.aggregate_python([tuple(row) for row in result.all()])
+                weeks = {
+                    stats.week_start: [stats.created, stats.completed, stats.lead_time_seconds, stats.lead_time_count]
+                    for stats in (await session.execute(select(reporting.TaskWeeklyStats))).scalars().all()
+                    if stats.created or stats.completed
+                }
+                due = {
+                    stats.due_day: stats.open_count
+                    for stats in (await session.execute(select(reporting.TaskDueStats))).scalars().all()
+                    if stats.open_count
+                }
+            return expected, (weeks, due)
+        finally:
+            await engine.dispose()
+
+    expected, maintained = asyncio.run(run())
+
+    assert maintained == expected
+    assert expected[0][date(2024, 3, 11)][1:] == [1, 10 * 86400 + 12 * 3600, 1]
+
+
+def test_duplicate_index_finds_reworded_open_tasks():
+    index = DuplicateIndex(session_factory=None)
+    index.add(1, "Call dentist about cleaning")
+    index.add(2, "Email the landlord", "about the broken heater")
+    index.add(3, "Buy groceries")
+
+    assert index.find("call the Dentist about cleaning!").task_id == 1
+    assert index.find("Email landlord", "broken heater").task_id == 2
+    assert index.find("Email landlord", "completely different words here").similarity < 0.9
+    assert index.find("Renew passport") is None
+
+    index.remove(1)
+    assert index.find("Call dentist about cleaning") is None
+
+
+def test_bulk_task_insert_returns_ids_in_input_order():
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                session.add(Task(title="existing"))
+                await session.commit()
+                titles = ["b", "a", "c"]
+                ids = await task_manager.create_tasks_bulk(
+                    session, [task_manager.TaskCreate(title=title) for title in titles]
+                )
+                stored = {task.id: task.title for task in (await session.execute(select(Task))).scalars().all()}
+                return ids, [stored[task_id] for task_id in ids], await task_manager.create_tasks_bulk(session, [])
+
+    ids, titles, empty = asyncio.run(run())
+
+    assert ids == [2, 3, 4]
+    assert titles == ["b", "a", "c"]
+    assert empty == []
+
+
+def test_keyset_pages_cover_every_task_once_including_null_due_dates():
+    due_dates = [datetime(2024, 9, 3), None, datetime(2024, 9, 1), datetime(2024, 9, 3), None, datetime(2024, 9, 2)]
+
+    async def all_pages(session, descending):
+        ids, cursor = [], None
+        while True:
+            tasks, cursor = await task_manager.get_tasks(session, limit=2, cursor=cursor, descending=descending)
+            ids.extend(task.id for task in tasks)
+            if cursor is None:
+                return ids
+
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                session.add_all(Task(title=f"task {i}", due_date=due) for i, due in enumerate(due_dates))
+                await session.commit()
+                ascending = await all_pages(session, False)
+                descending = await all_pages(session, True)
+                _, cursor = await task_manager.get_tasks(session, limit=2)
+                with pytest.raises(ValueError):
+                    await task_manager.get_tasks(session, limit=2, cursor=cursor, descending=True)
+                with pytest.raises(ValueError):
+                    await task_manager.get_tasks(session, cursor="not a cursor")
+                return ascending, descending
+
+    ascending, descending = asyncio.run(run())
+
+    # SQLite sorts NULL due dates first; ties on the due date are broken by id.
+    assert ascending == [2, 5, 3, 6, 1, 4]
+    assert descending == list(reversed(ascending))
+
+
+def test_task_search_follows_inserts_updates_and_deletes_through_triggers(monkeypatch):
+    async def run():
+        async with memory_sessions() as sessions:
+            monkeypatch.setattr(search, "engine", sessions.kw["bind"])
+            monkeypatch.setattr(search, "search_available", False)
+            async with sessions() as session:
+                session.add(Task(title="Buy groceries", description="milk and eggs"))
+                await session.commit()
+                await search.init_search_index()
+
+                session.add_all([
+                    Task(title="Plan trip", description="book groceries delivery before leaving"),
+                    Task(title="Renew passport"),
+                ])
+                await session.commit()
+                found = [hit["title"] for hit in await search.search_tasks(session, "grocer")]
+
+                passport = (await session.execute(select(Task).filter(Task.title == "Renew passport"))).scalar_one()
+                passport.title = "Renew driving licence"
+                await session.commit()
+                renamed = [hit["title"] for hit in await search.search_tasks(session, "passport")]
+                licence = await search.search_tasks(session, "licen")
+
+                await session.delete(await session.get(Task, 1))
+                await session.commit()
+                after_delete = [hit["title"] for hit in await search.search_tasks(session, "groceries")]
+                return found, renamed, licence, after_delete
+
+    found, renamed, licence, after_delete = asyncio.run(run())
+
+    assert search.search_available
+    # The task that existed before the index was built is found, and a title match outranks a description match
+    assert found == ["Buy groceries", "Plan trip"]
+    assert renamed == []
+    assert [hit["snippet"] for hit in licence] == ["Renew driving [licence]"]
+    assert after_delete == ["Plan trip"]
+
+
+def test_file_engines_use_wal_and_the_read_engine_refuses_writes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'assistant.db'}"
+
+    async def run():
+        engine = create_sqlite_engine(url)
+        read_engine = create_sqlite_engine(url, read_only=True)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(insert(Task).values(title="written"))
+            async with read_engine.connect() as conn:
+                journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+                busy_timeout = (await conn.exec_driver_sql("PRAGMA busy_timeout")).scalar()
+                titles = (await conn.execute(select(Task.title))).scalars().all()
+                with pytest.raises(OperationalError):
+                    await conn.execute(insert(Task).values(title="refused"))
+            return engine.pool.size(), journal_mode, busy_timeout, titles
+        finally:
+            await engine.dispose()
+            await read_engine.dispose()
+
+    pool_size, journal_mode, busy_timeout, titles = asyncio.run(run())
+
+    assert pool_size == settings.DB_POOL_SIZE
+    assert journal_mode == "wal"
+    assert busy_timeout == settings.SQLITE_BUSY_TIMEOUT_MS
+    assert titles == ["written"]
+
+
+def test_task_updates_and_deletes_return_rows_in_one_statement():
+    events = []
+
+    def listener(event, task_ids, values):
+        events.append((event, task_ids))
+
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                ids = await task_manager.create_tasks_bulk(
+                    session, [task_manager.TaskCreate(title=title) for title in ("a", "b", "c")]
+                )
+                task_manager.add_write_listener(listener)
+                try:
+                    updated = await task_manager.update_task(session, ids[0], task_manager.TaskUpdate(title="a2"))
+                    missing = await task_manager.update_task(session, 99, task_manager.TaskUpdate(title="x"))
+                    completed = await task_manager.update_tasks_bulk(
+                        session, [ids[2], ids[1], 99], task_manager.TaskUpdate(completed=True)
+                    )
+                    completed_at = select(Task.completed_at).filter(Task.id == ids[1])
+                    first_completed_at = (await session.execute(completed_at)).scalar_one()
+                    await task_manager.update_tasks_bulk(session, [ids[1]], task_manager.TaskUpdate(completed=True))
+                    deleted = await task_manager.delete_task(session, ids[2])
+                    deleted_again = await task_manager.delete_task(session, ids[2])
+                finally:
+                    task_manager.remove_write_listener(listener)
+                second_completed_at = (await session.execute(completed_at)).scalar_one()
+                remaining = (await session.execute(select(Task.title).order_by(Task.id))).scalars().all()
+                return (ids, updated.title, missing, completed, first_completed_at, second_completed_at,
+                        deleted, deleted_again, remaining)
+
+    (ids, title, missing, completed, first_completed_at, second_completed_at,
+     deleted, deleted_again, remaining) = asyncio.run(run())
+
+    assert title == "a2"
+    assert missing is None
+    assert completed == [ids[1], ids[2]]
+    # Completing an already completed task keeps its original completion time
+    assert first_completed_at is not None
+    assert second_completed_at == first_completed_at
+    assert (deleted, deleted_again) == (True, False)
+    assert remaining == ["a2", "b"]
+    assert events == [
+        (task_manager.UPDATED, [ids[0]]),
+        (task_manager.UPDATED, [ids[1], ids[2]]),
+        (task_manager.UPDATED, [ids[1]]),
+        (task_manager.DELETED, [ids[2]]),
+    ]
+
+
+def imported_lazy_modules(statement):
+    """Run `statement` in a fresh interpreter and return the lazily loaded modules it imported."""
+    lazy = ("googleapiclient", "google_auth_oauthlib", "dateparser", "apscheduler", "uvicorn")
+    check = f"import sys; {statement}; print(','.join(m for m in {lazy!r} if m in sys.modules))"
+    backend = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+    result = subprocess.run([sys.executable, "-c", check], cwd=backend, capture_output=True, text=True, check=True)
+    output = result.stdout.strip().splitlines()
+    return [name for name in output[-1].split(",") if name] if output else []
+
+
+def test_date_fast_paths_do_not_import_dateparser():
+    assert imported_lazy_modules(
+        "from datetime import datetime; from modules import date_parsing; "
+        "date_parsing.parse('2024-09-05T15:30:00', datetime(2024, 9, 4))"
+    ) == []
+
+
+@pytest.mark.fastapi
+def test_importing_the_app_leaves_heavy_dependencies_unloaded():
+    assert imported_lazy_modules("import main") == []
+
+
+def test_initialize_prompts_seeds_an_empty_database_once():
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                await prompt_system.initialize_prompts(session)
+                await prompt_system.initialize_prompts(session)
+                return (await session.execute(select(func.count()).select_from(prompt_system.Prompt))).scalar_one()
+
+    assert asyncio.run(run()) == len(prompt_system.SAMPLE_PROMPTS)
+
+
+def test_autonomy_falls_back_from_user_and_action_to_the_global_value(tmp_path):
+    async def run():
+        async with memory_sessions() as sessions:
+            store = AutonomyStore(str(tmp_path / "ai_autonomy.txt"), session_factory=sessions)
+            await store.load()
+            unset = store.is_autonomous(TASK_ACTION, "alice")
+            await store.set(True)
+            await store.set(False, user_id="alice")
+            await store.set(True, user_id="alice", action=EVENT_ACTION)
+            await store.set(False, action=TASK_ACTION)
+            return unset, {
+                (user_id, action): store.is_autonomous(action, user_id)
+                for user_id in ("alice", "bob", None) for action in (TASK_ACTION, EVENT_ACTION, None)
+            }
+
+    unset, decisions = asyncio.run(run())
+
+    assert unset is False
+    assert decisions == {
+        ("alice", TASK_ACTION): False, ("alice", EVENT_ACTION): True, ("alice", None): False,
+        ("bob", TASK_ACTION): False, ("bob", EVENT_ACTION): True, ("bob", None): True,
+        (None, TASK_ACTION): False, (None, EVENT_ACTION): True, (None, None): True,
+    }
+
+
+def test_autonomy_store_picks_up_settings_written_by_another_process(tmp_path, monkeypatch):
+    @check_ai_autonomy(TASK_ACTION)
+    async def create(title, user_id=None):
+        return title
+
+    async def run():
+        async with memory_sessions() as sessions:
+            writer = AutonomyStore(str(tmp_path / "ai_autonomy.txt"), session_factory=sessions)
+            reader = AutonomyStore(str(tmp_path / "ai_autonomy.txt"), reload_interval=0.01, session_factory=sessions)
+            await reader.load()
+            monkeypatch.setattr(ai_autonomy, "autonomy_store", reader)
+            reader.start()
+            try:
+                await writer.set(True, user_id="alice", action=TASK_ACTION)
+                await asyncio.sleep(0.1)
+                allowed = await create("allowed", user_id="alice")
+                denied = await create("denied", user_id="bob")
+            finally:
+                await reader.stop()
+            return allowed, denied
+
+    allowed, denied = asyncio.run(run())
+
+    assert allowed == "allowed"
+    assert denied == {"message": "AI action requires user confirmation", "action": TASK_ACTION}
+
+
+def pending_event(summary):
+    return {
+        "summary": summary,
+        "start": {"dateTime": "2024-09-05T10:00:00", "timeZone": "UTC"},
+        "end": {"dateTime": "2024-09-05T11:00:00", "timeZone": "UTC"},
+    }
+
+
+class FakeCalendarBatch:
+    """Creates the events of a batch, failing those whose summary starts with 'bad'."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, events):
+        self.sent.extend(event["summary"] for event in events)
+        return [
+            {"event": None, "error": "rejected"} if event["summary"].startswith("bad")
+            else {"event": {**event, "id": f"gcal-{event['summary']}"}, "error": None}
+            for event in events
+        ]
+
+
+@pytest.mark.fastapi
+def test_approving_pending_actions_creates_tasks_and_events_once(monkeypatch):
+    from integrations import calendar_sync, google_calendar
+    from modules import pending_actions
+
+    batch = FakeCalendarBatch()
+    monkeypatch.setattr(google_calendar, "create_events_batch", batch)
+
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                ids = await pending_actions.store_actions(
+                    session, [task_manager.TaskCreate(title="Call dentist")],
+                    [pending_event("standup"), pending_event("bad event")],
+                )
+                first = await pending_actions.approve_actions(session, ids)
+                second = await pending_actions.approve_actions(session, ids)
+                rejected = await pending_actions.reject_actions(session, ids)
+                titles = (await session.execute(select(Task.title))).scalars().all()
+                mirrored = (await session.execute(select(calendar_sync.CalendarEvent.event_id))).scalars().all()
+                return ids, first, second, rejected, titles, mirrored
+
+    ids, first, second, rejected, titles, mirrored = asyncio.run(run())
+
+    assert [action["id"] for action in first["approved"]] == ids[:2]
+    assert first["approved"][1]["result_id"] == "gcal-standup"
+    assert [(action["id"], action["error"]) for action in first["failed"]] == [(ids[2], "rejected")]
+    # Only the failed event is retried; approved actions are not carried out again
+    assert second["approved"] == [] and [action["id"] for action in second["failed"]] == [ids[2]]
+    assert batch.sent == ["standup", "bad event", "bad event"]
+    assert rejected == [ids[2]]
+    assert titles == ["Call dentist"]
+    assert mirrored == ["gcal-standup"]
+
+
+@pytest.mark.fastapi
+def test_failed_approval_records_created_events_and_releases_the_rest(monkeypatch):
+    from integrations import google_calendar
+    from modules import pending_actions
+
+    batch = FakeCalendarBatch()
+    monkeypatch.setattr(google_calendar, "create_events_batch", batch)
+    insert_tasks = task_manager.insert_tasks
+
+    async def broken_insert(db, tasks):
+        raise RuntimeError("disk full")
+
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                ids = await pending_actions.store_actions(
+                    session, [task_manager.TaskCreate(title="Call dentist")], [pending_event("standup")]
+                )
+                monkeypatch.setattr(task_manager, "insert_tasks", broken_insert)
+                failed = await pending_actions.approve_actions(session, ids)
+                monkeypatch.setattr(task_manager, "insert_tasks", insert_tasks)
+                retried = await pending_actions.approve_actions(session, ids)
+                return ids, failed, retried
+
+    ids, failed, retried = asyncio.run(run())
+
+    assert [action["id"] for action in failed["approved"]] == [ids[1]]
+    assert [(action["id"], action["error"]) for action in failed["failed"]] == [(ids[0], "disk full")]
+    assert [action["id"] for action in retried["approved"]] == [ids[0]]
+    assert batch.sent == ["standup"]
+
+
+@pytest.mark.fastapi
+def test_stale_approval_claims_are_taken_over():
+    from modules import pending_actions
+
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                ids = await pending_actions.store_actions(
+                    session, [task_manager.TaskCreate(title="a"), task_manager.TaskCreate(title="b")], []
+                )
+                stale = datetime(2000, 1, 1)
+                await session.execute(
+                    update(pending_actions.PendingAction)
+                    .values(status=pending_actions.APPROVING, claimed_at=stale)
+                    .where(pending_actions.PendingAction.id == ids[0])
+                )
+                await session.execute(
+                    update(pending_actions.PendingAction)
+                    .values(status=pending_actions.APPROVING, claimed_at=datetime.utcnow())
+                    .where(pending_actions.PendingAction.id == ids[1])
+                )
+                await session.commit()
+                return ids, await pending_actions.approve_actions(session, ids)
+
+    ids, result = asyncio.run(run())
+
+    # The fresh claim still belongs to another approval in progress
+    assert [action["id"] for action in result["approved"]] == [ids[0]]
+    assert result["failed"] == []
+
+
+@pytest.mark.fastapi
+def test_repeated_answer_hits_the_llm_cache_after_an_unrelated_task_write(monkeypatch):
+    from llm.cache import LLMResponseCache
+    from modules import context_builder, llm_integration
+
+    requests = []
+
+    async def request_analysis(system_prompt, user_prompt):
+        requests.append(user_prompt)
+        return {"tasks": [], "events": []}
+
+    monkeypatch.setattr(llm_integration, "_request_analysis", request_analysis)
+    monkeypatch.setattr(context_builder, "context_cache", context_builder.ContextCache())
+
+    async def run():
+        async with memory_sessions() as sessions:
+            cache = LLMResponseCache(ttl_seconds=60, memory_size=10, max_entries=10, session_factory=sessions)
+            monkeypatch.setattr(llm_integration, "llm_cache", cache)
+            async with sessions() as session:
+                await prompt_system.initialize_prompts(session)
+                prompt = (await session.execute(select(prompt_system.Prompt).limit(1))).scalar_one()
+                await llm_integration.process_prompt_response(session, prompt, "I need to buy milk")
+                await task_manager.create_task(
+                    session, task_manager.TaskCreate(title="Water the plants", due_date=datetime(2999, 1, 1))
+                )
+                await llm_integration.process_prompt_response(session, prompt, "I need to buy milk")
+                return cache.stats
+
+    stats = asyncio.run(run())
+
+    assert len(requests) == 1
+    assert stats["memory_hits"] == 1
+
+
+@pytest.mark.fastapi
+def test_built_contexts_are_cached_until_a_task_write(monkeypatch):
+    from modules import context_builder
+
+    monkeypatch.setattr(context_builder, "context_cache", context_builder.ContextCache())
+
+    async def run():
+        async with memory_sessions() as sessions:
+            async with sessions() as session:
+                await prompt_system.initialize_prompts(session)
+                prompt = (await session.execute(select(prompt_system.Prompt).limit(1))).scalar_one()
+                before = await context_builder.build_context(session, prompt, "plans for the week")
+                cached = await context_builder.build_context(session, prompt, "plans for the week")
+                cache_hits = context_builder.context_cache.stats["hits"]
+                await task_manager.create_task(
+                    session, task_manager.TaskCreate(title="Water the plants", due_date=datetime(2999, 1, 1))
+                )
+                after = await context_builder.build_context(session, prompt, "plans for the week")
+                return before, cached, cache_hits, after
+
+    before, cached, cache_hits, after = asyncio.run(run())
+
+    assert cached == before and cache_hits == 1
+    assert "Water the plants" not in before
+    assert "- Water the plants (due 2999-01-01)" in after
+
+
+def test_deleting_a_task_by_string_id_removes_it_from_the_duplicate_index():
+    async def run():
+        async with memory_sessions() as sessions:
+            index = DuplicateIndex(session_factory=sessions)
+            async with sessions() as session:
+                task = await task_manager.create_task(session, task_manager.TaskCreate(title="Buy milk at the store"))
+                await index.ensure_ready()
+                found = index.find("Buy milk at the store")
+                task_manager.add_write_listener(index.on_task_write)
+                try:
+                    # As passed by DELETE /tasks/{task_id}
+                    deleted = await task_manager.delete_task(session, str(task.id))
+                finally:
+                    task_manager.remove_write_listener(index.on_task_write)
+                return task.id, found, deleted, index.find("Buy milk at the store")
+
+    task_id, found, deleted, after = asyncio.run(run())
+
+    assert found.task_id == task_id
+    assert deleted is True
+    assert after is None